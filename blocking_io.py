@@ -0,0 +1,177 @@
+# =====================================================
+# FILE: blocking_io.py
+# Uitvoeringsmodel voor async routes: blocking werk (Graph, SMTP, PIL,
+# bestand-I/O) naar een eigen thread pool + event-loop stall monitor
+# =====================================================
+#
+# - run_blocking(fn, *args) → draait fn in de pool "revo-io"
+#   (BLOCKING_POOL_SIZE threads), nooit op de event loop
+# - Stall monitor: een heartbeat op de loop + watchdog-thread. Blijft de
+#   heartbeat langer dan LOOP_STALL_THRESHOLD_MS uit, dan wordt gelogd welke
+#   handler(s) actief waren en waar de loop-thread op dat moment hing.
+
+import asyncio
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "16"))
+LOOP_STALL_THRESHOLD_MS = float(os.getenv("LOOP_STALL_THRESHOLD_MS", "200"))
+LOOP_STALL_INTERVAL = float(os.getenv("LOOP_STALL_INTERVAL", "0.05"))
+
+_pool_lock = threading.Lock()
+_pool: ThreadPoolExecutor | None = None
+
+
+# -----------------------------------------------------
+# Thread pool
+# -----------------------------------------------------
+
+def blocking_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=BLOCKING_POOL_SIZE, thread_name_prefix="revo-io")
+    return _pool
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Blocking functie in de revo-io pool uitvoeren (contextvars gaan mee)."""
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(blocking_pool(), call)
+
+
+def shutdown_blocking_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+# -----------------------------------------------------
+# Actieve requests (voor de stall-rapportage)
+# -----------------------------------------------------
+
+_active: dict[int, dict] = {}   # id(scope) → ASGI scope
+
+
+class ActiveRequestMiddleware:
+    """Pure ASGI-middleware: houdt bij welke requests op de loop lopen."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        key = id(scope)
+        _active[key] = scope
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _active.pop(key, None)
+
+
+def _handler_name(scope: dict) -> str:
+    # Starlette zet de endpoint in de scope zodra de route gematcht is
+    endpoint = scope.get("endpoint")
+    name = getattr(endpoint, "__qualname__", None) or "?"
+    return f"{name} ({scope.get('method')} {scope.get('path')})"
+
+
+def active_handlers() -> list[str]:
+    return [_handler_name(scope) for scope in list(_active.values())]
+
+
+# -----------------------------------------------------
+# Stall monitor
+# -----------------------------------------------------
+
+def _blocking_frame(thread_id: int) -> str:
+    """Diepste frame in onze eigen code op de loop-thread (niet site-packages)."""
+    frame = sys._current_frames().get(thread_id)
+    if frame is None:
+        return "?"
+    stack = traceback.extract_stack(frame)
+    own = [f for f in stack if "site-packages" not in f.filename and "/lib/python" not in f.filename]
+    f = (own or stack)[-1]
+    return f"{os.path.basename(f.filename)}:{f.lineno} in {f.name}"
+
+
+class LoopStallMonitor:
+    def __init__(self, threshold_ms: float = LOOP_STALL_THRESHOLD_MS, interval: float = LOOP_STALL_INTERVAL):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval
+        self.stalls = 0
+        self._beat = time.monotonic()
+        self._reported = False
+        self._loop_thread = None
+        self._task = None
+        self._stop = threading.Event()
+
+    # Heartbeat op de loop: meet ook zelf de vertraging na afloop
+    async def _heartbeat(self):
+        while True:
+            start = time.monotonic()
+            self._beat = start
+            await asyncio.sleep(self.interval)
+            lag = time.monotonic() - start - self.interval
+            if lag > self.threshold:
+                self.stalls += 1
+                print(f"🐢 [LOOP] Event loop {lag * 1000:.0f} ms geblokkeerd")
+            self._reported = False
+
+    # Watchdog-thread: ziet de stall terwijl hij bezig is → stack + handlers
+    def _watchdog(self):
+        while not self._stop.wait(self.interval):
+            stalled = time.monotonic() - self._beat - self.interval
+            if stalled > self.threshold and not self._reported:
+                self._reported = True
+                handlers = ", ".join(active_handlers()) or "geen request"
+                print(
+                    f"🐢 [LOOP] Stall > {self.threshold * 1000:.0f} ms → {handlers} "
+                    f"@ {_blocking_frame(self._loop_thread)}"
+                )
+
+    def start(self):
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        threading.Thread(target=self._watchdog, name="loop-stall-monitor", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+
+
+_monitor: LoopStallMonitor | None = None
+
+
+def start_stall_monitor() -> LoopStallMonitor | None:
+    """Vanuit een async startup-event aanroepen. LOOP_STALL_THRESHOLD_MS=0 → uit."""
+    global _monitor
+    if LOOP_STALL_THRESHOLD_MS <= 0 or _monitor is not None:
+        return _monitor
+    _monitor = LoopStallMonitor()
+    _monitor.start()
+    return _monitor
+
+
+def stop_stall_monitor():
+    global _monitor
+    if _monitor is not None:
+        _monitor.stop()
+        _monitor = None
@@ -1,5 +1,6 @@
 # crud.py
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload
 
 # ---- MODELS ----
 from models.patient import Patient
@@ -159,18 +160,79 @@ def get_maand6_by_id(db: Session, blessure_id: int):
 # =====================================================
 #  T I M E L I N E
 # =====================================================
-def get_timeline(db: Session, blessure_id: int):
-    """Laad blessure + alle gekoppelde testmomenten + patiënt in één query."""
+TIMELINE_FASES = (
+    ("baseline", Baseline),
+    ("week6", Week6),
+    ("maand3", Maand3),
+    ("maand45", Maand45),
+    ("maand6", Maand6),
+)
+
+
+class Timeline:
+    """
+    Volledige tijdlijn van één blessure: blessure, patiënt en de vijf
+    testmomenten (None indien nog niet ingevuld) + aantal blessures van
+    de patiënt. Gedeeld door /timeline en /individueel.
+    """
+
+    __slots__ = ("blessure", "patient", "aantal_blessures") + tuple(attr for attr, _ in TIMELINE_FASES)
+
+    def __init__(self, blessure: Blessure, aantal_blessures: int):
+        self.blessure = blessure
+        self.patient = blessure.patient
+        self.aantal_blessures = aantal_blessures
+        for attr, _ in TIMELINE_FASES:
+            setattr(self, attr, getattr(blessure, attr))
+
+    def fase(self, Model):
+        """Record van een fase-model (Baseline, Week6, …) of None."""
+        return getattr(self, Model.__tablename__)
+
+
+def _timeline_query(db: Session):
+    """Blessure + patiënt + alle fases via LEFT JOINs, aantal blessures als subquery."""
+    andere = aliased(Blessure)
+    aantal = (
+        select(func.count(andere.blessure_id))
+        .where(andere.patient_id == Blessure.patient_id)
+        .correlate(Blessure)
+        .scalar_subquery()
+    )
     return (
-        db.query(Blessure)
+        db.query(Blessure, aantal)
         .options(
-            selectinload(Blessure.patient),
-            selectinload(Blessure.baseline),
-            selectinload(Blessure.week6),
-            selectinload(Blessure.maand3),
-            selectinload(Blessure.maand45),
-            selectinload(Blessure.maand6),
+            joinedload(Blessure.patient),
+            *[joinedload(getattr(Blessure, attr)) for attr, _ in TIMELINE_FASES],
         )
-        .filter(Blessure.blessure_id == blessure_id)
+    )
+
+
+def load_timeline(db: Session, blessure_id: int):
+    """Tijdlijn van één blessure in één round-trip, of None."""
+    row = _timeline_query(db).filter(Blessure.blessure_id == blessure_id).first()
+    return Timeline(*row) if row else None
+
+
+def load_patient_timeline(db: Session, id: int):
+    """
+    Tijdlijn van de eerste blessure van een patiënt, in één round-trip.
+    `id` is een blessure_id (→ diens patiënt) of anders een patient_id.
+    """
+    gevraagd = aliased(Blessure)
+    patient_id = func.coalesce(
+        select(gevraagd.patient_id).where(gevraagd.blessure_id == id).scalar_subquery(),
+        id,
+    )
+    row = (
+        _timeline_query(db)
+        .filter(Blessure.patient_id == patient_id)
+        .order_by(Blessure.blessure_id)
         .first()
     )
+    return Timeline(*row) if row else None
+
+
+def get_timeline(db: Session, blessure_id: int):
+    """Laad blessure + alle gekoppelde testmomenten + patiënt in één query."""
+    return load_timeline(db, blessure_id)
@@ -0,0 +1,345 @@
+# =====================================================
+# FILE: graph_client.py
+# Gedeelde Microsoft Graph HTTP-client (sync + async)
+# =====================================================
+#
+# - Eén connection pool per proces (keep-alive, HTTP/2 indien `h2`
+#   geïnstalleerd is: pip install httpx[http2])
+# - Timeouts op elke call (GRAPH_TIMEOUT, per call te overschrijven)
+# - Retry met exponentiële backoff op 429/503/504 en verbindingsfouten,
+#   met respect voor Retry-After
+# - GRAPH_BASE_URL / GRAPH_LOGIN_URL overschrijfbaar → lokale fake Graph
+
+import asyncio
+import importlib.util
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+import onedrive_auth
+from blocking_io import run_blocking
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+GRAPH_BASE_URL = os.getenv("GRAPH_BASE_URL", "https://graph.microsoft.com/v1.0").rstrip("/")
+GRAPH_LOGIN_URL = os.getenv("GRAPH_LOGIN_URL", "https://login.microsoftonline.com").rstrip("/")
+
+GRAPH_TIMEOUT = float(os.getenv("GRAPH_TIMEOUT", "30"))
+GRAPH_CONNECT_TIMEOUT = float(os.getenv("GRAPH_CONNECT_TIMEOUT", "10"))
+GRAPH_MAX_RETRIES = int(os.getenv("GRAPH_MAX_RETRIES", "4"))
+GRAPH_MAX_BACKOFF = float(os.getenv("GRAPH_MAX_BACKOFF", "30"))
+GRAPH_MAX_CONNECTIONS = int(os.getenv("GRAPH_MAX_CONNECTIONS", "20"))
+
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+RETRY_STATUS = {429, 503, 504}
+BATCH_LIMIT = 20   # max sub-requests per $batch (Graph-limiet)
+IDEMPOTENT = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+
+_lock = threading.Lock()
+_client: httpx.Client | None = None
+_async_clients: dict = {}   # event loop → AsyncClient (pool is per loop)
+
+
+# -----------------------------------------------------
+# Pools
+# -----------------------------------------------------
+
+def _client_kwargs() -> dict:
+    return dict(
+        http2=HTTP2,
+        follow_redirects=True,   # /content → 302 naar download-URL (Authorization wordt gestript)
+        timeout=httpx.Timeout(GRAPH_TIMEOUT, connect=GRAPH_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=GRAPH_MAX_CONNECTIONS,
+            max_keepalive_connections=GRAPH_MAX_CONNECTIONS,
+        ),
+    )
+
+
+def http_client() -> httpx.Client:
+    """Gedeelde sync-client (ook gebruikt voor de tokenservice)."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = httpx.Client(**_client_kwargs())
+    return _client
+
+
+def async_http_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = httpx.AsyncClient(**_client_kwargs())
+    return client
+
+
+def close():
+    """Pools sluiten (shutdown)."""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+async def aclose():
+    close()
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+# -----------------------------------------------------
+# Helpers
+# -----------------------------------------------------
+
+def _url(path: str) -> str:
+    if path.startswith(("http://", "https://")):
+        return path
+    return f"{GRAPH_BASE_URL}/{path.lstrip('/')}"
+
+
+def _headers(headers: dict | None) -> dict:
+    out = {"Authorization": f"Bearer {onedrive_auth.get_access_token()}"}
+    if headers:
+        out.update(headers)
+    return out
+
+
+def _retry_after(r: httpx.Response | None, attempt: int) -> float:
+    """Wachttijd: Retry-After (seconden of HTTP-datum), anders backoff + jitter."""
+    value = r.headers.get("Retry-After") if r is not None else None
+    if value:
+        try:
+            return min(float(value), GRAPH_MAX_BACKOFF)
+        except ValueError:
+            try:
+                return min(max(parsedate_to_datetime(value).timestamp() - time.time(), 0), GRAPH_MAX_BACKOFF)
+            except (TypeError, ValueError):
+                pass
+    return min(0.5 * 2 ** attempt, GRAPH_MAX_BACKOFF) * (0.5 + random.random() / 2)
+
+
+def _should_retry(method: str, attempt: int, r: httpx.Response | None, exc: Exception | None) -> bool:
+    if attempt >= GRAPH_MAX_RETRIES:
+        return False
+    if r is not None:
+        return r.status_code in RETRY_STATUS
+    # Verbinding nooit opgezet → altijd veilig; anders enkel idempotente calls
+    if isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True
+    return isinstance(exc, httpx.TransportError) and method.upper() in IDEMPOTENT
+
+
+def _log_retry(method: str, url: str, attempt: int, delay: float, r, exc):
+    reason = r.status_code if r is not None else type(exc).__name__
+    print(f"🔁 [GRAPH] {method} {url} → {reason}, retry {attempt + 1}/{GRAPH_MAX_RETRIES} over {delay:.1f}s")
+
+
+# -----------------------------------------------------
+# Sync API
+# -----------------------------------------------------
+
+def request(method: str, path: str, *, headers: dict | None = None, timeout=None,
+            stream: bool = False, auth: bool = True, **kwargs) -> httpx.Response:
+    """
+    Graph-call met retry. `path` is relatief t.o.v. GRAPH_BASE_URL of een
+    volledige URL. stream=True → body niet gelezen; caller sluit r.close().
+    """
+    client = http_client()
+    url = _url(path)
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+
+    attempt = 0
+    while True:
+        r = exc = None
+        try:
+            req = client.build_request(method, url, headers=_headers(headers) if auth else headers, **kwargs)
+            r = client.send(req, stream=stream)
+        except httpx.TransportError as e:
+            exc = e
+
+        if not _should_retry(method, attempt, r, exc):
+            if exc is not None:
+                raise exc
+            return r
+
+        delay = _retry_after(r, attempt)
+        _log_retry(method, url, attempt, delay, r, exc)
+        if r is not None:
+            r.close()
+        time.sleep(delay)
+        attempt += 1
+
+
+def get(path: str, **kwargs) -> httpx.Response:
+    return request("GET", path, **kwargs)
+
+
+def put(path: str, **kwargs) -> httpx.Response:
+    return request("PUT", path, **kwargs)
+
+
+def post(path: str, **kwargs) -> httpx.Response:
+    return request("POST", path, **kwargs)
+
+
+def delete(path: str, **kwargs) -> httpx.Response:
+    return request("DELETE", path, **kwargs)
+
+
+# -----------------------------------------------------
+# Async API (voor async FastAPI-routes)
+# -----------------------------------------------------
+
+async def arequest(method: str, path: str, *, headers: dict | None = None, timeout=None,
+                   stream: bool = False, auth: bool = True, **kwargs) -> httpx.Response:
+    client = async_http_client()
+    url = _url(path)
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+
+    attempt = 0
+    while True:
+        r = exc = None
+        try:
+            # Token zit bijna altijd in de cache; verversen is een blocking call
+            req_headers = await run_blocking(_headers, headers) if auth else headers
+            req = client.build_request(method, url, headers=req_headers, **kwargs)
+            r = await client.send(req, stream=stream)
+        except httpx.TransportError as e:
+            exc = e
+
+        if not _should_retry(method, attempt, r, exc):
+            if exc is not None:
+                raise exc
+            return r
+
+        delay = _retry_after(r, attempt)
+        _log_retry(method, url, attempt, delay, r, exc)
+        if r is not None:
+            await r.aclose()
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+async def aget(path: str, **kwargs) -> httpx.Response:
+    return await arequest("GET", path, **kwargs)
+
+
+async def aput(path: str, **kwargs) -> httpx.Response:
+    return await arequest("PUT", path, **kwargs)
+
+
+async def apost(path: str, **kwargs) -> httpx.Response:
+    return await arequest("POST", path, **kwargs)
+
+
+async def adelete(path: str, **kwargs) -> httpx.Response:
+    return await arequest("DELETE", path, **kwargs)
+
+
+# -----------------------------------------------------
+# JSON $batch
+# -----------------------------------------------------
+
+def _failed(result: dict) -> bool:
+    return result["status"] >= 400
+
+
+def _send_batch(chunk: list, results: dict):
+    r = post("/$batch", json={"requests": chunk})
+    if r.status_code != 200:
+        # Volledige batch geweigerd → elke sub-request krijgt die status
+        for sub in chunk:
+            results[sub["id"]] = {"status": r.status_code, "headers": dict(r.headers), "body": None}
+        return
+    for resp in r.json().get("responses", []):
+        results[resp["id"]] = {
+            "status": resp.get("status", 500),
+            "headers": resp.get("headers") or {},
+            "body": resp.get("body"),
+        }
+    for sub in chunk:
+        results.setdefault(sub["id"], {"status": 500, "headers": {}, "body": None})
+
+
+def _run_batches(pending: list, results: dict):
+    """
+    Verdeelt in chunks van BATCH_LIMIT. dependsOn blijft staan als de
+    afhankelijkheid in dezelfde chunk zit; is die al uitgevoerd, dan valt
+    dependsOn weg (of 424 als ze faalde), zoals Graph zelf doet.
+    """
+    chunk, chunk_ids = [], set()
+
+    def flush():
+        if chunk:
+            _send_batch(list(chunk), results)
+            chunk.clear()
+            chunk_ids.clear()
+
+    for sub in pending:
+        deps = sub.get("dependsOn") or []
+        if len(chunk) >= BATCH_LIMIT or any(d not in chunk_ids and d not in results for d in deps):
+            flush()
+
+        if deps and not set(deps) <= chunk_ids:
+            if any(_failed(results[d]) for d in deps if d in results):
+                results[sub["id"]] = {"status": 424, "headers": {}, "body": None}
+                continue
+            sub = {k: v for k, v in sub.items() if k != "dependsOn"}
+            in_chunk = [d for d in deps if d in chunk_ids]
+            if in_chunk:
+                sub["dependsOn"] = in_chunk
+
+        chunk.append(sub)
+        chunk_ids.add(sub["id"])
+
+    flush()
+
+
+def batch(sub_requests: list) -> dict:
+    """
+    Voert sub-requests uit via POST /$batch (max 20 per call).
+
+    sub_requests: [{"id", "method", "url", optioneel "headers", "body",
+    "dependsOn"}] — url relatief t.o.v. de API-versie ("/drive/...").
+    Geeft {id: {"status", "headers", "body"}}. Gethrottlede sub-requests
+    (429/503/504) worden opnieuw verstuurd na Retry-After, samen met
+    hun afhankelijke requests (424).
+    """
+    results: dict = {}
+    pending = list(sub_requests)
+
+    for attempt in range(GRAPH_MAX_RETRIES + 1):
+        _run_batches(pending, results)
+
+        throttled = {sub["id"] for sub in pending if results[sub["id"]]["status"] in RETRY_STATUS}
+        if not throttled or attempt == GRAPH_MAX_RETRIES:
+            break
+
+        # Wachttijd = grootste Retry-After van de gethrottlede sub-responses
+        delay = max(_retry_after(httpx.Response(429, headers=results[sid]["headers"]), attempt) for sid in throttled)
+
+        retry, retry_ids = [], set()
+        for sub in pending:
+            status = results[sub["id"]]["status"]
+            if status in RETRY_STATUS or (status == 424 and set(sub.get("dependsOn") or []) & retry_ids):
+                retry.append(sub)
+                retry_ids.add(sub["id"])
+        for sid in retry_ids:
+            results.pop(sid)
+
+        print(f"🔁 [GRAPH] $batch → {len(throttled)} gethrottled, retry {attempt + 1}/{GRAPH_MAX_RETRIES} over {delay:.1f}s")
+        time.sleep(delay)
+        pending = retry
+
+    return results
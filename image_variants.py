@@ -0,0 +1,152 @@
+# =====================================================
+# FILE: image_variants.py
+# Vooraf gerenderde afgeleiden van oefenfoto's (thumb / pdf / full)
+# =====================================================
+#
+# - "full"  = het origineel zelf (na upload-compressie, max 1600px)
+# - "thumb" = editor-thumbnail
+# - "pdf"   = exact de maat van een fotocel in make_pdf (4 cm hoog)
+# Afgeleiden staan naast het origineel op OneDrive (foto.jpg → foto.thumb.jpg)
+# en in de lokale media-cache. Bij upload meteen aangemaakt; ontbreken ze
+# (templatecopy, oude foto's) → eenmalig uit het origineel gemaakt: renderen
+# in de image process pool, upload naar OneDrive op de achtergrond.
+
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import PurePosixPath
+
+from PIL import Image
+from reportlab.lib.units import cm
+
+from blocking_io import blocking_pool
+from media_access import read_media
+from media_cache import store_bytes
+
+# naam → (max. box in px, JPEG-kwaliteit)
+VARIANTS = {
+    "thumb": ((320, 320), 80),
+    "pdf": ((1000, 4 * cm), 90),
+}
+FULL = "full"
+
+
+def is_variant(name: str | None) -> bool:
+    return name in VARIANTS or name == FULL
+
+
+def variant_path(path: str, variant: str) -> str:
+    """RevoSport/…/foto.jpg → RevoSport/…/foto.<variant>.jpg (full → origineel)."""
+    if variant == FULL:
+        return path
+    p = PurePosixPath(path)
+    return str(p.with_name(f"{p.stem}.{variant}.jpg"))
+
+
+# -----------------------------------------------------
+# Image process pool (PIL is CPU-werk; gedeeld met uploads.py)
+# -----------------------------------------------------
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_pool_lock = threading.Lock()
+_image_pool: ProcessPoolExecutor | None = None
+
+
+def image_pool() -> ProcessPoolExecutor:
+    global _image_pool
+    with _pool_lock:
+        if _image_pool is None:
+            _image_pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+        return _image_pool
+
+
+def reset_image_pool():
+    """Worker gecrasht → pool opnieuw opbouwen bij het volgende beeld."""
+    global _image_pool
+    with _pool_lock:
+        _image_pool = None
+
+
+def shutdown_image_pool():
+    global _image_pool
+    with _pool_lock:
+        pool, _image_pool = _image_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_in_image_pool(fn, *args):
+    """fn(*args) in de image pool en wachten (sync aanroepers; fallback: deze thread)."""
+    try:
+        return image_pool().submit(fn, *args).result()
+    except BrokenProcessPool:
+        print("⚠️ IMAGE POOL kapot → beeld in thread")
+        reset_image_pool()
+        return fn(*args)
+
+
+# -----------------------------------------------------
+# Renderen (CPU — in de image pool)
+# -----------------------------------------------------
+
+def render_variant(data: bytes, variant: str) -> bytes | None:
+    box, quality = VARIANTS[variant]
+    try:
+        img = Image.open(io.BytesIO(data)).convert("RGB")
+    except Exception as e:
+        print(f"❌ [VARIANT] Kan beeld niet openen ({variant}):", e)
+        return None
+
+    img.thumbnail(box)
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+
+def render_variants(data: bytes) -> dict[str, bytes]:
+    out = {}
+    for name in VARIANTS:
+        b = render_variant(data, name)
+        if b:
+            out[name] = b
+    return out
+
+
+# -----------------------------------------------------
+# Ophalen (cache/OneDrive via media_access → uit origineel genereren)
+# -----------------------------------------------------
+
+def _upload_variant(data: bytes, vpath: str):
+    try:
+        from onedrive_service import upload_bytes
+        upload_bytes(data, vpath, content_type="image/jpeg")
+    except Exception as e:
+        print(f"⚠️ [VARIANT] Upload {vpath} mislukt:", e)
+
+
+def ensure_variant(path: str, variant: str, original: bytes | None = None) -> bytes | None:
+    """
+    Bytes van de afgeleide; bestaat ze nog nergens → uit het origineel
+    renderen (image pool), lokaal bewaren en meteen teruggeven. De upload
+    naast het origineel loopt op de achtergrond (best effort).
+    """
+    if variant == FULL:
+        return original or read_media(path)
+
+    vpath = variant_path(path, variant)
+    data = read_media(vpath)
+    if data is not None:
+        return data
+
+    original = original or read_media(path)
+    if original is None:
+        return None
+    data = run_in_image_pool(render_variant, original, variant)
+    if data is None:
+        return None
+
+    store_bytes(vpath, data)
+    blocking_pool().submit(_upload_variant, data, vpath)
+    return data
@@ -37,6 +37,14 @@ from routers.oefenschema import router as oefenschema_router
 # Auth dependency
 from security import get_current_user
 
+import blocking_io
+import graph_client
+import media_cache
+import password_pool
+from routers import mail_outbox
+from routers.oefenschema import mail_template, pdf_jobs
+from image_variants import shutdown_image_pool
+
 # =====================================================
 # APP CONFIG
 # =====================================================
@@ -68,6 +76,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Actieve handlers bijhouden → event-loop stalls kunnen benoemd worden
+app.add_middleware(blocking_io.ActiveRequestMiddleware)
+
 # =====================================================
 # STATIC FILES
 # =====================================================
@@ -125,6 +136,22 @@ def home():
 # STARTUP MESSAGE
 # =====================================================
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
     print(Fore.GREEN + "WELKOM TERUG." + Style.RESET_ALL)
     print(Fore.CYAN + "🌐 Swagger Docs: (jouw backend URL)/docs" + Style.RESET_ALL)
+    media_cache.rebuild_index()
+    blocking_io.start_stall_monitor()
+    pdf_jobs.start()
+    mail_outbox.start()
+    mail_template.load()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    blocking_io.stop_stall_monitor()
+    await graph_client.aclose()
+    shutdown_image_pool()
+    password_pool.shutdown()
+    pdf_jobs.shutdown()
+    mail_outbox.shutdown()
+    blocking_io.shutdown_blocking_pool()
@@ -0,0 +1,138 @@
+# =====================================================
+# FILE: media_access.py
+# In-process toegang tot OneDrive-media: lokale cache → Graph
+# =====================================================
+#
+# Gedeeld door de media-proxy (/media/file) en de PDF-builder. Zelfde
+# cachebestanden, versheid, eTag-metadata en single-flight als de proxy,
+# maar zonder HTTP-hop naar de eigen API.
+
+import os
+import time
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+import graph_client
+from media_cache import (
+    cache_path_for,
+    finish_flight,
+    join_flight,
+    read_cache_meta,
+    store_bytes,
+    touch,
+    wait_flight,
+)
+
+CACHE_TTL_HOURS = 72   # 3 dagen
+
+
+# -----------------------------------------------------
+# Versheid + Graph-validators
+# -----------------------------------------------------
+
+def is_fresh(cache_file) -> bool:
+    try:
+        age = datetime.now() - datetime.fromtimestamp(cache_file.stat().st_mtime)
+    except OSError:
+        return False
+    return age < timedelta(hours=CACHE_TTL_HOURS)
+
+
+def quote_etag(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    return tag if tag.startswith('"') else f'"{tag}"'
+
+
+def graph_etag(r: httpx.Response):
+    """eTag van de Graph-download (ook uit de redirect-keten)."""
+    for resp in (r, *r.history):
+        if resp.headers.get("ETag"):
+            return quote_etag(resp.headers["ETag"])
+    return None
+
+
+def graph_last_modified(r: httpx.Response) -> float:
+    try:
+        return parsedate_to_datetime(r.headers["Last-Modified"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return time.time()
+
+
+def _is_html(data: bytes) -> bool:
+    return data[:5].lower() in (b"<html", b"<!doc")
+
+
+def _read_cached(cache_file) -> bytes | None:
+    try:
+        data = cache_file.read_bytes()
+    except OSError:
+        return None
+    if not data or _is_html(data):
+        return None
+    touch(cache_file)
+    return data
+
+
+# -----------------------------------------------------
+# Bytes ophalen (main API)
+# -----------------------------------------------------
+
+def read_media(clean_path: str, timeout: float = 20) -> bytes | None:
+    """
+    Volledige inhoud van een (genormaliseerd) OneDrive-pad. Verse cache →
+    meteen; verlopen → conditionele Graph-request (304 verlengt de cache);
+    ontbrekend → download + cachen. None bij 404/fout.
+    """
+    if not clean_path:
+        return None
+
+    cache_file = cache_path_for(clean_path)
+    if is_fresh(cache_file):
+        data = _read_cached(cache_file)
+        if data is not None:
+            return data
+
+    flight = None
+    try:
+        # Single-flight met de proxy: loopt er al een download → wachten
+        for _ in range(2):
+            flight, leader = join_flight(cache_file)
+            if leader:
+                break
+            wait_flight(flight)
+            flight = None
+            if is_fresh(cache_file):
+                data = _read_cached(cache_file)
+                if data is not None:
+                    return data
+
+        headers = {}
+        etag = read_cache_meta(cache_file).get("etag") if cache_file.exists() else None
+        if etag:
+            headers["If-None-Match"] = etag
+
+        try:
+            r = graph_client.get(f"/drive/root:/{clean_path}:/content", headers=headers, timeout=timeout)
+        except Exception as e:
+            print(f"❌ [MEDIA] Graph fout {clean_path}:", e)
+            return None
+
+        if r.status_code == 304:
+            os.utime(cache_file, None)
+            return _read_cached(cache_file)
+
+        if r.status_code != 200 or not r.content or _is_html(r.content):
+            if r.status_code != 404:
+                print(f"❌ [MEDIA] {clean_path} → status {r.status_code}")
+            return None
+
+        store_bytes(clean_path, r.content, {"etag": graph_etag(r), "last_modified": graph_last_modified(r)})
+        return r.content
+
+    finally:
+        if flight:
+            finish_flight(cache_file, flight)
@@ -2,24 +2,258 @@
 # FILE: media_cache.py
 # Helpers voor media-cache (gedeeld door proxy + upload)
 # =====================================================
+#
+# Layout: cache_media/ab/cd/<sha1(pad)><ext> (+ <bestand>.meta)
+# - Bytebudget (MEDIA_CACHE_MAX_BYTES) met LRU-eviction op atime
+# - Index in geheugen, bij startup opnieuw opgebouwd uit de schijf
+# - Schrijven altijd via tijdelijk bestand + os.replace (atomair)
 
+from collections import OrderedDict
 from pathlib import Path
+import hashlib
+import json
 import os
+import threading
+import time
 
 # -----------------------------
-# CACHE MAP
+# CACHE MAP + CONFIG
 # -----------------------------
-CACHE_DIR = Path("cache_media")
+CACHE_DIR = Path(os.getenv("MEDIA_CACHE_DIR", "cache_media"))
 CACHE_DIR.mkdir(exist_ok=True)
 
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# Na eviction tot hier terug (hysterese → niet bij elke write evicten)
+LOW_WATERMARK = 0.9
+
+META_SUFFIX = ".meta"
+PART_SUFFIX = ".part"
+
+# Oude platte layout: cache_media/RevoSport_<pad_met_underscores>[.meta]
+LEGACY_PREFIX = "RevoSport_"
+LAYOUT_MARKER = ".layout-v2"
+
 
 # -----------------------------
 # CACHE PAD GENEREREN
 # -----------------------------
+def cache_key(file_path: str) -> str:
+    return file_path.strip("/").replace("%2F", "/")
+
+
 def cache_path_for(file_path: str) -> Path:
-    clean = file_path.strip("/").replace("%2F", "/")
-    safe = clean.replace("/", "_")
-    return CACHE_DIR / safe
+    clean = cache_key(file_path)
+    digest = hashlib.sha1(clean.encode("utf-8")).hexdigest()
+    return CACHE_DIR / digest[:2] / digest[2:4] / f"{digest}{Path(clean).suffix.lower()}"
+
+
+def temp_path_for(cache_file: Path) -> Path:
+    """Uniek tijdelijk pad naast het doelbestand (per proces + thread)."""
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    return cache_file.with_name(f".{cache_file.name}.{os.getpid()}.{threading.get_ident()}{PART_SUFFIX}")
+
+
+# -----------------------------
+# LRU-INDEX
+# -----------------------------
+_lock = threading.Lock()
+_index: "OrderedDict[Path, int]" = OrderedDict()   # pad → bytes, oudste eerst
+_total = 0
+_loaded = False
+
+
+def _is_data_file(p: Path) -> bool:
+    return not p.name.startswith(".") and not p.name.endswith((META_SUFFIX, PART_SUFFIX))
+
+
+def rebuild_index():
+    """
+    Scant de cache-map en bouwt de LRU-index opnieuw op (volgorde: atime).
+    Ruimt achtergebleven .part-bestanden en (eenmalig) de oude platte layout op.
+    """
+    global _total, _loaded
+
+    _migrate_legacy_layout()
+
+    entries = []
+
+    for p in CACHE_DIR.glob("*/*/*"):
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        if p.name.endswith(PART_SUFFIX):
+            if time.time() - st.st_mtime > 3600:
+                p.unlink(missing_ok=True)
+            continue
+        if _is_data_file(p):
+            entries.append((st.st_atime, p, st.st_size))
+
+    entries.sort(key=lambda e: e[0])
+
+    with _lock:
+        _index.clear()
+        for _, p, size in entries:
+            _index[p] = size
+        _total = sum(_index.values())
+        _loaded = True
+
+    print(f"🗂️ [CACHE] Index opgebouwd → {len(entries)} bestanden, {_total / 1024 ** 2:.1f} MB")
+
+
+def _migrate_legacy_layout():
+    """Eenmalig: bestanden van de oude platte layout verwijderen (onbereikbaar)."""
+    marker = CACHE_DIR / LAYOUT_MARKER
+    if marker.exists():
+        return
+    removed = 0
+    for p in CACHE_DIR.iterdir():
+        if p.is_file() and p.name.startswith(LEGACY_PREFIX):
+            p.unlink(missing_ok=True)
+            removed += 1
+    marker.touch()
+    if removed:
+        print(f"🧹 [CACHE] {removed} bestand(en) van de oude layout verwijderd")
+
+
+def _ensure_index():
+    if not _loaded:
+        rebuild_index()
+
+
+def _remove(p: Path):
+    global _total
+    _total -= _index.pop(p, 0)
+    p.unlink(missing_ok=True)
+    meta_path_for(p).unlink(missing_ok=True)
+
+
+def _evict():
+    """LRU-eviction tot onder de low watermark (onder _lock aanroepen)."""
+    target = int(MEDIA_CACHE_MAX_BYTES * LOW_WATERMARK)
+    removed = 0
+    while _total > target and _index:
+        oldest = next(iter(_index))
+        _remove(oldest)
+        removed += 1
+    if removed:
+        print(f"🧹 [CACHE] {removed} bestand(en) verwijderd (LRU) → {_total / 1024 ** 2:.1f} MB")
+
+
+def touch(cache_file: Path):
+    """Cache-hit registreren: atime bijwerken (mtime = TTL blijft) + LRU-volgorde."""
+    _ensure_index()
+    try:
+        st = cache_file.stat()
+        os.utime(cache_file, (time.time(), st.st_mtime))
+    except OSError:
+        return
+    with _lock:
+        _index[cache_file] = st.st_size
+        _index.move_to_end(cache_file)
+
+
+def _register(cache_file: Path):
+    global _total
+    _ensure_index()
+    size = cache_file.stat().st_size
+
+    # Enkel de eigen index: bestanden van andere workers telt elk proces
+    # pas mee na de volgende rebuild_index() (startup)
+    with _lock:
+        _total += size - _index.pop(cache_file, 0)
+        _index[cache_file] = size
+        if _total > MEDIA_CACHE_MAX_BYTES:
+            _evict()
+
+
+# -----------------------------
+# ATOMAIR SCHRIJVEN
+# -----------------------------
+def commit_file(tmp: Path, cache_file: Path, meta: dict | None = None):
+    """Tijdelijk bestand atomair op zijn plaats zetten + index/budget bijwerken."""
+    os.replace(tmp, cache_file)
+    if meta is not None:
+        write_cache_meta(cache_file, meta)
+    _register(cache_file)
+
+
+def store_bytes(file_path: str, content: bytes, meta: dict | None = None) -> Path:
+    cache_file = cache_path_for(file_path)
+    tmp = temp_path_for(cache_file)
+    try:
+        tmp.write_bytes(content)
+        commit_file(tmp, cache_file, meta)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return cache_file
+
+
+# -----------------------------
+# SINGLE-FLIGHT: gelijktijdige misses voor hetzelfde pad → 1 download
+# -----------------------------
+# Enkel binnen één proces; een leider die niet afrondt (crash, nooit
+# gestarte stream) wordt na de timeout overgenomen.
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("MEDIA_SINGLE_FLIGHT_TIMEOUT", "30"))
+
+
+class Flight:
+    __slots__ = ("done", "started")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.started = time.monotonic()
+
+
+_flight_lock = threading.Lock()
+_flights: dict[Path, Flight] = {}
+
+
+def join_flight(cache_file: Path) -> tuple[Flight, bool]:
+    """
+    (flight, leader). De leider haalt op en roept finish_flight() aan,
+    de anderen wachten via wait_flight() en lezen daarna de cache.
+    """
+    with _flight_lock:
+        flight = _flights.get(cache_file)
+        if flight is None or time.monotonic() - flight.started > SINGLE_FLIGHT_TIMEOUT:
+            flight = _flights[cache_file] = Flight()
+            return flight, True
+        return flight, False
+
+
+def finish_flight(cache_file: Path, flight: Flight):
+    with _flight_lock:
+        if _flights.get(cache_file) is flight:
+            del _flights[cache_file]
+    flight.done.set()
+
+
+def wait_flight(flight: Flight) -> bool:
+    remaining = SINGLE_FLIGHT_TIMEOUT - (time.monotonic() - flight.started)
+    return flight.done.wait(max(remaining, 0))
+
+
+# -----------------------------
+# METADATA (Graph eTag + Last-Modified) naast het cachebestand
+# -----------------------------
+def meta_path_for(cache_file: Path) -> Path:
+    return cache_file.with_name(f"{cache_file.name}{META_SUFFIX}")
+
+
+def read_cache_meta(cache_file: Path) -> dict:
+    try:
+        return json.loads(meta_path_for(cache_file).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def write_cache_meta(cache_file: Path, meta: dict):
+    meta_path = meta_path_for(cache_file)
+    tmp = temp_path_for(meta_path)
+    tmp.write_text(json.dumps(meta))
+    os.replace(tmp, meta_path)
 
 
 # -----------------------------
@@ -33,11 +267,14 @@ def delete_cache_for(file_path: str | None):
 
     if p.exists():
         try:
-            p.unlink()
+            with _lock:
+                _remove(p)
             print(f"🗑️ [CACHE] Verwijderd → {p}")
         except:
             pass
 
+    meta_path_for(p).unlink(missing_ok=True)
+
 
 # -----------------------------
 # VERWIJDER CACHE VIA OUDE NAAM (fallback)
@@ -0,0 +1,37 @@
+# =====================================================
+# FILE: models/mail.py
+# Revo Sport — Mail-outbox (wachtrij voor de SMTP-worker)
+# =====================================================
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, LargeBinary
+from sqlalchemy.dialects.mysql import LONGBLOB
+from datetime import datetime
+from db import Base
+
+
+class MailOutbox(Base):
+    __tablename__ = "mail_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Enveloppe (To + CC, komma-gescheiden) + volledig opgebouwd MIME-bericht
+    sender = Column(String(190), nullable=False)
+    recipients = Column(Text, nullable=False)
+    subject = Column(String(255))
+    message = Column(LargeBinary().with_variant(LONGBLOB, "mysql"), nullable=False)
+
+    # Herkomst, bv. "schema:12" (enkel informatief)
+    context = Column(String(100))
+
+    # Wacht op een PDF-job (bulk): bijlage wordt toegevoegd zodra die klaar is
+    pdf_job_id = Column(String(32), index=True)
+
+    # (waiting →) queued → sending → sent | failed
+    status = Column(String(16), nullable=False, default="queued", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_error = Column(Text)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    claimed_at = Column(DateTime)
+    sent_at = Column(DateTime)
@@ -3,7 +3,7 @@
 # Revo Sport — Oefenschema-module (Corrected & Unified)
 # =====================================================
 
-from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from db import Base
@@ -124,3 +124,32 @@ class TemplateOefening(Base):
     foto2 = Column(String(500))
 
     template = relationship("TemplateOefen", back_populates="oefeningen")
+
+
+# =====================================================
+# 🔹 PdfJob (achtergrond-generatie van schema-PDF's)
+# =====================================================
+class PdfJob(Base):
+    __tablename__ = "pdf_jobs"
+    __table_args__ = (
+        # Zelfde schema + zelfde inhoud → zelfde job (dedupe)
+        UniqueConstraint("schema_id", "content_hash", name="uq_pdf_jobs_schema_content"),
+    )
+
+    id = Column(String(32), primary_key=True)
+    schema_id = Column(Integer, ForeignKey("oefenschemas.id", ondelete="CASCADE"), index=True, nullable=False)
+
+    # Oefenschema.updated_at op het moment van enqueue
+    source_version = Column(DateTime, nullable=True)
+
+    # Hash van de PDF-inhoud (zie routers/oefenschema/pdf_cache.py)
+    content_hash = Column(String(64), nullable=False)
+
+    # queued → running → done | failed
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    pdf_path = Column(String(500))
+    error = Column(Text)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
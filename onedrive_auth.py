@@ -4,10 +4,12 @@
 # =====================================================
 
 import os
-import requests
+import threading
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
+import graph_client
+
 load_dotenv()
 
 CLIENT_ID = os.getenv("CLIENT_ID")
@@ -20,6 +22,9 @@ TOKEN_CACHE = {
     "expires_at": None,
 }
 
+# Gelijktijdige requests bij een verlopen token → slechts 1 refresh
+_token_lock = threading.Lock()
+
 
 def get_access_token():
     """
@@ -27,14 +32,25 @@ def get_access_token():
     Cached token tot ±5 min voor verval.
     """
     # Token nog geldig?
-    if (
+    if _token_valid():
+        return TOKEN_CACHE["access_token"]
+
+    with _token_lock:
+        if _token_valid():
+            return TOKEN_CACHE["access_token"]
+        return _refresh_token()
+
+
+def _token_valid() -> bool:
+    return bool(
         TOKEN_CACHE["access_token"]
         and TOKEN_CACHE["expires_at"]
         and TOKEN_CACHE["expires_at"] > datetime.utcnow()
-    ):
-        return TOKEN_CACHE["access_token"]
+    )
+
 
-    url = f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token"
+def _refresh_token():
+    url = f"{graph_client.GRAPH_LOGIN_URL}/{TENANT_ID}/oauth2/v2.0/token"
 
     data = {
         "client_id": CLIENT_ID,
@@ -43,7 +59,7 @@ def get_access_token():
         "grant_type": "client_credentials",
     }
 
-    response = requests.post(url, data=data)
+    response = graph_client.post(url, data=data, auth=False, timeout=15)
     response.raise_for_status()
 
     token_data = response.json()
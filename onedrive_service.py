@@ -3,11 +3,17 @@
 # OneDrive service — FINAL STABLE & CORRECT VERSION
 # =====================================================
 
+import asyncio
 import os
-import requests
+import threading
+import time
+from urllib.parse import quote
+
+import httpx
 from fastapi import UploadFile
 from dotenv import load_dotenv
-from onedrive_auth import get_access_token
+
+import graph_client
 
 load_dotenv()
 
@@ -16,6 +22,144 @@ BASE_FOLDER = "RevoSport/Oefenschema"
 TEMPLATE_FOLDER = f"{BASE_FOLDER}/Templates"
 SCHEMA_FOLDER = f"{BASE_FOLDER}/Schemas"
 
+# Simple PUT .../content kan max. 4 MB aan → daarboven een upload session
+SIMPLE_UPLOAD_LIMIT = 4 * 1024 * 1024
+
+# Chunks moeten een veelvoud van 320 KiB zijn (Graph-eis); standaard 5 MiB
+UPLOAD_CHUNK_UNIT = 320 * 1024
+UPLOAD_CHUNK_SIZE = max(
+    int(os.getenv("ONEDRIVE_UPLOAD_CHUNK", str(16 * UPLOAD_CHUNK_UNIT))) // UPLOAD_CHUNK_UNIT,
+    1,
+) * UPLOAD_CHUNK_UNIT
+UPLOAD_CHUNK_TIMEOUT = float(os.getenv("ONEDRIVE_UPLOAD_CHUNK_TIMEOUT", "120"))
+
+# Server-side /copy: maximale wachttijd op de monitor-URL's
+COPY_TIMEOUT = float(os.getenv("ONEDRIVE_COPY_TIMEOUT", "60"))
+
+
+# =====================================================
+# KNOWN FOLDERS CACHE
+# =====================================================
+# Per proces: map → (vervalt_op, bestaat). Positief → geen GET/PUT meer
+# vóór een upload; negatief (net verwijderd / 404) → meteen aanmaken.
+# TTL als vangnet voor wijzigingen buiten deze worker om.
+FOLDER_CACHE_TTL = float(os.getenv("ONEDRIVE_FOLDER_CACHE_TTL", "600"))
+
+_folder_lock = threading.Lock()
+_folders: dict[str, tuple[float, bool]] = {}
+
+
+def _folder_known(folder: str) -> bool | None:
+    with _folder_lock:
+        entry = _folders.get(folder)
+    if entry is None or entry[0] < time.monotonic():
+        return None
+    return entry[1]
+
+
+def _remember_folder(folder: str, exists: bool):
+    expires = time.monotonic() + FOLDER_CACHE_TTL
+    with _folder_lock:
+        _folders[folder] = (expires, exists)
+        if exists:
+            # Bestaat de map, dan ook al haar ouders
+            parts = folder.split("/")
+            for i in range(1, len(parts)):
+                _folders[("/".join(parts[:i]))] = (expires, True)
+
+
+def forget_folder(path: str, exists: bool | None = None):
+    """
+    Cache ongeldig maken voor een pad en alles eronder (na een delete).
+    exists=False → als negatieve entry bewaren.
+    """
+    clean = path.strip("/")
+    with _folder_lock:
+        for key in [k for k in _folders if k == clean or k.startswith(clean + "/")]:
+            del _folders[key]
+    if exists is not None:
+        _remember_folder(clean, exists)
+
+
+def _parent_of(path: str) -> str:
+    return "/".join(path.strip("/").split("/")[:-1])
+
+
+# =====================================================
+# FOLDER ENSURE
+# =====================================================
+def ensure_folder(folder: str):
+    folder = folder.strip("/")
+    known = _folder_known(folder)
+    if not folder or known:
+        return
+
+    create_url = f"/drive/root:/{folder}"
+
+    if known is None:
+        check = graph_client.get(create_url)
+        if check.status_code == 200:
+            _remember_folder(folder, True)
+            return
+        if check.status_code != 404:
+            return
+        _remember_folder(folder, False)
+
+    r = graph_client.put(create_url, json={})
+    if r.status_code in (200, 201):
+        _remember_folder(folder, True)
+
+
+async def ensure_folder_async(folder: str):
+    folder = folder.strip("/")
+    known = _folder_known(folder)
+    if not folder or known:
+        return
+
+    create_url = f"/drive/root:/{folder}"
+
+    if known is None:
+        check = await graph_client.aget(create_url)
+        if check.status_code == 200:
+            _remember_folder(folder, True)
+            return
+        if check.status_code != 404:
+            return
+        _remember_folder(folder, False)
+
+    r = await graph_client.aput(create_url, json={})
+    if r.status_code in (200, 201):
+        _remember_folder(folder, True)
+
+
+def ensure_folders(folders) -> None:
+    """
+    Maakt meerdere mappen in één keer aan: onbekende mappen worden in één
+    $batch gecontroleerd, enkel de ontbrekende krijgen nog een PUT.
+    """
+    unknown = []
+    for folder in dict.fromkeys(f.strip("/") for f in folders if f):
+        known = _folder_known(folder)
+        if known is None:
+            unknown.append(folder)
+        elif known is False:
+            ensure_folder(folder)
+
+    if not unknown:
+        return
+
+    results = graph_client.batch([
+        {"id": str(i), "method": "GET", "url": f"{_item_url(f)}?$select=id"}
+        for i, f in enumerate(unknown)
+    ])
+    for i, folder in enumerate(unknown):
+        status = results[str(i)]["status"]
+        if status == 200:
+            _remember_folder(folder, True)
+        elif status == 404:
+            _remember_folder(folder, False)
+            ensure_folder(folder)
+
 
 # =====================================================
 # CORRECTE SIGNATURE:
@@ -30,43 +174,243 @@ def upload_bytes(content: bytes, path: str, content_type: str = "application/oct
     if not isinstance(path, str):
         raise ValueError("upload_bytes: path must be string")
 
-    token = get_access_token()
     clean = path.lstrip("/")
 
     # -----------------------------------------------
-    # Parent folder ensure
+    # Parent folder ensure (gecachet)
     # -----------------------------------------------
-    folder = "/".join(clean.split("/")[:-1])
-    create_url = f"https://graph.microsoft.com/v1.0/drive/root:/{folder}"
-
-    check = requests.get(create_url, headers={"Authorization": f"Bearer {token}"})
-    if check.status_code == 404:
-        requests.put(
-            create_url,
-            headers={
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json",
-            },
-            json={},
-        )
+    ensure_folder(_parent_of(clean))
+
+    # -----------------------------------------------
+    # Groot bestand → upload session in chunks
+    # -----------------------------------------------
+    if len(content) > SIMPLE_UPLOAD_LIMIT:
+        view = memoryview(content)
+        _upload_session(clean, len(content), lambda offset, n: view[offset:offset + n])
+        _remember_folder(_parent_of(clean), True)
+        return clean
 
     # -----------------------------------------------
     # Upload content
     # -----------------------------------------------
-    upload_url = f"https://graph.microsoft.com/v1.0/drive/root:/{clean}:/content"
+    r = graph_client.put(
+        f"/drive/root:/{clean}:/content",
+        headers={"Content-Type": content_type},
+        content=content,
+    )
 
-    r = requests.put(
-        upload_url,
-        headers={"Authorization": f"Bearer {token}", "Content-Type": content_type},
-        data=content,
+    if r.status_code not in (200, 201):
+        raise Exception(f"OneDrive upload error {r.status_code}: {r.text}")
+
+    # Upload gelukt → parent bestaat zeker (Graph maakt ontbrekende aan)
+    _remember_folder(_parent_of(clean), True)
+
+    return clean
+
+
+async def upload_bytes_async(content: bytes, path: str, content_type: str = "application/octet-stream") -> str:
+    """Zelfde als upload_bytes, via de async Graph-client (voor async routes)."""
+    if isinstance(path, (bytes, bytearray)):
+        path = path.decode("utf-8")
+
+    if not isinstance(path, str):
+        raise ValueError("upload_bytes: path must be string")
+
+    clean = path.lstrip("/")
+
+    await ensure_folder_async(_parent_of(clean))
+
+    if len(content) > SIMPLE_UPLOAD_LIMIT:
+        view = memoryview(content)
+
+        async def read_at(offset: int, n: int):
+            return view[offset:offset + n]
+
+        await _upload_session_async(clean, len(content), read_at)
+        _remember_folder(_parent_of(clean), True)
+        return clean
+
+    r = await graph_client.aput(
+        f"/drive/root:/{clean}:/content",
+        headers={"Content-Type": content_type},
+        content=content,
     )
 
     if r.status_code not in (200, 201):
         raise Exception(f"OneDrive upload error {r.status_code}: {r.text}")
 
+    # Upload gelukt → parent bestaat zeker (Graph maakt ontbrekende aan)
+    _remember_folder(_parent_of(clean), True)
+
     return clean
 
 
+# =====================================================
+# UPLOAD SESSION (grote bestanden, hervatbaar, in chunks)
+# =====================================================
+# Enkel het huidige chunk zit in het geheugen. Mislukt een chunk, dan
+# vragen we de sessie op welke bytes de server al heeft (nextExpectedRanges)
+# en gaan we vanaf daar verder i.p.v. opnieuw vanaf 0. Verlopen sessie → nieuwe.
+def _session_url(clean: str) -> str:
+    return f"/drive/root:/{clean}:/createUploadSession"
+
+
+_SESSION_BODY = {"item": {"@microsoft.graph.conflictBehavior": "replace"}}
+
+
+def _next_offset(info: dict, size: int) -> int:
+    ranges = info.get("nextExpectedRanges") or []
+    return int(ranges[0].split("-")[0]) if ranges else size
+
+
+def _chunk_headers(offset: int, length: int, size: int) -> dict:
+    return {"Content-Range": f"bytes {offset}-{offset + length - 1}/{size}"}
+
+
+def _session_backoff(failures: int) -> float:
+    return min(2 ** failures, graph_client.GRAPH_MAX_BACKOFF)
+
+
+def _create_upload_session(clean: str) -> str:
+    r = graph_client.post(_session_url(clean), json=_SESSION_BODY)
+    if r.status_code != 200:
+        raise Exception(f"OneDrive upload session error {r.status_code}: {r.text}")
+    return r.json()["uploadUrl"]
+
+
+def _upload_session(clean: str, size: int, read_at) -> dict:
+    """
+    Upload `size` bytes via een upload session. read_at(offset, n) geeft
+    de bytes op die positie. Geeft het driveItem van het resultaat.
+    """
+    upload_url = _create_upload_session(clean)
+    offset = failures = 0
+
+    while True:
+        chunk = read_at(offset, min(UPLOAD_CHUNK_SIZE, size - offset))
+        r = None
+        if len(chunk):
+            try:
+                # uploadUrl is pre-authenticated → geen token meesturen
+                r = graph_client.put(
+                    upload_url,
+                    auth=False,
+                    content=bytes(chunk),
+                    headers=_chunk_headers(offset, len(chunk), size),
+                    timeout=UPLOAD_CHUNK_TIMEOUT,
+                )
+            except httpx.TransportError as e:
+                print(f"⚠️ [ONEDRIVE] Chunk @ {offset} mislukt: {e}")
+
+        if r is not None and r.status_code in (200, 201):
+            return r.json()
+        if r is not None and r.status_code == 202:
+            offset, failures = _next_offset(r.json(), size), 0
+            continue
+
+        failures += 1
+        if failures > graph_client.GRAPH_MAX_RETRIES:
+            graph_client.delete(upload_url, auth=False)
+            detail = f"{r.status_code}: {r.text}" if r is not None else "verbinding"
+            raise Exception(f"OneDrive upload error {detail} ({clean} @ {offset}/{size})")
+
+        time.sleep(_session_backoff(failures))
+
+        # Hervatten vanaf wat de server al ontvangen heeft
+        status = graph_client.get(upload_url, auth=False)
+        if status.status_code == 200:
+            offset = _next_offset(status.json(), size)
+        elif status.status_code == 404:
+            print(f"🔁 [ONEDRIVE] Upload session verlopen → opnieuw ({clean})")
+            upload_url, offset = _create_upload_session(clean), 0
+
+
+async def _create_upload_session_async(clean: str) -> str:
+    r = await graph_client.apost(_session_url(clean), json=_SESSION_BODY)
+    if r.status_code != 200:
+        raise Exception(f"OneDrive upload session error {r.status_code}: {r.text}")
+    return r.json()["uploadUrl"]
+
+
+async def _upload_session_async(clean: str, size: int, read_at) -> dict:
+    """Async variant van _upload_session; read_at is een coroutine-functie."""
+    upload_url = await _create_upload_session_async(clean)
+    offset = failures = 0
+
+    while True:
+        chunk = await read_at(offset, min(UPLOAD_CHUNK_SIZE, size - offset))
+        r = None
+        if len(chunk):
+            try:
+                r = await graph_client.aput(
+                    upload_url,
+                    auth=False,
+                    content=bytes(chunk),
+                    headers=_chunk_headers(offset, len(chunk), size),
+                    timeout=UPLOAD_CHUNK_TIMEOUT,
+                )
+            except httpx.TransportError as e:
+                print(f"⚠️ [ONEDRIVE] Chunk @ {offset} mislukt: {e}")
+
+        if r is not None and r.status_code in (200, 201):
+            return r.json()
+        if r is not None and r.status_code == 202:
+            offset, failures = _next_offset(r.json(), size), 0
+            continue
+
+        failures += 1
+        if failures > graph_client.GRAPH_MAX_RETRIES:
+            await graph_client.adelete(upload_url, auth=False)
+            detail = f"{r.status_code}: {r.text}" if r is not None else "verbinding"
+            raise Exception(f"OneDrive upload error {detail} ({clean} @ {offset}/{size})")
+
+        await asyncio.sleep(_session_backoff(failures))
+
+        status = await graph_client.aget(upload_url, auth=False)
+        if status.status_code == 200:
+            offset = _next_offset(status.json(), size)
+        elif status.status_code == 404:
+            print(f"🔁 [ONEDRIVE] Upload session verlopen → opnieuw ({clean})")
+            upload_url, offset = await _create_upload_session_async(clean), 0
+
+
+async def upload_file_async(file: UploadFile, path: str, content_type: str | None = None) -> dict:
+    """
+    Streamt een UploadFile naar OneDrive zonder het volledig in te lezen:
+    ≤ 4 MB → simple PUT, groter → upload session (chunk per chunk van de
+    gespoolde upload). Geeft het driveItem (o.a. webUrl).
+    """
+    clean = path.lstrip("/")
+    content_type = content_type or file.content_type or "application/octet-stream"
+
+    size = file.size
+    if size is None:
+        file.file.seek(0, os.SEEK_END)
+        size = file.file.tell()
+
+    await ensure_folder_async(_parent_of(clean))
+
+    if size <= SIMPLE_UPLOAD_LIMIT:
+        await file.seek(0)
+        r = await graph_client.aput(
+            f"/drive/root:/{clean}:/content",
+            headers={"Content-Type": content_type},
+            content=await file.read(),
+        )
+        if r.status_code not in (200, 201):
+            raise Exception(f"OneDrive upload error {r.status_code}: {r.text}")
+        item = r.json()
+    else:
+        async def read_at(offset: int, n: int) -> bytes:
+            await file.seek(offset)
+            return await file.read(n)
+
+        item = await _upload_session_async(clean, size, read_at)
+
+    _remember_folder(_parent_of(clean), True)
+    return item
+
+
 # =====================================================
 # DELETE FILES
 # =====================================================
@@ -74,11 +418,10 @@ def delete_file(path: str):
     if not path:
         return False
 
-    token = get_access_token()
     clean = path.lstrip("/")
 
-    url = f"https://graph.microsoft.com/v1.0/drive/root:/{clean}"
-    r = requests.delete(url, headers={"Authorization": f"Bearer {token}"})
+    r = graph_client.delete(f"/drive/root:/{clean}")
+    forget_folder(clean)
 
     return r.status_code in (204, 404)
 
@@ -90,28 +433,85 @@ def delete_file_if_exists(path: str):
         return False
 
 
+async def delete_file_if_exists_async(path: str):
+    if not path:
+        return False
+    try:
+        r = await graph_client.adelete(f"/drive/root:/{path.lstrip('/')}")
+        forget_folder(path)
+        return r.status_code in (204, 404)
+    except:
+        return False
+
+
+# =====================================================
+# BATCH ($batch, max 20 per call)
+# =====================================================
+def _item_url(path: str) -> str:
+    """Pad → relatieve Graph-URL voor een $batch sub-request (URL-encoded)."""
+    return "/drive/root:/" + quote(path.strip("/"), safe="/")
+
+
+def delete_files(paths: list[str]) -> dict[str, bool]:
+    """Verwijdert meerdere bestanden via $batch. pad → True (weg/bestond niet)."""
+    paths = [p for p in dict.fromkeys(paths) if p]
+    if not paths:
+        return {}
+
+    results = graph_client.batch([
+        {"id": str(i), "method": "DELETE", "url": _item_url(p)}
+        for i, p in enumerate(paths)
+    ])
+    for p in paths:
+        forget_folder(p)
+    return {p: results[str(i)]["status"] in (204, 404) for i, p in enumerate(paths)}
+
+
+def items_exist(paths: list[str]) -> dict[str, bool]:
+    """Bulk metadata-check via $batch. pad → bestaat."""
+    paths = [p for p in dict.fromkeys(paths) if p]
+    if not paths:
+        return {}
+
+    results = graph_client.batch([
+        {"id": str(i), "method": "GET", "url": f"{_item_url(p)}?$select=id"}
+        for i, p in enumerate(paths)
+    ])
+    return {p: results[str(i)]["status"] == 200 for i, p in enumerate(paths)}
+
+
 # =====================================================
 # DELETE FOLDER + CHILDREN
 # =====================================================
 def delete_folder_recursive(folder_path: str):
-    token = get_access_token()
+    """
+    Lijst de kinderen op en verwijdert ze + de map in één $batch
+    (map-delete met dependsOn op de kinderen).
+    """
     clean = folder_path.strip("/")
 
-    list_url = f"https://graph.microsoft.com/v1.0/drive/root:/{clean}:/children"
-    children = requests.get(list_url, headers={"Authorization": f"Bearer {token}"})
+    children = graph_client.get(f"/drive/root:/{clean}:/children")
 
+    subs = []
     if children.status_code == 200:
-        for c in children.json().get("value", []):
-            item = f"{clean}/{c['name']}"
-            requests.delete(
-                f"https://graph.microsoft.com/v1.0/drive/root:/{item}",
-                headers={"Authorization": f"Bearer {token}"}
-            )
-
-    requests.delete(
-        f"https://graph.microsoft.com/v1.0/drive/root:/{clean}",
-        headers={"Authorization": f"Bearer {token}"}
-    )
+        for i, c in enumerate(children.json().get("value", [])):
+            subs.append({"id": f"c{i}", "method": "DELETE", "url": _item_url(f"{clean}/{c['name']}")})
+
+    folder_req = {"id": "folder", "method": "DELETE", "url": _item_url(clean)}
+    if subs:
+        folder_req["dependsOn"] = [sub["id"] for sub in subs]
+
+    results = graph_client.batch(subs + [folder_req])
+    forget_folder(clean, exists=False if results["folder"]["status"] in (204, 404) else None)
+
+    failed = [sub["url"] for sub in subs if results[sub["id"]]["status"] not in (204, 404)]
+    if failed:
+        print(f"⚠️ [ONEDRIVE] {len(failed)} item(s) niet verwijderd in {clean}")
+
+    # Map geblokkeerd door een mislukt kind (424) → alsnog los verwijderen
+    if results["folder"]["status"] == 424:
+        r = graph_client.delete(f"/drive/root:/{clean}")
+        forget_folder(clean, exists=False if r.status_code in (204, 404) else None)
 
 
 # =====================================================
@@ -132,10 +532,10 @@ async def upload_template_image_with_replace(
     full = f"{TEMPLATE_FOLDER}/{template_id}/{filename}"
 
     # CORRECT ARG ORDER
-    new_path = upload_bytes(raw, full, content_type=file.content_type or "image/jpeg")
+    new_path = await upload_bytes_async(raw, full, content_type=file.content_type or "image/jpeg")
 
     if old_path:
-        delete_file_if_exists(old_path)
+        await delete_file_if_exists_async(old_path)
 
     return new_path
 
@@ -143,60 +543,61 @@ async def upload_template_image_with_replace(
 # =====================================================
 # PDF MODULE FOTO UPLOAD
 # =====================================================
-def upload_oefening_foto(patient: str, datum_iso: str, volgorde: str, slot: int, file_bytes: bytes):
-    token = get_access_token()
-
+def _oefening_foto_folder(patient: str, datum_iso: str, volgorde: str) -> str:
     safe_patient = patient.replace(" ", "_").replace("/", "_")
     safe_date = datum_iso.replace("/", "-")
     safe_order = str(volgorde)
 
-    folder = (
+    return (
         f"{BASE_FOLDER}/Patients/"
         f"{safe_patient}/"
         f"{safe_date}/"
         f"Oefening_{safe_order}"
     )
 
-    # ensure folder exists
-    create_url = f"https://graph.microsoft.com/v1.0/drive/root:/{folder}"
-    check = requests.get(create_url, headers={"Authorization": f"Bearer {token}"})
-    if check.status_code == 404:
-        requests.put(
-            create_url,
-            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
-            json={}
-        )
+
+def upload_oefening_foto(patient: str, datum_iso: str, volgorde: str, slot: int, file_bytes: bytes):
+    folder = _oefening_foto_folder(patient, datum_iso, volgorde)
+
+    # ensure folder exists (gecachet)
+    ensure_folder(folder)
 
     filename = f"foto{slot}.jpg"
-    upload_url = f"https://graph.microsoft.com/v1.0/drive/root:/{folder}/{filename}:/content"
 
-    res = requests.put(
-        upload_url,
-        headers={"Authorization": f"Bearer {token}", "Content-Type": "image/jpeg"},
-        data=file_bytes,
+    res = graph_client.put(
+        f"/drive/root:/{folder}/{filename}:/content",
+        headers={"Content-Type": "image/jpeg"},
+        content=file_bytes,
     )
 
     if res.status_code not in (200, 201):
         raise Exception(f"OneDrive upload fout: {res.text}")
 
+    _remember_folder(folder, True)
+
     graph_path = f"{folder}/{filename}"
     web_url = res.json().get("webUrl")
 
     return web_url, graph_path
 
 
+async def upload_oefening_foto_async(patient: str, datum_iso: str, volgorde: str, slot: int, file: UploadFile):
+    """Zelfde als upload_oefening_foto, maar streamt de UploadFile (geen volledige read)."""
+    graph_path = f"{_oefening_foto_folder(patient, datum_iso, volgorde)}/foto{slot}.jpg"
+
+    item = await upload_file_async(file, graph_path, content_type="image/jpeg")
+
+    return item.get("webUrl"), graph_path
+
+
 # =====================================================
-# INTERNAL COPY (download + upload)
+# INTERNAL COPY (download + upload) — fallback voor copy_files
 # =====================================================
 def copy_file(src_path: str, dst_path: str):
-    token = get_access_token()
-
     clean_src = src_path.lstrip("/")
     clean_dst = dst_path.lstrip("/")
 
-    download_url = f"https://graph.microsoft.com/v1.0/drive/root:/{clean_src}:/content"
-
-    r = requests.get(download_url, headers={"Authorization": f"Bearer {token}"})
+    r = graph_client.get(f"/drive/root:/{clean_src}:/content")
     if r.status_code != 200:
         raise Exception(f"OneDrive copy download error {r.status_code}: {r.text}")
 
@@ -206,3 +607,125 @@ def copy_file(src_path: str, dst_path: str):
     uploaded_path = upload_bytes(content, clean_dst, content_type="image/jpeg")
 
     return uploaded_path
+
+
+# =====================================================
+# SERVER-SIDE COPY (Graph /copy + monitor)
+# =====================================================
+def _same_content(src_meta: dict | None, dst_meta: dict | None) -> bool:
+    """Zelfde inhoud als bron en doel een gemeenschappelijke hash delen."""
+    if not src_meta or not dst_meta or src_meta.get("size") != dst_meta.get("size"):
+        return False
+    src_hashes = (src_meta.get("file") or {}).get("hashes") or {}
+    dst_hashes = (dst_meta.get("file") or {}).get("hashes") or {}
+    common = set(src_hashes) & set(dst_hashes)
+    return bool(common) and all(src_hashes[k] == dst_hashes[k] for k in common)
+
+
+def _poll_copies(monitors: dict[str, str]) -> set[str]:
+    """Pollt alle monitor-URL's tot completed/failed of COPY_TIMEOUT. Geeft geslaagde doelen."""
+    done, pending = set(), dict(monitors)
+    deadline = time.monotonic() + COPY_TIMEOUT
+    delay = 0.2
+
+    while pending and time.monotonic() < deadline:
+        time.sleep(delay)
+        for dst, url in list(pending.items()):
+            try:
+                # Monitor-URL is pre-authenticated → geen token meesturen
+                r = graph_client.get(url, auth=False, timeout=10)
+                # Klaar → 303 naar het nieuwe item (dat zonder token 401 geeft)
+                if any(h.status_code == 303 for h in r.history):
+                    status = "completed"
+                elif r.status_code in (200, 202):
+                    status = r.json().get("status")
+                else:
+                    status = "failed"
+            except Exception:
+                continue
+            if status == "completed":
+                done.add(dst)
+                pending.pop(dst)
+            elif status == "failed":
+                pending.pop(dst)
+        delay = min(delay * 2, 2.0)
+
+    return done
+
+
+def copy_files(pairs: list[tuple[str, str]]) -> dict[str, bool]:
+    """
+    Kopieert (bron, doel)-paren binnen OneDrive zonder de bytes door de API
+    te sturen:
+    1) één $batch met metadata van bronnen + doelen (hashes)
+    2) doel met dezelfde hash → overslaan
+    3) één $batch met alle /copy-acties, daarna de monitors pollen
+    Mislukt een copy → fallback via download + upload (copy_file).
+    Geeft doel → geslaagd.
+    """
+    pairs = list({dst.strip("/"): src.strip("/") for src, dst in pairs if src and dst}.items())
+    if not pairs:
+        return {}
+
+    # 1) Metadata
+    paths = list(dict.fromkeys([src for _, src in pairs] + [dst for dst, _ in pairs]))
+    meta = graph_client.batch([
+        {"id": str(i), "method": "GET", "url": f"{_item_url(p)}?$select=id,size,file"}
+        for i, p in enumerate(paths)
+    ])
+    meta_by_path = {
+        p: meta[str(i)]["body"] if meta[str(i)]["status"] == 200 else None
+        for i, p in enumerate(paths)
+    }
+
+    result = {}
+    todo = []
+    for dst, src in pairs:
+        if _same_content(meta_by_path[src], meta_by_path[dst]):
+            result[dst] = True
+        else:
+            todo.append((dst, src))
+
+    skipped = len(result)
+
+    # 2) Doelmappen + /copy-acties
+    ensure_folders(_parent_of(dst) for dst, _ in todo)
+
+    copies = graph_client.batch([
+        {
+            "id": str(i),
+            "method": "POST",
+            "url": f"{_item_url(src)}:/copy?@microsoft.graph.conflictBehavior=replace",
+            "headers": {"Content-Type": "application/json"},
+            "body": {
+                "parentReference": {"path": f"/drive/root:/{dst.rsplit('/', 1)[0]}"},
+                "name": dst.rsplit("/", 1)[1],
+            },
+        }
+        for i, (dst, src) in enumerate(todo)
+    ]) if todo else {}
+
+    monitors = {}
+    for i, (dst, _) in enumerate(todo):
+        res = copies[str(i)]
+        location = {k.lower(): v for k, v in res["headers"].items()}.get("location")
+        if res["status"] == 202 and location:
+            monitors[dst] = location
+
+    copied = _poll_copies(monitors)
+
+    # 3) Fallback per mislukte copy
+    for dst, src in todo:
+        if dst in copied:
+            result[dst] = True
+            continue
+        try:
+            copy_file(src, dst)
+            result[dst] = True
+        except Exception as e:
+            print(f"❌ [ONEDRIVE] Copy mislukt {src} → {dst}: {e}")
+            result[dst] = False
+
+    print(f"📄 [ONEDRIVE] {len(pairs)} copy(s): {skipped} ongewijzigd, {len(copied)} server-side, "
+          f"{len(todo) - len(copied)} fallback")
+    return result
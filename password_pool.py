@@ -0,0 +1,175 @@
+# =====================================================
+# FILE: password_pool.py
+# bcrypt (login) in een eigen, begrensde process pool
+# =====================================================
+#
+# - bcrypt (12 rounds ≈ 250 ms CPU) draait in PASSWORD_WORKERS aparte
+#   processen → houdt de GIL, de event loop en de threadpool van de
+#   dashboards niet bezet
+# - Wachtrij = FIFO van de pool (wie eerst komt, eerst gecontroleerd);
+#   toelating begrensd: meer dan PASSWORD_QUEUE_MAX logins onderweg of een
+#   geschatte wachttijd boven PASSWORD_MAX_WAIT → 503 + Retry-After
+# - Oude hashes (minder rounds) worden bij een geslaagde login in dezelfde
+#   worker-aanroep opnieuw gehasht
+# - stats() → wachtrijdiepte, wacht- en CPU-tijden (GET /auth/password-pool)
+
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException
+from passlib.hash import bcrypt
+
+from blocking_io import run_blocking
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(min(2, os.cpu_count() or 1))))
+PASSWORD_QUEUE_MAX = int(os.getenv("PASSWORD_QUEUE_MAX", "64"))
+PASSWORD_MAX_WAIT = float(os.getenv("PASSWORD_MAX_WAIT", "10"))
+
+_lock = threading.Lock()
+_pool: ProcessPoolExecutor | None = None
+
+# Metrics (per proces)
+_in_flight = 0
+_stats = {
+    "completed": 0,
+    "rejected": 0,
+    "rehashed": 0,
+    "max_in_flight": 0,
+    "wait_ms_total": 0.0,
+    "cpu_ms_total": 0.0,
+    "wait_ms_max": 0.0,
+}
+_EWMA_ALPHA = 0.2
+_cpu_ms_avg = 250.0   # schatting per controle; bijgestuurd met echte metingen
+
+
+# -----------------------------------------------------
+# Worker (draait in het subproces)
+# -----------------------------------------------------
+
+def _verify_and_rehash(plain: str, hashed: str, rounds: int) -> tuple[bool, str | None, float]:
+    """→ (klopt, nieuwe hash of None, CPU-tijd in ms)."""
+    start = time.process_time()
+    plain = plain[:72]
+    try:
+        valid = bcrypt.verify(plain, hashed)
+    except Exception:
+        valid = False
+
+    new_hash = None
+    if valid and bcrypt.using(rounds=rounds).needs_update(hashed):
+        new_hash = bcrypt.using(rounds=rounds).hash(plain)
+    return valid, new_hash, (time.process_time() - start) * 1000
+
+
+# -----------------------------------------------------
+# Pool
+# -----------------------------------------------------
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS)
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _estimated_wait(queued: int) -> float:
+    """Geschatte wachttijd (s) voor een nieuwe login achter `queued` anderen."""
+    return queued * _cpu_ms_avg / 1000 / max(PASSWORD_WORKERS, 1)
+
+
+def _admit():
+    global _in_flight
+    with _lock:
+        wait_s = _estimated_wait(_in_flight)
+        if _in_flight >= PASSWORD_QUEUE_MAX or wait_s > PASSWORD_MAX_WAIT:
+            _stats["rejected"] += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Te veel gelijktijdige logins, probeer het zo opnieuw.",
+                headers={"Retry-After": str(max(1, math.ceil(wait_s)))},
+            )
+        _in_flight += 1
+        _stats["max_in_flight"] = max(_stats["max_in_flight"], _in_flight)
+
+
+def _done(total_ms: float, cpu_ms: float, rehashed: bool):
+    global _in_flight, _cpu_ms_avg
+    wait_ms = max(total_ms - cpu_ms, 0.0)
+    with _lock:
+        _in_flight -= 1
+        _stats["completed"] += 1
+        _stats["rehashed"] += rehashed
+        _stats["wait_ms_total"] += wait_ms
+        _stats["cpu_ms_total"] += cpu_ms
+        _stats["wait_ms_max"] = max(_stats["wait_ms_max"], wait_ms)
+        if cpu_ms > 0:
+            _cpu_ms_avg += _EWMA_ALPHA * (cpu_ms - _cpu_ms_avg)
+
+
+# -----------------------------------------------------
+# Main API
+# -----------------------------------------------------
+
+async def verify_password_pooled(plain: str, hashed: str) -> tuple[bool, str | None]:
+    """
+    Wachtwoord controleren in de process pool → (klopt, nieuwe hash of None).
+    Nieuwe hash enkel als de opgeslagen hash minder dan BCRYPT_ROUNDS rounds heeft.
+    503 als de wachtrij vol is.
+    """
+    global _pool
+    _admit()
+    start = time.monotonic()
+    cpu_ms = 0.0
+    new_hash = None
+    try:
+        loop = asyncio.get_running_loop()
+        try:
+            valid, new_hash, cpu_ms = await loop.run_in_executor(
+                _get_pool(), _verify_and_rehash, plain, hashed, BCRYPT_ROUNDS
+            )
+        except BrokenProcessPool:
+            # Worker gecrasht → pool opnieuw opbouwen bij de volgende login
+            print("⚠️ [AUTH] Password pool kapot → bcrypt in thread")
+            with _lock:
+                _pool = None
+            valid, new_hash, cpu_ms = await run_blocking(_verify_and_rehash, plain, hashed, BCRYPT_ROUNDS)
+        return valid, new_hash
+    finally:
+        _done((time.monotonic() - start) * 1000, cpu_ms, new_hash is not None)
+
+
+def stats() -> dict:
+    with _lock:
+        completed = _stats["completed"] or 1
+        return {
+            "workers": PASSWORD_WORKERS,
+            "queue_depth": _in_flight,
+            "queue_max": PASSWORD_QUEUE_MAX,
+            "max_in_flight": _stats["max_in_flight"],
+            "completed": _stats["completed"],
+            "rejected": _stats["rejected"],
+            "rehashed": _stats["rehashed"],
+            "avg_wait_ms": round(_stats["wait_ms_total"] / completed, 1),
+            "max_wait_ms": round(_stats["wait_ms_max"], 1),
+            "avg_cpu_ms": round(_stats["cpu_ms_total"] / completed, 1),
+            "estimated_wait_ms": round(_estimated_wait(_in_flight) * 1000, 1),
+        }
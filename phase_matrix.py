@@ -0,0 +1,245 @@
+# =====================================================
+# FILE: phase_matrix.py
+# Fase-matrix cache (NumPy) — gedeeld door kracht, functioneel,
+# metrics en individueel
+# =====================================================
+
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Integer, Numeric
+from sqlalchemy.orm import Session
+
+from models.blessure import Blessure
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+# Vangnet voor meerdere workers: elke worker heeft zijn eigen cache,
+# invalidatie gebeurt enkel lokaal → na TTL wordt sowieso herladen.
+PHASE_MATRIX_TTL = int(os.getenv("PHASE_MATRIX_TTL", "300"))
+
+
+# -----------------------------------------------------
+# Fase-tabel als kolom-arrays
+# -----------------------------------------------------
+
+class PhaseColumns:
+    """
+    Eén fase-tabel als dense arrays, 1 rij per blessure_id:
+    - blessure_ids: int64-array
+    - links / sided: boolean-maskers op Blessure.zijde
+    - values: numerieke kolommen als float, None en 0 → NaN
+    - raw: numerieke kolommen als float, enkel None → NaN
+    - records: originele rijwaarden (per blessure_id opvraagbaar)
+    """
+
+    def __init__(self, names: Sequence[str], numeric: Sequence[str], rows: Sequence[tuple]):
+        mat = np.array(rows, dtype=object).reshape(len(rows), len(names) + 2)
+
+        self.names = list(names)
+        self.blessure_ids = mat[:, 0].astype(np.int64)
+        self.zijde = mat[:, 1]
+        self._objects = mat[:, 2:]
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+        self._num_index = {name: i for i, name in enumerate(numeric)}
+        self.raw = self._objects[:, [self._index[n] for n in numeric]].astype(float)
+        self.values = self.raw.copy()
+        self.values[self.values == 0] = np.nan
+
+        self._init_masks()
+
+    def _init_masks(self):
+        self.links = self.zijde == "Links"
+        self.sided = self.links | (self.zijde == "Rechts")
+        self._pos = {int(bid): i for i, bid in enumerate(self.blessure_ids)}
+
+    def __len__(self) -> int:
+        return len(self.blessure_ids)
+
+    # -----------------------------
+    # SUBSET
+    # -----------------------------
+    def only(self, blessure_id: int) -> "PhaseColumns":
+        """Nieuwe PhaseColumns met enkel de rij van deze blessure (of leeg)."""
+        mask = self.blessure_ids == blessure_id
+
+        sub = PhaseColumns.__new__(PhaseColumns)
+        sub.names = self.names
+        sub._index = self._index
+        sub._num_index = self._num_index
+        sub.blessure_ids = self.blessure_ids[mask]
+        sub.zijde = self.zijde[mask]
+        sub._objects = self._objects[mask]
+        sub.raw = self.raw[mask]
+        sub.values = self.values[mask]
+        sub._init_masks()
+        return sub
+
+    # -----------------------------
+    # KOLOMMEN
+    # -----------------------------
+    def has(self, name: str) -> bool:
+        return name in self._index
+
+    def column(self, name: str) -> np.ndarray:
+        """Numerieke kolom (None/0 → NaN); onbekende kolom → volledig NaN."""
+        i = self._num_index.get(name)
+        if i is None:
+            return np.full(len(self), np.nan)
+        return self.values[:, i]
+
+    def column_raw(self, name: str) -> np.ndarray:
+        """Numerieke kolom waarin 0 behouden blijft (enkel None → NaN)."""
+        i = self._num_index.get(name)
+        if i is None:
+            return np.full(len(self), np.nan)
+        return self.raw[:, i]
+
+    def objects(self, name: str) -> np.ndarray:
+        """Originele waarden van een (ook niet-numerieke) kolom."""
+        i = self._index.get(name)
+        if i is None:
+            return np.full(len(self), None, dtype=object)
+        return self._objects[:, i]
+
+    def sides(self, bases: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Matrices (rijen × bases) voor geopereerde en gezonde zijde.
+        Kolommen: f"{base}_l" / f"{base}_r". Rijen zonder zijde → NaN.
+        """
+        left = np.column_stack([self.column(f"{b}_l") for b in bases]) if bases else np.empty((len(self), 0))
+        right = np.column_stack([self.column(f"{b}_r") for b in bases]) if bases else np.empty((len(self), 0))
+
+        links = self.links[:, None]
+        oper = np.where(links, left, right)
+        gezond = np.where(links, right, left)
+
+        oper[~self.sided] = np.nan
+        gezond[~self.sided] = np.nan
+        return oper, gezond
+
+    # -----------------------------
+    # RECORD
+    # -----------------------------
+    def record(self, blessure_id: int) -> Optional[SimpleNamespace]:
+        """Originele rij als object met attributen (zoals het ORM-model), of None."""
+        i = self._pos.get(int(blessure_id))
+        if i is None:
+            return None
+        return SimpleNamespace(
+            blessure_id=int(self.blessure_ids[i]),
+            **dict(zip(self.names, self._objects[i])),
+        )
+
+
+# -----------------------------------------------------
+# Laden (1 query per tabel, zonder ORM-objecten)
+# -----------------------------------------------------
+
+def _load_phase_matrix(db: Session, Model) -> PhaseColumns:
+    columns = [c for c in Model.__table__.columns if c.name != "blessure_id"]
+    numeric = [c.name for c in columns if isinstance(c.type, (Integer, Numeric))]
+
+    q = (
+        db.query(Model.blessure_id, Blessure.zijde, *columns)
+        .join(Blessure, Model.blessure_id == Blessure.blessure_id)
+    )
+    rows = [tuple(r) for r in q.all()]
+
+    return PhaseColumns([c.name for c in columns], numeric, rows)
+
+
+# -----------------------------------------------------
+# Cache
+# -----------------------------------------------------
+
+_lock = threading.Lock()
+_cache: Dict[str, Tuple[float, Any]] = {}
+_generation = 0
+
+
+def _cached(key: str, loader: Callable[[], Any]) -> Any:
+    with _lock:
+        entry = _cache.get(key)
+        generation = _generation
+
+    if entry and time.monotonic() - entry[0] < PHASE_MATRIX_TTL:
+        return entry[1]
+
+    value = loader()
+
+    # Enkel bewaren als er intussen geen invalidatie was
+    with _lock:
+        if generation == _generation:
+            _cache[key] = (time.monotonic(), value)
+    return value
+
+
+def get_phase_matrix(db: Session, Model) -> PhaseColumns:
+    """Fase-tabel (Baseline, Week6, …) uit de cache; laadt bij miss of na TTL."""
+    return _cached(Model.__tablename__, lambda: _load_phase_matrix(db, Model))
+
+
+def get_blessure_zijden(db: Session) -> Dict[int, Optional[str]]:
+    """blessure_id → zijde voor alle blessures (ook zonder fase-records)."""
+    return _cached(
+        Blessure.__tablename__,
+        lambda: {int(bid): zijde for bid, zijde in db.query(Blessure.blessure_id, Blessure.zijde).all()},
+    )
+
+
+def invalidate_phase_matrix() -> None:
+    """
+    Wist de volledige cache. Aanroepen na elke commit die een fase-record,
+    blessure of patiënt wijzigt (zijde en cascades zitten mee in de matrix).
+    """
+    global _generation
+    with _lock:
+        _generation += 1
+        _cache.clear()
+
+
+# -----------------------------------------------------
+# Gebatchte statistiek
+# -----------------------------------------------------
+
+def round_or_none(val: float, ndigits: int):
+    return None if np.isnan(val) else round(float(val), ndigits)
+
+
+def column_means(mat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Gemiddelde + aantal geldige waarden per kolom (NaN genegeerd)."""
+    n = np.count_nonzero(~np.isnan(mat), axis=0)
+    sums = np.nansum(mat, axis=0)
+    means = np.divide(sums, n, out=np.full(sums.shape, np.nan), where=n > 0)
+    return means, n
+
+
+def paired_stats(oper: np.ndarray, gezond: np.ndarray, ndigits: int = 1) -> List[Dict]:
+    """
+    Per kolom: gemiddelde geopereerd/gezond + gemiddeld % verschil per patiënt.
+    Verschil enkel voor rijen waar beide zijden geldig zijn.
+    """
+    delta = (oper - gezond) / gezond * 100
+
+    m_oper, n_oper = column_means(oper)
+    m_gez, n_gez = column_means(gezond)
+    m_delta, n_pairs = column_means(delta)
+
+    return [
+        {
+            "geopereerd_mean": round_or_none(m_oper[i], ndigits),
+            "gezond_mean": round_or_none(m_gez[i], ndigits),
+            "verschil_pct": round_or_none(m_delta[i], 1),
+            "n_oper": int(n_oper[i]),
+            "n_gezond": int(n_gez[i]),
+            "n_pairs": int(n_pairs[i]),
+        }
+        for i in range(oper.shape[1])
+    ]
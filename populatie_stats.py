@@ -0,0 +1,463 @@
+# =====================================================
+# FILE: populatie_stats.py
+# Incrementele populatie-statistiek (in-memory) voor /populatie/summary
+# =====================================================
+#
+# Tellingen per categorie + lopende sommen per dag-KPI, bijgewerkt per
+# gewijzigde patiënt/blessure (incl. week6/maand45). De summary wordt
+# uit het geheugen geserveerd; summary_from_sql() is de referentie.
+#
+# Controle / volledige rebuild:
+#   python populatie_stats.py            → rebuild + vergelijk met SQL
+#   POST /populatie/rebuild              → vergelijk live state + rebuild
+
+import os
+import threading
+import time
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from models.patient import Patient
+from models.blessure import Blessure
+from models.week6 import Week6
+from models.maand45 import Maand45
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+# Elke worker houdt zijn eigen state bij → periodieke rebuild als vangnet
+POPULATIE_STATS_TTL = int(os.getenv("POPULATIE_STATS_TTL", "300"))
+
+# (response-key, kolom op blessures)
+BLESSURE_CATEGORIES = [
+    ("sport", "sport"),
+    ("sportniveau", "sportniveau"),
+    ("etiologie", "etiologie"),
+    ("operatie", "operatie"),
+    ("arts", "arts"),
+    ("letsel", "bijkomende_letsels"),
+    ("monoloop", "monoloop"),
+]
+
+# (response-key, van, tot)
+KPIS = [
+    ("accident_to_surgery", "datum_ongeval", "datum_operatie"),
+    ("surgery_to_intake", "datum_operatie", "datum_intake"),
+    ("surgery_to_walk", "datum_operatie", "lopen_datum"),
+    ("surgery_to_drive", "datum_operatie", "autorijden_datum"),
+]
+
+AUTORIJDEN_ONBEKEND = date(9999, 12, 31)
+
+
+# -----------------------------------------------------
+# Helpers
+# -----------------------------------------------------
+
+def _days(start: Optional[date], end: Optional[date]) -> Optional[int]:
+    """DATEDIFF(end, start) indien beide gekend en > 0."""
+    if start is None or end is None:
+        return None
+    d = (end - start).days
+    return d if d > 0 else None
+
+
+def _avg4(total: int, n: int) -> Optional[Decimal]:
+    """Zoals MySQL AVG() op integers: 4 decimalen, half-up."""
+    if not n:
+        return None
+    return (Decimal(total) / Decimal(n)).quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP)
+
+
+def _blessure_values(row) -> Dict[str, Any]:
+    """Categorieën + KPI-dagen voor één blessure-rij (incl. week6/maand45)."""
+    autorijden = row.autorijden_datum
+    if autorijden == AUTORIJDEN_ONBEKEND:
+        autorijden = None
+
+    dates = {
+        "datum_ongeval": row.datum_ongeval,
+        "datum_operatie": row.datum_operatie,
+        "datum_intake": row.datum_intake,
+        "lopen_datum": row.lopen_datum,
+        "autorijden_datum": autorijden,
+    }
+
+    return {
+        "patient_id": row.patient_id,
+        "categories": {key: getattr(row, col) for key, col in BLESSURE_CATEGORIES},
+        "kpis": {key: _days(dates[a], dates[b]) for key, a, b in KPIS},
+    }
+
+
+def _blessure_query(db: Session):
+    return (
+        db.query(
+            Blessure.blessure_id,
+            Blessure.patient_id,
+            *[getattr(Blessure, col) for _, col in BLESSURE_CATEGORIES],
+            Blessure.datum_ongeval,
+            Blessure.datum_operatie,
+            Blessure.datum_intake,
+            Maand45.lopen_opstartdatum.label("lopen_datum"),
+            Week6.autorijden_datum.label("autorijden_datum"),
+        )
+        .outerjoin(Maand45, Maand45.blessure_id == Blessure.blessure_id)
+        .outerjoin(Week6, Week6.blessure_id == Blessure.blessure_id)
+    )
+
+
+# -----------------------------------------------------
+# Telling per categorie
+# -----------------------------------------------------
+
+class _CategoryCounter:
+    """
+    Telling per waarde. Groepering zoals MySQL (hoofdletter- en
+    trailing-space-ongevoelig); NULL en '' tellen niet mee.
+    """
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.names: Dict[str, str] = {}
+        self.total = 0
+
+    def add(self, value: Optional[str], delta: int) -> None:
+        if value is None:
+            return
+        key = str(value).rstrip().lower()
+        if key == "":
+            return
+
+        n = self.counts.get(key, 0) + delta
+        if n > 0:
+            self.counts[key] = n
+            self.names.setdefault(key, str(value))
+        else:
+            self.counts.pop(key, None)
+            self.names.pop(key, None)
+        self.total += delta
+
+    def as_list(self) -> List[Dict[str, Any]]:
+        rows = []
+        for key, n in self.counts.items():
+            percent = (Decimal(n * 100) / Decimal(self.total)).quantize(Decimal("0.1"), rounding=ROUND_HALF_UP)
+            rows.append({"name": self.names[key], "value": n, "percent": percent})
+        rows.sort(key=lambda r: (-r["value"], r["name"].lower()))
+        return rows
+
+
+# -----------------------------------------------------
+# State
+# -----------------------------------------------------
+
+class PopulatieStats:
+    def __init__(self):
+        self.patients: Dict[int, Optional[str]] = {}        # patient_id → geslacht
+        self.blessures: Dict[int, Dict[str, Any]] = {}      # blessure_id → _blessure_values()
+        self.by_patient: Dict[int, set] = {}                # patient_id → {blessure_id}
+
+        self.geslacht = _CategoryCounter()
+        self.categories = {key: _CategoryCounter() for key, _ in BLESSURE_CATEGORIES}
+        self.kpi_sum = {key: 0 for key, _, _ in KPIS}
+        self.kpi_n = {key: 0 for key, _, _ in KPIS}
+
+        self._summary: Optional[Dict[str, Any]] = None
+
+    # -----------------------------
+    # MUTATIES
+    # -----------------------------
+    def set_patient(self, patient_id: int, exists: bool, geslacht: Optional[str] = None) -> None:
+        if patient_id in self.patients:
+            self.geslacht.add(self.patients.pop(patient_id), -1)
+
+        if exists:
+            self.patients[patient_id] = geslacht
+            self.geslacht.add(geslacht, +1)
+        else:
+            # ORM-cascade: blessures (en hun fases) verdwijnen mee
+            for bid in list(self.by_patient.get(patient_id, ())):
+                self.set_blessure(bid, None)
+
+        self._summary = None
+
+    def set_blessure(self, blessure_id: int, values: Optional[Dict[str, Any]]) -> None:
+        old = self.blessures.pop(blessure_id, None)
+        if old:
+            self._apply(old, -1)
+            self.by_patient.get(old["patient_id"], set()).discard(blessure_id)
+
+        if values:
+            self.blessures[blessure_id] = values
+            self._apply(values, +1)
+            self.by_patient.setdefault(values["patient_id"], set()).add(blessure_id)
+
+        self._summary = None
+
+    def _apply(self, values: Dict[str, Any], sign: int) -> None:
+        for key, val in values["categories"].items():
+            self.categories[key].add(val, sign)
+        for key, days in values["kpis"].items():
+            if days is not None:
+                self.kpi_sum[key] += sign * days
+                self.kpi_n[key] += sign
+
+    # -----------------------------
+    # SUMMARY
+    # -----------------------------
+    def summary(self) -> Dict[str, Any]:
+        if self._summary is None:
+            self._summary = {
+                "totalPatients": len(self.patients),
+                "avg": {key: _avg4(self.kpi_sum[key], self.kpi_n[key]) for key, _, _ in KPIS},
+                "counts": {
+                    "geslacht": self.geslacht.as_list(),
+                    **{key: c.as_list() for key, c in self.categories.items()},
+                },
+            }
+        return self._summary
+
+
+def _build(db: Session) -> PopulatieStats:
+    stats = PopulatieStats()
+    for patient_id, geslacht in db.query(Patient.patient_id, Patient.geslacht).all():
+        stats.set_patient(patient_id, True, geslacht)
+    for row in _blessure_query(db).all():
+        stats.set_blessure(row.blessure_id, _blessure_values(row))
+    return stats
+
+
+_lock = threading.Lock()
+_state: Optional[PopulatieStats] = None
+_built_at = 0.0
+_generation = 0                            # +1 bij elke nieuwe _state
+_rebuilds: List[set] = []                  # lopende rebuilds → intussen ververste ("patient"/"blessure", id)
+
+
+def rebuild(db: Session) -> PopulatieStats:
+    """Volledige herberekening vanuit de database."""
+    global _state, _built_at, _generation
+    touched: set = set()
+    with _lock:
+        _rebuilds.append(touched)
+    try:
+        stats = _build(db)
+    except Exception:
+        with _lock:
+            _rebuilds.remove(touched)
+        raise
+
+    with _lock:
+        _rebuilds.remove(touched)
+        _state = stats
+        _built_at = time.monotonic()
+        _generation += 1
+
+    # Tijdens de build ververst → de snapshot kan ouder zijn → opnieuw lezen
+    if touched:
+        fresh = Session(db.get_bind())
+        try:
+            for kind, key in touched:
+                _REFRESH[kind](fresh, key)
+        finally:
+            fresh.close()
+    return stats
+
+
+def get_summary(db: Session) -> Dict[str, Any]:
+    with _lock:
+        state = _state
+        fresh = state is not None and time.monotonic() - _built_at < POPULATIE_STATS_TTL
+        if fresh:
+            return state.summary()
+
+    stats = rebuild(db)
+    with _lock:
+        return stats.summary()
+
+
+# -----------------------------------------------------
+# Incrementele updates (aanroepen na commit)
+# -----------------------------------------------------
+
+def _refresh(db: Session, kind: str, key: int, load, apply) -> None:
+    """
+    load() buiten de lock, apply() enkel als _state intussen niet vervangen is
+    (generatie zoals phase_matrix). Wel vervangen → opnieuw lezen in een
+    verse sessie (nieuwere snapshot dan de rebuild).
+    """
+    session = db
+    try:
+        for _ in range(3):
+            with _lock:
+                if _state is None:
+                    return
+                generation = _generation
+            value = load(session)
+            with _lock:
+                if _state is None:
+                    return
+                if generation == _generation:
+                    apply(_state, value)
+                    for touched in _rebuilds:
+                        touched.add((kind, key))
+                    return
+            if session is db:
+                session = Session(db.get_bind())
+            else:
+                session.rollback()
+    finally:
+        if session is not db:
+            session.close()
+
+
+def refresh_patient(db: Session, patient_id: int) -> None:
+    """Herlaadt één patiënt (aangemaakt, gewijzigd of verwijderd)."""
+    _refresh(
+        db, "patient", patient_id,
+        lambda s: s.query(Patient.geslacht).filter(Patient.patient_id == patient_id).first(),
+        lambda state, row: state.set_patient(patient_id, row is not None, row.geslacht if row else None),
+    )
+
+
+def refresh_blessure(db: Session, blessure_id: int) -> None:
+    """Herlaadt één blessure incl. week6/maand45-datums (ook na delete)."""
+    _refresh(
+        db, "blessure", blessure_id,
+        lambda s: _blessure_query(s).filter(Blessure.blessure_id == blessure_id).first(),
+        lambda state, row: state.set_blessure(blessure_id, _blessure_values(row) if row else None),
+    )
+
+
+_REFRESH = {"patient": refresh_patient, "blessure": refresh_blessure}
+
+
+# -----------------------------------------------------
+# Referentie (volledige SQL) + controle
+# -----------------------------------------------------
+
+def summary_from_sql(db: Session) -> Dict[str, Any]:
+    """Oorspronkelijke berekening rechtstreeks in MySQL."""
+    sql = text("""
+        WITH eerste_momenten AS (
+            SELECT
+                b.blessure_id,
+                b.datum_ongeval,
+                b.datum_operatie,
+                b.datum_intake,
+                m45.lopen_opstartdatum AS lopen_datum,
+                w6.autorijden_datum AS autorijden_datum_norm
+            FROM blessures b
+            LEFT JOIN maand45 m45 ON m45.blessure_id = b.blessure_id
+            LEFT JOIN week6  w6  ON w6.blessure_id  = b.blessure_id
+            LEFT JOIN maand3 m3  ON m3.blessure_id  = b.blessure_id
+        )
+        SELECT
+            (SELECT COUNT(DISTINCT p.patient_id) FROM patienten p) AS total_patients,
+            AVG(CASE WHEN datum_ongeval IS NOT NULL AND datum_operatie IS NOT NULL
+                      AND DATEDIFF(datum_operatie, datum_ongeval) > 0
+                     THEN DATEDIFF(datum_operatie, datum_ongeval) END) AS avg_days_accident_to_surgery,
+            AVG(CASE WHEN datum_operatie IS NOT NULL AND datum_intake IS NOT NULL
+                      AND DATEDIFF(datum_intake, datum_operatie) > 0
+                     THEN DATEDIFF(datum_intake, datum_operatie) END) AS avg_days_surgery_to_intake,
+            AVG(CASE WHEN datum_operatie IS NOT NULL AND lopen_datum IS NOT NULL
+                      AND DATEDIFF(lopen_datum, datum_operatie) > 0
+                     THEN DATEDIFF(lopen_datum, datum_operatie) END) AS avg_days_surgery_to_walk,
+            AVG(CASE WHEN datum_operatie IS NOT NULL
+                      AND autorijden_datum_norm IS NOT NULL
+                      AND autorijden_datum_norm <> '9999-12-31'
+                      AND DATEDIFF(autorijden_datum_norm, datum_operatie) > 0
+                     THEN DATEDIFF(autorijden_datum_norm, datum_operatie) END) AS avg_days_surgery_to_drive
+        FROM eerste_momenten;
+    """)
+    kpi = dict(db.execute(sql).mappings().first())
+
+    def count_query(table, field):
+        q = text(f"""
+            SELECT
+                {field} AS name,
+                COUNT(*) AS value,
+                ROUND(
+                    COUNT(*) * 100.0 /
+                    (SELECT COUNT(*) FROM {table} WHERE {field} IS NOT NULL AND {field} <> ''),
+                    1
+                ) AS percent
+            FROM {table}
+            WHERE {field} IS NOT NULL AND {field} <> ''
+            GROUP BY {field}
+            ORDER BY percent DESC;
+        """)
+        return [dict(r) for r in db.execute(q).mappings().all()]
+
+    return {
+        "totalPatients": kpi.get("total_patients"),
+        "avg": {key: kpi.get(f"avg_days_{key}") for key, _, _ in KPIS},
+        "counts": {
+            "geslacht": count_query("patienten", "geslacht"),
+            **{key: count_query("blessures", col) for key, col in BLESSURE_CATEGORIES},
+        },
+    }
+
+
+def compare_summaries(live: Dict[str, Any], ref: Dict[str, Any]) -> List[str]:
+    """Verschillen tussen twee summaries (volgorde bij gelijke tellingen genegeerd)."""
+    diffs = []
+
+    if live["totalPatients"] != ref["totalPatients"]:
+        diffs.append(f"totalPatients: {live['totalPatients']} ≠ {ref['totalPatients']}")
+
+    for key in ref["avg"]:
+        a, b = live["avg"].get(key), ref["avg"].get(key)
+        if (a is None) != (b is None) or (a is not None and abs(Decimal(str(a)) - Decimal(str(b))) > Decimal("0.0001")):
+            diffs.append(f"avg.{key}: {a} ≠ {b}")
+
+    for key in ref["counts"]:
+        a = {str(r["name"]).rstrip().lower(): (r["value"], Decimal(str(r["percent"]))) for r in live["counts"].get(key, [])}
+        b = {str(r["name"]).rstrip().lower(): (r["value"], Decimal(str(r["percent"]))) for r in ref["counts"][key]}
+        if a != b:
+            diffs.append(f"counts.{key}: {a} ≠ {b}")
+
+    return diffs
+
+
+def verify_and_rebuild(db: Session) -> Dict[str, Any]:
+    """Vergelijkt de live (incrementele) state met SQL en bouwt daarna opnieuw op."""
+    ref = summary_from_sql(db)
+    with _lock:
+        live = _state.summary() if _state is not None else None
+
+    diffs = compare_summaries(live, ref) if live is not None else []
+    rebuilt = rebuild(db)
+    with _lock:
+        rebuilt_summary = rebuilt.summary()
+
+    return {
+        "had_state": live is not None,
+        "in_sync": not diffs,
+        "diffs": diffs,
+        "rebuild_diffs": compare_summaries(rebuilt_summary, ref),
+    }
+
+
+# =====================================================
+# CLI — volledige rebuild + controle tegen SQL
+# =====================================================
+if __name__ == "__main__":
+    from db import SessionLocal
+    from routers.utils import ok, err
+
+    db = SessionLocal()
+    try:
+        report = verify_and_rebuild(db)
+    finally:
+        db.close()
+
+    if report["rebuild_diffs"]:
+        for d in report["rebuild_diffs"]:
+            err(f"[POPULATIE] {d}")
+        raise SystemExit(1)
+    ok("[POPULATIE] Incrementele state komt overeen met SQL")
@@ -7,13 +7,15 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
+from blocking_io import run_blocking
 from db import get_db
 from models import User
+from password_pool import stats as password_pool_stats, verify_password_pooled
 from security import (
-    verify_password,
     hash_password,
     create_access_token,
     get_current_user,
+    invalidate_user,
     require_role,
 )
 
@@ -29,7 +31,7 @@ router = APIRouter(
 # LOGIN ROUTE
 # -----------------------------------------------------
 @router.post("/login")
-def login(
+async def login(
     form: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
@@ -38,8 +40,10 @@ def login(
     - username = email
     - password = wachtwoord
     Retourneert een JWT-token bij succesvolle login.
+    bcrypt draait in de password pool (niet op de loop of de threadpool);
+    hashes met te weinig rounds worden meteen vervangen.
     """
-    user = db.query(User).filter(User.email == form.username).first()
+    user = await run_blocking(lambda: db.query(User).filter(User.email == form.username).first())
 
     if not user:
         raise HTTPException(
@@ -47,12 +51,21 @@ def login(
             detail="❌ Ongeldige login of wachtwoord"
         )
 
-    if not verify_password(form.password, user.password_hash):
+    valid, new_hash = await verify_password_pooled(form.password, user.password_hash)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="❌ Ongeldige login of wachtwoord"
         )
 
+    if new_hash:
+        user.password_hash = new_hash
+        try:
+            await run_blocking(db.commit)
+        except Exception as e:
+            await run_blocking(db.rollback)
+            print("⚠️ [AUTH] Rehash niet opgeslagen:", e)
+
     token = create_access_token(subject=user.email, role=user.role)
     return {"access_token": token, "token_type": "bearer"}
 
@@ -106,9 +119,21 @@ def register_therapist(
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    invalidate_user(email)   # eventueel verouderd account met dit adres
 
     return {
         "status": "✅ Gebruiker toegevoegd",
         "id": new_user.id,
         "email": new_user.email
     }
+
+
+# -----------------------------------------------------
+# PASSWORD POOL METRICS (ALLEEN OWNER)
+# -----------------------------------------------------
+@router.get("/password-pool")
+def password_pool_metrics(
+    _: User = Depends(require_role("owner")),
+):
+    """Wachtrijdiepte + wacht-/CPU-tijden van de login-bcrypt (dit proces)."""
+    return password_pool_stats()
@@ -11,6 +11,7 @@ from models.baseline import Baseline
 from models.blessure import Blessure
 from schemas.baseline import BaselineSchema
 from routers.utils import ok, warn
+from phase_matrix import invalidate_phase_matrix
 
 router = APIRouter(prefix="/baseline", tags=["Baseline"])
 
@@ -91,6 +92,7 @@ def upsert_baseline(data: BaselineSchema, db: Session = Depends(get_db)):
                 setattr(obj, k, v)
 
             db.commit()
+            invalidate_phase_matrix()
             db.refresh(obj)
             ok(f"[BASELINE] Record geüpdatet (blessure_id={obj.blessure_id})")
             return obj
@@ -100,6 +102,7 @@ def upsert_baseline(data: BaselineSchema, db: Session = Depends(get_db)):
             obj = Baseline(**payload)
             db.add(obj)
             db.commit()
+            invalidate_phase_matrix()
             db.refresh(obj)
             ok(f"[BASELINE] Nieuw record aangemaakt (blessure_id={obj.blessure_id})")
             return obj
@@ -129,5 +132,6 @@ def delete_baseline(blessure_id: int, db: Session = Depends(get_db)):
 
     db.delete(obj)
     db.commit()
+    invalidate_phase_matrix()
     ok(f"[BASELINE] Record verwijderd (blessure_id={blessure_id})")
     return {"status": "✅ Baseline verwijderd"}
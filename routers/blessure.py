@@ -10,6 +10,8 @@ from models.blessure import Blessure
 from models.patient import Patient
 from schemas.blessure import BlessureSchema, BlessureUpdateSchema
 from routers.utils import ok, warn
+from phase_matrix import invalidate_phase_matrix
+import populatie_stats
 from sqlalchemy import text
 
 router = APIRouter(prefix="/blessure", tags=["Blessures"])
@@ -238,7 +240,9 @@ def create_blessure(data: BlessureSchema, db: Session = Depends(get_db)):
 
         db.add(obj)
         db.commit()
+        invalidate_phase_matrix()
         db.refresh(obj)
+        populatie_stats.refresh_blessure(db, obj.blessure_id)
 
         ok(f"[BLESSURE] Nieuw record aangemaakt (blessure_id={obj.blessure_id})")
         return obj
@@ -270,7 +274,9 @@ def update_blessure(blessure_id: int, data: BlessureUpdateSchema, db: Session =
         setattr(obj, k, v)
 
     db.commit()
+    invalidate_phase_matrix()
     db.refresh(obj)
+    populatie_stats.refresh_blessure(db, blessure_id)
     ok(f"[BLESSURE] Record geüpdatet (blessure_id={blessure_id})")
     return obj
 
@@ -287,6 +293,8 @@ def delete_blessure(blessure_id: int, db: Session = Depends(get_db)):
 
     db.delete(obj)
     db.commit()
+    invalidate_phase_matrix()
+    populatie_stats.refresh_blessure(db, blessure_id)
 
     ok(f"[BLESSURE] Record verwijderd (blessure_id={blessure_id})")
     return {"status": "✅ Blessure verwijderd"}
@@ -5,11 +5,19 @@
 
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple
+import numpy as np
 from db import get_db
+from phase_matrix import (
+    PhaseColumns,
+    get_phase_matrix,
+    get_blessure_zijden,
+    paired_stats,
+    column_means,
+    round_or_none,
+)
 
 # 🔹 Models
-from models.blessure import Blessure
 from models.baseline import Baseline
 from models.week6 import Week6
 from models.maand3 import Maand3
@@ -18,37 +26,6 @@ from models.maand6 import Maand6
 
 router = APIRouter(prefix="/functioneel", tags=["Functioneel"])
 
-# -----------------------------------------------------
-# Helpers
-# -----------------------------------------------------
-
-def _safe(val):
-    """Converteer DECIMAL/Integer → float, filtert None en 0 (0 = ongeldig)."""
-    if val is None:
-        return None
-    try:
-        f = float(val)
-    except Exception:
-        return None
-    return None if f == 0 else f
-
-
-def _avg(values: List[float], ndigits: int = 2):
-    vals = [v for v in values if v is not None]
-    if not vals:
-        return None
-    return round(sum(vals) / len(vals), ndigits)
-
-
-def _oper_gezond_sides(zijde: str) -> Tuple[str, str]:
-    """Bepaal geopereerde en gezonde zijde."""
-    if zijde == "Links":
-        return "l", "r"
-    if zijde == "Rechts":
-        return "r", "l"
-    return None, None
-
-
 # -----------------------------------------------------
 # Configuratie per fase
 # -----------------------------------------------------
@@ -87,16 +64,11 @@ FASES = [
 # Baseline categorische analyse (Lag / VMO)
 # -----------------------------------------------------
 
-def _aggregate_baseline_categorical(db: Session, blessure_id: Optional[int] = None) -> Dict[str, Any]:
-    q = db.query(Baseline)
-    if blessure_id:
-        q = q.filter(Baseline.blessure_id == blessure_id)
-    rows = q.all()
-
+def _aggregate_baseline_categorical(cols: PhaseColumns) -> Dict[str, Any]:
     result = {}
 
     def _percentages(field: str):
-        vals = [getattr(r, field, None) for r in rows if getattr(r, field, None)]
+        vals = [v for v in cols.objects(field) if v]
         total = len(vals)
         if total == 0:
             return None
@@ -114,51 +86,14 @@ def _aggregate_baseline_categorical(db: Session, blessure_id: Optional[int] = No
 # Unilaterale testen (1-been) — geopereerd/gezond/%verschil
 # -----------------------------------------------------
 
-def _aggregate_unilateral_tests(db: Session, fase_label: str, Model, tests: List[Tuple[str, str]], blessure_id: Optional[int] = None) -> Dict[str, Any]:
-    q = db.query(Model, Blessure).join(Blessure, Model.blessure_id == Blessure.blessure_id)
-    if blessure_id:
-        q = q.filter(Blessure.blessure_id == blessure_id)
-    rows = q.all()
-
-    buckets = {label: {"oper": [], "gezond": [], "pairs": []} for label, _ in tests}
-
-    for rec, bl in rows:
-        oper_side, gez_side = _oper_gezond_sides(bl.zijde)
-        if oper_side is None:
-            continue
-
-        for label, base in tests:
-            attr_oper = f"{base}_{oper_side}"
-            attr_gez = f"{base}_{gez_side}"
-
-            if not hasattr(rec, attr_oper) or not hasattr(rec, attr_gez):
-                continue
-
-            v_oper = _safe(getattr(rec, attr_oper))
-            v_gez = _safe(getattr(rec, attr_gez))
-
-            if v_oper is not None:
-                buckets[label]["oper"].append(v_oper)
-            if v_gez is not None:
-                buckets[label]["gezond"].append(v_gez)
-            if v_oper is not None and v_gez is not None and v_gez != 0:
-                diff = ((v_oper - v_gez) / v_gez) * 100
-                buckets[label]["pairs"].append(diff)
+def _aggregate_unilateral_tests(cols: PhaseColumns, fase_label: str, tests: List[Tuple[str, str]]) -> Dict[str, Any]:
+    oper, gezond = cols.sides([base for _, base in tests])
 
     out = []
-    for label, _ in tests:
-        b = buckets[label]
-        if not b["oper"] and not b["gezond"]:
+    for (label, _), stats in zip(tests, paired_stats(oper, gezond, 1)):
+        if not stats["n_oper"] and not stats["n_gezond"]:
             continue
-        out.append({
-            "test": label,
-            "geopereerd_mean": _avg(b["oper"], 1),
-            "gezond_mean": _avg(b["gezond"], 1),
-            "verschil_pct": _avg(b["pairs"], 1),
-            "n_oper": len(b["oper"]),
-            "n_gezond": len(b["gezond"]),
-            "n_pairs": len(b["pairs"]),
-        })
+        out.append({"test": label, **stats})
     return {"fase": fase_label, "testen": out}
 
 
@@ -166,20 +101,17 @@ def _aggregate_unilateral_tests(db: Session, fase_label: str, Model, tests: List
 # Bilaterale testen (2-benig)
 # -----------------------------------------------------
 
-def _aggregate_bilateral_tests(db: Session, fase_label: str, Model, tests: List[Tuple[str, str]], blessure_id: Optional[int] = None) -> Dict[str, Any]:
-    q = db.query(Model)
-    if blessure_id:
-        q = q.filter(Model.blessure_id == blessure_id)
-    rows = q.all()
+def _aggregate_bilateral_tests(cols: PhaseColumns, fase_label: str, tests: List[Tuple[str, str]]) -> Dict[str, Any]:
     out = []
     for label, base in tests:
-        if not hasattr(Model, base):
+        if not cols.has(base):
             continue
-        vals = [_safe(getattr(r, base)) for r in rows if getattr(r, base) is not None]
+        mean, _ = column_means(cols.column(base)[:, None])
         out.append({
             "test": label,
-            "mean": _avg(vals, 1),
-            "n": len(vals)
+            "mean": round_or_none(mean[0], 1),
+            # 0-waarden tellen mee in n, niet in het gemiddelde
+            "n": int(np.count_nonzero(~np.isnan(cols.column_raw(base)))),
         })
     return {"fase": fase_label, "testen": out}
 
@@ -188,41 +120,22 @@ def _aggregate_bilateral_tests(db: Session, fase_label: str, Model, tests: List[
 # Hop Test Cluster — gecombineerde LSI-index
 # -----------------------------------------------------
 
-def _aggregate_hop_cluster(db: Session, fase_label: str, Model, blessure_id: Optional[int] = None) -> Dict[str, Any]:
-    q = db.query(Model, Blessure).join(Blessure, Model.blessure_id == Blessure.blessure_id)
-    if blessure_id:
-        q = q.filter(Blessure.blessure_id == blessure_id)
-    rows = q.all()
-
-    lsi_values = {"cmj_hoogte": [], "single_hop_distance": [], "sidehop": []}
+HOP_CLUSTER_FIELDS = ["cmj_hoogte", "single_hop_distance", "sidehop"]
 
-    for rec, bl in rows:
-        oper_side, gez_side = _oper_gezond_sides(bl.zijde)
-        if not oper_side:
-            continue
-
-        def _lsi(field):
-            op = _safe(getattr(rec, f"{field}_{oper_side}", None))
-            gz = _safe(getattr(rec, f"{field}_{gez_side}", None))
-            if op and gz:
-                return (op / gz) * 100
-            return None
 
-        cmj = _lsi("cmj_hoogte")
-        hop = _lsi("single_hop_distance")
-        side = _lsi("sidehop")
+def _aggregate_hop_cluster(cols: PhaseColumns, fase_label: str) -> Dict[str, Any]:
+    oper, gezond = cols.sides(HOP_CLUSTER_FIELDS)
+    lsi = oper / gezond * 100
 
-        if cmj: lsi_values["cmj_hoogte"].append(cmj)
-        if hop: lsi_values["single_hop_distance"].append(hop)
-        if side: lsi_values["sidehop"].append(side)
+    means, _ = column_means(lsi)
+    subtests = {field: round_or_none(means[i], 1) for i, field in enumerate(HOP_CLUSTER_FIELDS)}
 
-    subtests = {k: _avg(v, 1) for k, v in lsi_values.items()}
-    all_vals = [v for arr in lsi_values.values() for v in arr]
+    all_vals = lsi[~np.isnan(lsi)]
     return {
         "fase": fase_label,
         "hop_cluster": {
-            "mean_lsi": _avg(all_vals, 1),
-            "n": len(all_vals),
+            "mean_lsi": round(float(all_vals.mean()), 1) if all_vals.size else None,
+            "n": int(all_vals.size),
             "subtests": subtests
         }
     }
@@ -244,17 +157,18 @@ def get_group_functioneel(db: Session = Depends(get_db)):
     out = {"baseline": None, "fases": []}
 
     # ✅ Baseline
-    out["baseline"] = _aggregate_baseline_categorical(db)
+    out["baseline"] = _aggregate_baseline_categorical(get_phase_matrix(db, Baseline))
 
     # ✅ Andere fases
     for fase_label, Model in FASES:
         if fase_label == "Baseline":
             continue
 
+        cols = get_phase_matrix(db, Model)
         fase_data = {"fase": fase_label, "functioneel": [], "spring": [], "hop_cluster": None}
 
         # --- Functionele testen ---
-        fase_func = _aggregate_unilateral_tests(db, fase_label, Model, FUNCTIONELE_TESTEN)
+        fase_func = _aggregate_unilateral_tests(cols, fase_label, FUNCTIONELE_TESTEN)
         fase_data["functioneel"] = fase_func["testen"]
 
         # --- CMJ + Drop Jump ---
@@ -263,13 +177,13 @@ def get_group_functioneel(db: Session = Depends(get_db)):
         dj_unilat = [t for t in DROPJUMP_TESTEN if "_2benig" not in t[1]]
         dj_bilat = [t for t in DROPJUMP_TESTEN if "_2benig" in t[1]]
 
-        spring_unilat = _aggregate_unilateral_tests(db, fase_label, Model, cmj_unilat + dj_unilat)
-        spring_bilat = _aggregate_bilateral_tests(db, fase_label, Model, cmj_bilat + dj_bilat)
+        spring_unilat = _aggregate_unilateral_tests(cols, fase_label, cmj_unilat + dj_unilat)
+        spring_bilat = _aggregate_bilateral_tests(cols, fase_label, cmj_bilat + dj_bilat)
         fase_data["spring"] = spring_unilat["testen"] + spring_bilat["testen"]
 
         # --- Hop Cluster ---
         if fase_label == "Maand 6":
-            fase_data["hop_cluster"] = _aggregate_hop_cluster(db, fase_label, Model)["hop_cluster"]
+            fase_data["hop_cluster"] = _aggregate_hop_cluster(cols, fase_label)["hop_cluster"]
 
         out["fases"].append(fase_data)
 
@@ -287,26 +201,25 @@ def get_individueel_functioneel(blessure_id: int, db: Session = Depends(get_db))
     """
     out = {"baseline": None, "fases": []}
 
-    blessure = db.query(Blessure).filter(Blessure.blessure_id == blessure_id).first()
-    if not blessure:
+    if blessure_id not in get_blessure_zijden(db):
         return {"error": "Blessure niet gevonden"}
 
     # ✅ Baseline (Lag/VMO enkel deze blessure)
-    out["baseline"] = _aggregate_baseline_categorical(db, blessure_id)
+    out["baseline"] = _aggregate_baseline_categorical(get_phase_matrix(db, Baseline).only(blessure_id))
 
     # ✅ Andere fases
     for fase_label, Model in FASES:
         if fase_label == "Baseline":
             continue
 
-        rows = db.query(Model).filter(Model.blessure_id == blessure_id).all()
-        if not rows:
+        cols = get_phase_matrix(db, Model).only(blessure_id)
+        if not len(cols):
             continue
 
         fase_data = {"fase": fase_label, "functioneel": [], "spring": [], "hop_cluster": None}
 
         # --- Functionele testen ---
-        fase_func = _aggregate_unilateral_tests(db, fase_label, Model, FUNCTIONELE_TESTEN, blessure_id)
+        fase_func = _aggregate_unilateral_tests(cols, fase_label, FUNCTIONELE_TESTEN)
         fase_data["functioneel"] = fase_func["testen"]
 
         # --- Springtesten ---
@@ -314,13 +227,13 @@ def get_individueel_functioneel(blessure_id: int, db: Session = Depends(get_db))
         cmj_bilat = [t for t in CMJ_TESTEN if "_2benig" in t[1]]
         dj_unilat = [t for t in DROPJUMP_TESTEN if "_2benig" not in t[1]]
         dj_bilat = [t for t in DROPJUMP_TESTEN if "_2benig" in t[1]]
-        spring_unilat = _aggregate_unilateral_tests(db, fase_label, Model, cmj_unilat + dj_unilat, blessure_id)
-        spring_bilat = _aggregate_bilateral_tests(db, fase_label, Model, cmj_bilat + dj_bilat, blessure_id)
+        spring_unilat = _aggregate_unilateral_tests(cols, fase_label, cmj_unilat + dj_unilat)
+        spring_bilat = _aggregate_bilateral_tests(cols, fase_label, cmj_bilat + dj_bilat)
         fase_data["spring"] = spring_unilat["testen"] + spring_bilat["testen"]
 
         # --- Hop Cluster ---
         if fase_label == "Maand 6":
-            fase_data["hop_cluster"] = _aggregate_hop_cluster(db, fase_label, Model, blessure_id)["hop_cluster"]
+            fase_data["hop_cluster"] = _aggregate_hop_cluster(cols, fase_label)["hop_cluster"]
 
         out["fases"].append(fase_data)
 
@@ -4,15 +4,14 @@
 # =====================================================
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session
 from typing import List, Tuple, Optional
 from datetime import date
 from db import get_db
-import statistics
+import crud
 
 # Models
 from models.patient import Patient
-from models.blessure import Blessure
 from models.baseline import Baseline
 from models.week6 import Week6
 from models.maand3 import Maand3
@@ -114,20 +113,14 @@ SPRING_TESTEN_BILAT = [
 # =====================================================
 @router.get("/{id}/metrics")
 def get_individueel_metrics(id: int, db: Session = Depends(get_db)):
-    blessure = db.query(Blessure).filter(Blessure.blessure_id == id).first()
-    if blessure:
-        patient_id = blessure.patient_id
-    else:
-        patient_id = id
-
-    patient = db.query(Patient).filter(Patient.patient_id == patient_id).first()
-    if not patient:
-        raise HTTPException(status_code=404, detail="Patiënt niet gevonden")
-
-    blessure = db.query(Blessure).filter(Blessure.patient_id == patient_id).first()
-    if not blessure:
+    # Blessure + patiënt + alle fases in één round-trip
+    timeline = crud.load_patient_timeline(db, id)
+    if not timeline:
+        if not db.query(Patient).filter(Patient.patient_id == id).first():
+            raise HTTPException(status_code=404, detail="Patiënt niet gevonden")
         return {"error": "Geen blessure gekoppeld aan patiënt."}
 
+    blessure = timeline.blessure
     zijde = blessure.zijde or "Rechts"
     oper_side, gezond_side = _oper_gezond_sides(zijde)
     out = {"fases": []}
@@ -136,7 +129,7 @@ def get_individueel_metrics(id: int, db: Session = Depends(get_db)):
     # Loop over alle fases (altijd tonen)
     # -------------------------------------------------
     for fase_label, Model in FASES:
-        rec = db.query(Model).filter(Model.blessure_id == blessure.blessure_id).first()
+        rec = timeline.fase(Model)
         fase_info = {"fase": fase_label}
 
         # -------------------------------------------------
@@ -312,25 +305,19 @@ def _calc_leeftijd(geboortedatum: date):
 
 @router.get("/{blessure_id}/summary")
 def get_individueel_summary(blessure_id: int, db: Session = Depends(get_db)):
-    blessure = (
-        db.query(Blessure)
-        .options(joinedload(Blessure.patient))
-        .filter(Blessure.blessure_id == blessure_id)
-        .first()
-    )
-    if not blessure:
+    timeline = crud.load_timeline(db, blessure_id)
+    if not timeline:
         raise HTTPException(status_code=404, detail="Blessure niet gevonden")
 
-    patient = blessure.patient
-    aantal_blessures = (
-        db.query(Blessure).filter(Blessure.patient_id == blessure.patient_id).count()
-    )
+    blessure = timeline.blessure
+    patient = timeline.patient
+    aantal_blessures = timeline.aantal_blessures
 
     fases_aanwezig = []
     laatste_datum = None
 
     for naam, model in FASES_MAP.items():
-        record = db.query(model).filter(model.blessure_id == blessure.blessure_id).first()
+        record = timeline.fase(model)
         if record:
             fases_aanwezig.append(naam)
             if hasattr(record, "datum_onderzoek") and record.datum_onderzoek:
@@ -5,11 +5,11 @@
 
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple
 from db import get_db
+from phase_matrix import PhaseColumns, get_phase_matrix, paired_stats
 
 # Models
-from models.blessure import Blessure
 from models.week6 import Week6
 from models.maand3 import Maand3
 from models.maand45 import Maand45
@@ -17,37 +17,6 @@ from models.maand6 import Maand6
 
 router = APIRouter(prefix="/kracht", tags=["Kracht"])
 
-# -----------------------------------------------------
-# Helpers
-# -----------------------------------------------------
-
-def _safe(val):
-    """Converteer DECIMAL/Integer → float, filtert None en 0 (0 = ongeldig)."""
-    if val is None:
-        return None
-    try:
-        f = float(val)
-    except Exception:
-        return None
-    return None if f == 0 else f
-
-
-def _avg(values: List[float], ndigits: int = 2):
-    vals = [v for v in values if v is not None]
-    if not vals:
-        return None
-    return round(sum(vals) / len(vals), ndigits)
-
-
-def _oper_gezond_sides(zijde: str) -> Tuple[str, str]:
-    """Bepaal geopereerde en gezonde zijde."""
-    if zijde == "Links":
-        return "l", "r"
-    if zijde == "Rechts":
-        return "r", "l"
-    return None, None
-
-
 # -----------------------------------------------------
 # Config per fase
 # -----------------------------------------------------
@@ -85,107 +54,33 @@ COMMON_RATIOS = [
 ]
 
 # -----------------------------------------------------
-# Krachtanalyse per fase
+# Kracht + ratio's per fase (één gebatchte pass)
 # -----------------------------------------------------
 
-def _aggregate_phase(db: Session, fase_label: str, Model, fields: List[Tuple[str, str]], blessure_id: Optional[int] = None) -> Dict[str, Any]:
-    q = db.query(Model, Blessure).join(Blessure, Model.blessure_id == Blessure.blessure_id)
-    if blessure_id:
-        q = q.filter(Blessure.blessure_id == blessure_id)
-    rows = q.all()
-
-    buckets: Dict[str, Dict[str, List[float]]] = {label: {"oper": [], "gezond": [], "pairs": []} for label, _ in fields}
-
-    for rec, bl in rows:
-        oper_side, gezond_side = _oper_gezond_sides(bl.zijde)
-        if oper_side is None:
+def _aggregate_phase(cols: PhaseColumns, fase_label: str, fields: List[Tuple[str, str]], ratios: List[Tuple[str, str, str]]) -> Dict[str, Any]:
+    """
+    Gemiddelden, % verschil per patiënt en ratio's voor alle spiergroepen
+    van één fase, rechtstreeks op de kolom-arrays.
+    """
+    # --- Spiergroepen ---
+    oper, gezond = cols.sides([f"kracht_{base}" for _, base in fields])
+
+    spiergroepen = []
+    for (label, _), stats in zip(fields, paired_stats(oper, gezond, 1)):
+        if not stats["n_oper"] and not stats["n_gezond"]:
             continue
+        spiergroepen.append({"spiergroep": label, **stats})
 
-        for label, base in fields:
-            attr_oper = f"kracht_{base}_{oper_side}"
-            attr_gezond = f"kracht_{base}_{gezond_side}"
-
-            if not hasattr(rec, attr_oper) or not hasattr(rec, attr_gezond):
-                continue
+    # --- Ratio's (num/denom per zijde) ---
+    num_oper, num_gez = cols.sides([f"kracht_{num}" for _, num, _ in ratios])
+    den_oper, den_gez = cols.sides([f"kracht_{denom}" for _, _, denom in ratios])
 
-            v_oper = _safe(getattr(rec, attr_oper, None))
-            v_gez = _safe(getattr(rec, attr_gezond, None))
-
-            if v_oper is not None:
-                buckets[label]["oper"].append(v_oper)
-            if v_gez is not None:
-                buckets[label]["gezond"].append(v_gez)
-            if v_oper is not None and v_gez is not None and v_gez != 0:
-                delta = ((v_oper - v_gez) / v_gez) * 100
-                buckets[label]["pairs"].append(delta)
-
-    out = []
-    for label, _ in fields:
-        b = buckets[label]
-        if not b["oper"] and not b["gezond"]:
-            continue
-        out.append({
-            "spiergroep": label,
-            "geopereerd_mean": _avg(b["oper"], 1),
-            "gezond_mean": _avg(b["gezond"], 1),
-            "verschil_pct": _avg(b["pairs"], 1),
-            "n_oper": len(b["oper"]),
-            "n_gezond": len(b["gezond"]),
-            "n_pairs": len(b["pairs"]),
-        })
-    return {"fase": fase_label, "spiergroepen": out}
-
-
-# -----------------------------------------------------
-# Ratioanalyse per fase
-# -----------------------------------------------------
-
-def _aggregate_phase_ratios(db: Session, fase_label: str, Model, ratios: List[Tuple[str, str, str]], blessure_id: Optional[int] = None) -> Dict[str, Any]:
-    q = db.query(Model, Blessure).join(Blessure, Model.blessure_id == Blessure.blessure_id)
-    if blessure_id:
-        q = q.filter(Blessure.blessure_id == blessure_id)
-    rows = q.all()
-
-    buckets = {label: {"oper": [], "gezond": [], "diffs": []} for label, _, _ in ratios}
-
-    for rec, bl in rows:
-        oper_side, gezond_side = _oper_gezond_sides(bl.zijde)
-        if oper_side is None:
-            continue
+    ratio_out = [
+        {"ratio": label, **stats}
+        for (label, _, _), stats in zip(ratios, paired_stats(num_oper / den_oper, num_gez / den_gez, 2))
+    ]
 
-        for label, num_base, denom_base in ratios:
-
-            def _get_ratio(side: str):
-                num = _safe(getattr(rec, f"kracht_{num_base}_{side}", None))
-                denom = _safe(getattr(rec, f"kracht_{denom_base}_{side}", None))
-                if num is None or denom is None or denom == 0:
-                    return None
-                return num / denom
-
-            r_oper = _get_ratio(oper_side)
-            r_gez = _get_ratio(gezond_side)
-
-            if r_oper is not None:
-                buckets[label]["oper"].append(r_oper)
-            if r_gez is not None:
-                buckets[label]["gezond"].append(r_gez)
-            if r_oper is not None and r_gez is not None and r_gez != 0:
-                diff = ((r_oper - r_gez) / r_gez) * 100
-                buckets[label]["diffs"].append(diff)
-
-    out = []
-    for label, _, _ in ratios:
-        b = buckets[label]
-        out.append({
-            "ratio": label,
-            "geopereerd_mean": _avg(b["oper"], 2),
-            "gezond_mean": _avg(b["gezond"], 2),
-            "verschil_pct": _avg(b["diffs"], 1),
-            "n_oper": len(b["oper"]),
-            "n_gezond": len(b["gezond"]),
-            "n_pairs": len(b["diffs"]),
-        })
-    return {"fase": fase_label, "ratios": out}
+    return {"fase": fase_label, "spiergroepen": spiergroepen, "ratios": ratio_out}
 
 
 # -----------------------------------------------------
@@ -197,10 +92,8 @@ def get_group_kracht(db: Session = Depends(get_db)):
     """Krachtanalyse per fase (populatiegemiddelde)."""
     out = {"fases": []}
     for fase_label, Model, fields in FASES:
-        fase_out = _aggregate_phase(db, fase_label, Model, fields)
-        ratio_out = _aggregate_phase_ratios(db, fase_label, Model, COMMON_RATIOS)
-        fase_out["ratios"] = ratio_out["ratios"]
-        out["fases"].append(fase_out)
+        cols = get_phase_matrix(db, Model)
+        out["fases"].append(_aggregate_phase(cols, fase_label, fields, COMMON_RATIOS))
     return out
 
 
@@ -214,14 +107,15 @@ def get_individueel_kracht(blessure_id: int, db: Session = Depends(get_db)):
     out = {"fases": []}
 
     for fase_label, Model, fields in FASES:
-        fase_data = _aggregate_phase(db, fase_label, Model, fields, blessure_id)
-        ratio_data = _aggregate_phase_ratios(db, fase_label, Model, COMMON_RATIOS, blessure_id)
+        cols = get_phase_matrix(db, Model)
+        if blessure_id:
+            cols = cols.only(blessure_id)
+        fase_data = _aggregate_phase(cols, fase_label, fields, COMMON_RATIOS)
 
         # Enkel relevante spiergroepen/ratios tonen
         fase_data["spiergroepen"] = [d for d in fase_data["spiergroepen"] if d["n_oper"] > 0]
-        ratio_data["ratios"] = [r for r in ratio_data["ratios"] if r["n_oper"] > 0]
+        fase_data["ratios"] = [r for r in fase_data["ratios"] if r["n_oper"] > 0]
 
-        fase_data["ratios"] = ratio_data["ratios"]
         out["fases"].append(fase_data)
 
     return out
@@ -11,6 +11,7 @@ from models.maand3 import Maand3
 from models.blessure import Blessure
 from schemas.maand3 import Maand3Schema
 from routers.utils import ok, warn
+from phase_matrix import invalidate_phase_matrix
 
 router = APIRouter(prefix="/maand3", tags=["Maand 3"])
 
@@ -79,6 +80,7 @@ def upsert_maand3(data: Maand3Schema, db: Session = Depends(get_db)):
             for k, v in data.dict(exclude_unset=True).items():
                 setattr(obj, k, v)
             db.commit()
+            invalidate_phase_matrix()
             db.refresh(obj)
             ok(f"[MAAND3] Record geüpdatet (blessure_id={obj.blessure_id})")
             return obj
@@ -87,6 +89,7 @@ def upsert_maand3(data: Maand3Schema, db: Session = Depends(get_db)):
             obj = Maand3(**data.dict(exclude_unset=True))
             db.add(obj)
             db.commit()
+            invalidate_phase_matrix()
             db.refresh(obj)
             ok(f"[MAAND3] Nieuw record aangemaakt (blessure_id={obj.blessure_id})")
             return obj
@@ -108,5 +111,6 @@ def delete_maand3(blessure_id: int, db: Session = Depends(get_db)):
         raise HTTPException(404, "Maand3 niet gevonden")
     db.delete(obj)
     db.commit()
+    invalidate_phase_matrix()
     ok(f"[MAAND3] Record verwijderd (blessure_id={blessure_id})")
     return {"status": "✅ Maand3 verwijderd"}
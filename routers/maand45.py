@@ -11,6 +11,8 @@ from models.maand45 import Maand45
 from models.blessure import Blessure
 from schemas.maand45 import Maand45Schema
 from routers.utils import ok, warn
+from phase_matrix import invalidate_phase_matrix
+import populatie_stats
 
 router = APIRouter(prefix="/maand45", tags=["Maand 4.5"])
 
@@ -77,7 +79,9 @@ def upsert_maand45(data: Maand45Schema, db: Session = Depends(get_db)):
             for k, v in data.dict(exclude_unset=True).items():
                 setattr(obj, k, v)
             db.commit()
+            invalidate_phase_matrix()
             db.refresh(obj)
+            populatie_stats.refresh_blessure(db, obj.blessure_id)
             ok(f"[MAAND45] Record geüpdatet (blessure_id={obj.blessure_id})")
             return obj
         else:
@@ -85,7 +89,9 @@ def upsert_maand45(data: Maand45Schema, db: Session = Depends(get_db)):
             obj = Maand45(**data.dict(exclude_unset=True))
             db.add(obj)
             db.commit()
+            invalidate_phase_matrix()
             db.refresh(obj)
+            populatie_stats.refresh_blessure(db, obj.blessure_id)
             ok(f"[MAAND45] Nieuw record aangemaakt (blessure_id={obj.blessure_id})")
             return obj
 
@@ -106,5 +112,7 @@ def delete_maand45(blessure_id: int, db: Session = Depends(get_db)):
         raise HTTPException(404, "Maand4.5 niet gevonden")
     db.delete(obj)
     db.commit()
+    invalidate_phase_matrix()
+    populatie_stats.refresh_blessure(db, blessure_id)
     ok(f"[MAAND45] Record verwijderd (blessure_id={blessure_id})")
     return {"status": "✅ Maand4.5 verwijderd"}
@@ -11,6 +11,7 @@ from models.maand6 import Maand6
 from models.blessure import Blessure
 from schemas.maand6 import Maand6Schema
 from routers.utils import ok, warn
+from phase_matrix import invalidate_phase_matrix
 
 router = APIRouter(prefix="/maand6", tags=["Maand 6"])
 
@@ -78,6 +79,7 @@ def upsert_maand6(data: Maand6Schema, db: Session = Depends(get_db)):
             for k, v in data.dict(exclude_unset=True).items():
                 setattr(obj, k, v)
             db.commit()
+            invalidate_phase_matrix()
             db.refresh(obj)
             ok(f"[MAAND6] Record geüpdatet (blessure_id={obj.blessure_id})")
             return obj
@@ -86,6 +88,7 @@ def upsert_maand6(data: Maand6Schema, db: Session = Depends(get_db)):
             obj = Maand6(**data.dict(exclude_unset=True))
             db.add(obj)
             db.commit()
+            invalidate_phase_matrix()
             db.refresh(obj)
             ok(f"[MAAND6] Nieuw record aangemaakt (blessure_id={obj.blessure_id})")
             return obj
@@ -107,5 +110,6 @@ def delete_maand6(blessure_id: int, db: Session = Depends(get_db)):
         raise HTTPException(404, "Maand6 niet gevonden")
     db.delete(obj)
     db.commit()
+    invalidate_phase_matrix()
     ok(f"[MAAND6] Record verwijderd (blessure_id={blessure_id})")
     return {"status": "✅ Maand6 verwijderd"}
@@ -0,0 +1,385 @@
+# =====================================================
+# FILE: routers/mail_outbox.py
+# Mail-outbox + SMTP-worker (GEEN router → helpers)
+# =====================================================
+#
+# - enqueue_mail() bouwt het MIME-bericht en zet het in de tabel
+#   mail_outbox → de request is meteen klaar (geen SMTP in de request)
+# - Eén worker-thread per proces houdt een geauthenticeerde SMTP-verbinding
+#   open en verstuurt alle klaarstaande mails daarover (bulk = één sessie);
+#   na MAIL_SMTP_IDLE_SECONDS stilte wordt de verbinding gesloten;
+#   tempo begrensd op MAIL_SEND_RATE mails/seconde
+# - Tijdelijke fouten → retry met exponentiële backoff; permanente
+#   (5xx, ontvanger geweigerd) of te veel pogingen → failed
+# - Claimen via conditionele UPDATE → meerdere workers versturen nooit dubbel
+# - Rijen die blijven hangen in 'sending' gaan na MAIL_STALE_SECONDS terug
+#   in de wachtrij (bij elke ronde van de worker, niet enkel bij startup)
+# - Status waiting: mail wacht op een PDF-job (bulk); klaar → PDF als
+#   bijlage toevoegen en in de wachtrij; job mislukt of te lang → failed
+
+import email
+import os
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from email import policy
+from email.mime.application import MIMEApplication
+
+from sqlalchemy import inspect, or_, text
+
+from db import SessionLocal, engine
+from models.mail import MailOutbox
+from routers.utils import SMTP_USER, build_mail_message, err, ok, smtp_connect, warn
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+MAIL_OUTBOX_POLL = float(os.getenv("MAIL_OUTBOX_POLL", "5"))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "6"))
+MAIL_RETRY_BASE = float(os.getenv("MAIL_RETRY_BASE", "30"))
+MAIL_RETRY_MAX = float(os.getenv("MAIL_RETRY_MAX", "3600"))
+MAIL_SMTP_IDLE_SECONDS = float(os.getenv("MAIL_SMTP_IDLE_SECONDS", "60"))
+MAIL_STALE_SECONDS = int(os.getenv("MAIL_STALE_SECONDS", "300"))
+MAIL_RETENTION_DAYS = int(os.getenv("MAIL_RETENTION_DAYS", "30"))
+MAIL_BATCH_SIZE = 20
+
+# Maximaal zoveel mails per seconde over de sessie (0 = onbeperkt)
+MAIL_SEND_RATE = float(os.getenv("MAIL_SEND_RATE", "5"))
+
+# Zo lang mag een mail op zijn PDF-job wachten
+MAIL_PDF_TIMEOUT = int(os.getenv("MAIL_PDF_TIMEOUT", "3600"))
+
+WAITING, QUEUED, SENDING, SENT, FAILED = "waiting", "queued", "sending", "sent", "failed"
+
+# sendmail zet bij bytes geen LF → CRLF om → meteen met CRLF bewaren
+_SMTP_POLICY = policy.compat32.clone(linesep="\r\n")
+
+_wake = threading.Event()
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+
+
+# -----------------------------------------------------
+# Enqueue
+# -----------------------------------------------------
+
+def enqueue_mail(
+    db,
+    to: str,
+    subject: str,
+    body: str,
+    attachment_name: str = None,
+    attachment_bytes: bytes = None,
+    cc: str = None,
+    inline_images: dict = None,
+    inline_parts: list = None,
+    context: str = None,
+    pdf_job_id: str = None,
+) -> MailOutbox:
+    """
+    Zelfde argumenten als send_mail_mediawax; geeft de outbox-rij (status queued).
+    Met pdf_job_id: status waiting, de PDF van die job wordt later de bijlage.
+    """
+    msg_root, recipients = build_mail_message(
+        to, subject, body, attachment_name, attachment_bytes, cc, inline_images, inline_parts
+    )
+    now = datetime.utcnow()
+    row = MailOutbox(
+        sender=SMTP_USER,
+        recipients=",".join(recipients),
+        subject=subject,
+        message=msg_root.as_bytes(policy=_SMTP_POLICY),
+        context=context,
+        pdf_job_id=pdf_job_id,
+        status=WAITING if pdf_job_id else QUEUED,
+        attempts=0,
+        next_attempt_at=now,
+        created_at=now,
+    )
+    db.add(row)
+    db.commit()
+    _wake.set()
+    return row
+
+
+def mail_to_dict(row: MailOutbox) -> dict:
+    return {
+        "mail_id": row.id,
+        "status": row.status,
+        "pdf_job_id": row.pdf_job_id,
+        "attempts": row.attempts,
+        "next_attempt_at": row.next_attempt_at,
+        "error": row.last_error,
+        "created_at": row.created_at,
+        "sent_at": row.sent_at,
+    }
+
+
+# -----------------------------------------------------
+# Blijvende SMTP-sessie
+# -----------------------------------------------------
+
+class SmtpSession:
+    def __init__(self):
+        self.server: smtplib.SMTP | None = None
+        self.last_used = 0.0
+        self.last_send = 0.0
+
+    def _get(self) -> smtplib.SMTP:
+        if self.server is not None and time.monotonic() - self.last_used > MAIL_SMTP_IDLE_SECONDS:
+            self.close()   # server heeft ons wellicht al afgesloten
+        if self.server is None:
+            self.server = smtp_connect()
+            self.last_used = time.monotonic()
+            print("📡 [MAIL] SMTP-verbinding geopend")
+        return self.server
+
+    def throttle(self):
+        """Wacht tot de volgende mail mag vertrekken volgens MAIL_SEND_RATE."""
+        if MAIL_SEND_RATE <= 0:
+            return
+        delay = self.last_send + 1 / MAIL_SEND_RATE - time.monotonic()
+        if delay > 0:
+            _stop.wait(delay)
+
+    def send(self, sender: str, recipients: list[str], message: bytes) -> dict:
+        """sendmail over de open verbinding; verbroken → één keer opnieuw verbinden."""
+        self.throttle()
+        self.last_send = time.monotonic()
+        for attempt in (1, 2):
+            server = self._get()
+            try:
+                refused = server.sendmail(sender, recipients, message)
+                self.last_used = time.monotonic()
+                return refused
+            except smtplib.SMTPServerDisconnected:
+                self.close()
+                if attempt == 2:
+                    raise
+
+    def close_if_idle(self):
+        if self.server is not None and time.monotonic() - self.last_used > MAIL_SMTP_IDLE_SECONDS:
+            self.close()
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except Exception:
+            self.server.close()
+        self.server = None
+        print("📡 [MAIL] SMTP-verbinding gesloten")
+
+
+def _is_permanent(e: Exception) -> bool:
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(e, smtplib.SMTPAuthenticationError):
+        return False   # configuratie → na correctie alsnog versturen
+    return isinstance(e, smtplib.SMTPResponseException) and 500 <= e.smtp_code < 600
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(MAIL_RETRY_BASE * 2 ** (attempts - 1), MAIL_RETRY_MAX))
+
+
+# -----------------------------------------------------
+# Worker
+# -----------------------------------------------------
+
+def _claim(db, mail_id: int) -> bool:
+    claimed = (
+        db.query(MailOutbox)
+        .filter(MailOutbox.id == mail_id, MailOutbox.status == QUEUED)
+        .update({"status": SENDING, "claimed_at": datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    return claimed == 1
+
+
+def _send_one(db, session: SmtpSession, mail_id: int):
+    row = db.get(MailOutbox, mail_id)
+    try:
+        refused = session.send(row.sender, row.recipients.split(","), row.message)
+    except Exception as e:
+        if not isinstance(e, smtplib.SMTPResponseException):
+            session.close()   # netwerk/verbinding → volgende poging vers verbinden
+        row.attempts += 1
+        row.last_error = f"{type(e).__name__}: {e}"[:2000]
+        if _is_permanent(e) or row.attempts >= MAIL_MAX_ATTEMPTS:
+            row.status = FAILED
+            err(f"Mail {mail_id} definitief mislukt na {row.attempts} poging(en): {e}")
+        else:
+            row.status = QUEUED
+            row.next_attempt_at = datetime.utcnow() + _backoff(row.attempts)
+            warn(f"Mail {mail_id} mislukt (poging {row.attempts}), opnieuw om {row.next_attempt_at:%H:%M:%S}: {e}")
+        db.commit()
+        return
+
+    if refused:
+        warn(f"Mail {mail_id}: geweigerde ontvanger(s) {list(refused)}")
+    row.attempts += 1
+    row.status, row.sent_at, row.last_error = SENT, datetime.utcnow(), None
+    row.message = b""   # bijlage niet bewaren na verzending
+    db.commit()
+    ok(f"E-mail {mail_id} verzonden naar {row.recipients}")
+
+
+def _requeue_stale(db) -> int:
+    """
+    Rijen die te lang in 'sending' staan (crash, of een fout buiten de
+    verzendpoging) terug in de wachtrij. Kan hooguit één mail dubbel geven.
+    """
+    requeued = (
+        db.query(MailOutbox)
+        .filter(
+            MailOutbox.status == SENDING,
+            MailOutbox.claimed_at < datetime.utcnow() - timedelta(seconds=MAIL_STALE_SECONDS),
+        )
+        .update({"status": QUEUED, "claimed_at": None}, synchronize_session=False)
+    )
+    db.commit()
+    if requeued:
+        warn(f"{requeued} mail(s) bleven hangen in 'sending' → opnieuw in de wachtrij")
+    return requeued
+
+
+def _attach_pdf(message: bytes, pdf_bytes: bytes, filename: str) -> bytes:
+    msg = email.message_from_bytes(message)
+    part = MIMEApplication(pdf_bytes, Name=filename)
+    part["Content-Disposition"] = f'attachment; filename="{filename}"'
+    msg.attach(part)
+    return msg.as_bytes(policy=_SMTP_POLICY)
+
+
+def _resolve_waiting(db) -> int:
+    """Wachtende mails met een afgewerkte PDF-job → bijlage erbij + queued."""
+    # Lazy: routers.oefenschema importeert deze module (mail.py)
+    from models.oefenschema import PdfJob
+    from routers.oefenschema.pdf_cache import load_local_pdf, load_pdf_bytes
+
+    if db.query(MailOutbox.id).filter(MailOutbox.status == WAITING).first() is None:
+        return 0
+
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=MAIL_PDF_TIMEOUT)
+    rows = (
+        db.query(MailOutbox, PdfJob)
+        .outerjoin(PdfJob, PdfJob.id == MailOutbox.pdf_job_id)
+        .filter(
+            MailOutbox.status == WAITING,
+            or_(PdfJob.id.is_(None), PdfJob.status.in_(("done", "failed")), MailOutbox.created_at < cutoff),
+        )
+        .order_by(MailOutbox.id)
+        .limit(MAIL_BATCH_SIZE)
+        .all()
+    )
+    for row, job in rows:
+        pdf_bytes = None
+        if job is not None and job.status == "done":
+            pdf_bytes = load_local_pdf(job.content_hash) or load_pdf_bytes(job.pdf_path)
+
+        if pdf_bytes:
+            row.message = _attach_pdf(row.message, pdf_bytes, job.pdf_path.split("/")[-1])
+            row.status, row.next_attempt_at = QUEUED, now
+        elif job is None or job.status == "failed" or row.created_at < cutoff:
+            row.status = FAILED
+            row.last_error = f"PDF niet beschikbaar: {(job.error if job is not None else None) or 'job verdwenen of te lang bezig'}"[:2000]
+            err(f"Mail {row.id} mislukt: {row.last_error}")
+        # anders: PDF (nog) niet leesbaar → volgende ronde opnieuw
+    db.commit()
+    return len(rows)
+
+
+def _drain(session: SmtpSession) -> int:
+    """Alle klaarstaande mails versturen over dezelfde sessie. Geeft het aantal."""
+    handled = 0
+    db = SessionLocal()
+    try:
+        _requeue_stale(db)
+        try:
+            _resolve_waiting(db)
+        except Exception as e:
+            db.rollback()   # wachtende mails mogen het versturen niet blokkeren
+            err(f"Mail-outbox (wachtend op PDF) fout: {e}")
+        while not _stop.is_set():
+            due = [
+                mail_id for (mail_id,) in (
+                    db.query(MailOutbox.id)
+                    .filter(MailOutbox.status == QUEUED, MailOutbox.next_attempt_at <= datetime.utcnow())
+                    .order_by(MailOutbox.id)
+                    .limit(MAIL_BATCH_SIZE)
+                    .all()
+                )
+            ]
+            if not due:
+                break
+            for mail_id in due:
+                if _stop.is_set():
+                    break
+                if _claim(db, mail_id):
+                    _send_one(db, session, mail_id)
+                    handled += 1
+    except Exception as e:
+        db.rollback()
+        err(f"Mail-outbox fout: {e}")
+    finally:
+        db.close()
+    return handled
+
+
+def _worker():
+    session = SmtpSession()
+    try:
+        while not _stop.is_set():
+            if not _drain(session):
+                session.close_if_idle()
+            _wake.wait(MAIL_OUTBOX_POLL)
+            _wake.clear()
+    finally:
+        session.close()
+
+
+# -----------------------------------------------------
+# Startup / shutdown
+# -----------------------------------------------------
+
+def start():
+    """Tabel aanmaken indien nodig, oude rijen opruimen, worker starten."""
+    global _thread
+    MailOutbox.__table__.create(bind=engine, checkfirst=True)
+
+    # Kolom toegevoegd na de eerste versie van de tabel
+    if "pdf_job_id" not in {c["name"] for c in inspect(engine).get_columns(MailOutbox.__tablename__)}:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {MailOutbox.__tablename__} ADD COLUMN pdf_job_id VARCHAR(32)"))
+
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        db.query(MailOutbox).filter(
+            MailOutbox.status.in_((SENT, FAILED)),
+            MailOutbox.created_at < now - timedelta(days=MAIL_RETENTION_DAYS),
+        ).delete(synchronize_session=False)
+        db.commit()
+
+        # Crash tijdens verzenden → opnieuw (ook periodiek in de worker)
+        _requeue_stale(db)
+    finally:
+        db.close()
+
+    if _thread is None or not _thread.is_alive():
+        _stop.clear()
+        _thread = threading.Thread(target=_worker, name="mail-outbox", daemon=True)
+        _thread.start()
+
+
+def shutdown(timeout: float = 10):
+    global _thread
+    _stop.set()
+    _wake.set()
+    if _thread is not None:
+        _thread.join(timeout)
+        _thread = None
@@ -3,83 +3,286 @@
 # Revo Sport — OneDrive Proxy (ownerless mode)
 # =====================================================
 
-import requests
+import os
+import re
+import httpx
 import mimetypes
-from fastapi import APIRouter, HTTPException, Response
-from datetime import datetime, timedelta
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
-from onedrive_auth import get_access_token
-from media_cache import cache_path_for
+import graph_client
+from image_variants import FULL, ensure_variant, is_variant, variant_path
+from media_access import graph_etag, graph_last_modified, is_fresh, quote_etag
+from media_cache import (
+    cache_path_for,
+    commit_file,
+    finish_flight,
+    join_flight,
+    read_cache_meta,
+    temp_path_for,
+    touch,
+    wait_flight,
+)
 from routers.oefenschema.path_normalizer import normalize_path
 
 router = APIRouter(prefix="/media", tags=["Media Proxy"])
 
-CACHE_TTL_HOURS = 72   # 3 dagen
+CHUNK_SIZE = 256 * 1024
+
+# Graph-eTags bevatten komma's ("{GUID},3") → lijst parsen op quoted strings
+ETAG_RE = re.compile(r'(?:W/)?"[^"]*"')
+
+# Browsercache: binnen max-age geen request, daarna If-None-Match → 304
+MEDIA_MAX_AGE = int(os.getenv("MEDIA_MAX_AGE", "3600"))
+
+# Headers die we van Graph 1-op-1 doorgeven
+PASSTHROUGH_HEADERS = ("Content-Length", "Content-Range", "Accept-Ranges")
+
+
+def _content_type(clean_path: str, fallback: str = "application/octet-stream") -> str:
+    content_type, _ = mimetypes.guess_type(clean_path)
+    return content_type or fallback
+
+
+# -----------------------------------------------------
+# Validators (ETag / Last-Modified) + 304
+# -----------------------------------------------------
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    return any(quote_etag(t) == etag for t in ETAG_RE.findall(header))
+
+
+def _validators(cache_file):
+    """Graph-eTag uit de metadata, anders afgeleid van grootte + mtime."""
+    meta = read_cache_meta(cache_file)
+    st = cache_file.stat()
+    etag = meta.get("etag") or f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+    return etag, meta.get("last_modified", st.st_mtime)
+
+
+def _cache_headers(etag, last_modified=None) -> dict:
+    headers = {"Cache-Control": f"private, max-age={MEDIA_MAX_AGE}"}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    return headers
+
+
+def _is_not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm:
+        return _etag_matches(inm, etag)
+
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _serve_cached(request: Request, cache_file, clean_path: str):
+    touch(cache_file)
+    etag, last_modified = _validators(cache_file)
+    headers = _cache_headers(etag, last_modified)
+
+    if _is_not_modified(request, etag, last_modified):
+        print(f"⚡ [CACHE] 304 Not Modified → {cache_file.name}")
+        return Response(status_code=304, headers=headers)
+
+    print(f"⚡ [CACHE] Served from local → {cache_file.name}")
+    return FileResponse(cache_file, media_type=_content_type(clean_path), headers=headers)
+
+
+# -----------------------------------------------------
+# Streaming vanuit Graph
+# -----------------------------------------------------
+
+class _GraphStream:
+    """
+    Geeft de Graph-respons in chunks door aan de client.
+    Met cache_file wordt tegelijk naar een tijdelijk bestand geschreven en
+    pas na een volledige download atomair geplaatst (afgebroken → weggegooid).
+    Wachtende requests (flight) worden pas daarna vrijgegeven.
+    close() ruimt alles op, ook als de body nooit gelezen werd (client weg
+    vóór de eerste chunk) → zie _GraphStreamingResponse.
+    """
+
+    def __init__(self, r: httpx.Response, cache_file=None, meta=None, flight=None):
+        self.r = r
+        self.cache_file = cache_file
+        self.meta = meta or {}
+        self.flight = flight
+        self.tmp = temp_path_for(cache_file) if cache_file else None
+        self.fh = open(self.tmp, "wb") if self.tmp else None
+        self.complete = False
+        self.closed = False
+
+    def __iter__(self):
+        for chunk in self.r.iter_bytes(chunk_size=CHUNK_SIZE):
+            if self.fh:
+                self.fh.write(chunk)
+            yield chunk
+        self.complete = True
+        self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.r.close()
+        if self.fh:
+            self.fh.close()
+            if self.complete:
+                commit_file(self.tmp, self.cache_file, self.meta)
+                print(f"💾 [CACHE] Updated → {self.cache_file.name}")
+            else:
+                self.tmp.unlink(missing_ok=True)
+        if self.flight:
+            finish_flight(self.cache_file, self.flight)
+
+
+class _GraphStreamingResponse(StreamingResponse):
+    """StreamingResponse die de _GraphStream altijd sluit: ook bij disconnect of send-fout."""
+
+    def __init__(self, stream: _GraphStream, **kwargs):
+        super().__init__(stream, **kwargs)
+        self.graph_stream = stream
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await run_in_threadpool(self.graph_stream.close)
 
 
 @router.get("/file")
-def proxy_file(path: str):
+def proxy_file(path: str, request: Request, variant: str | None = None):
     """
     Veilige proxy:
     - Normaliseert ALLE inkomende paden
     - Haalt bestanden op via Graph API (ownerless mode)
     - Lokale caching (PDF + JPG + PNG + alles)
     - Correcte Content-Type voor PDF rendering
+    - Streaming (geen volledige bestanden in RAM) + Range / 206
+    - ETag / Last-Modified / Cache-Control + 304 op If-None-Match /
+      If-Modified-Since; verlopen cache → conditionele request naar Graph
+    - Single-flight: gelijktijdige misses delen één download
+    - variant=thumb|pdf|full → vooraf gerenderde afgeleide (zie
+      image_variants); nog niet beschikbaar → origineel
     """
+    flight = None
+    stream = None
     try:
         # 1) Path normaliseren
         clean_path = normalize_path(path)
 
+        # 1b) Afgeleide gevraagd?
+        if variant and variant != FULL:
+            if not is_variant(variant):
+                raise HTTPException(400, f"Onbekende variant: {variant}")
+            vpath = variant_path(clean_path, variant)
+            vfile = cache_path_for(vpath)
+            if is_fresh(vfile) or ensure_variant(clean_path, variant) is not None:
+                return _serve_cached(request, vfile, vpath)
+            print(f"⚠️ [MEDIA PROXY] Geen {variant}-afgeleide voor {clean_path} → origineel")
+
         # 2) Cache file path
         cache_file = cache_path_for(clean_path)
 
-        # 3) Cache HIT?
-        if cache_file.exists():
-            age = datetime.now() - datetime.fromtimestamp(cache_file.stat().st_mtime)
-            if age < timedelta(hours=CACHE_TTL_HOURS):
-                print(f"⚡ [CACHE] Served from local → {cache_file.name}")
+        # 3) Cache HIT? → 304 of FileResponse (sendfile + Range via Starlette)
+        if is_fresh(cache_file):
+            return _serve_cached(request, cache_file, clean_path)
+
+        # 4) Single-flight: loopt er al een download voor dit pad → wachten.
+        #    Range-requests wachten mee maar worden zelf nooit leider.
+        range_header = request.headers.get("range")
+        for _ in range(2):
+            flight, leader = join_flight(cache_file)
+            if leader:
+                if range_header:
+                    finish_flight(cache_file, flight)
+                    flight = None
+                break
+
+            print(f"⏳ [CACHE] Wacht op lopende download → {cache_file.name}")
+            wait_flight(flight)
+            flight = None
+            if is_fresh(cache_file):
+                return _serve_cached(request, cache_file, clean_path)
 
-                # Correct mimetype
-                content_type, _ = mimetypes.guess_type(clean_path)
-                if not content_type:
-                    content_type = "application/octet-stream"
+        cached = cache_file.exists()
 
-                return Response(
-                    content=cache_file.read_bytes(),
-                    media_type=content_type
-                )
+        # 5) Graph API ophalen (Range-request wordt doorgegeven)
+        headers = {}
 
-        # 4) Graph API ophalen
-        token = get_access_token()
-        headers = {"Authorization": f"Bearer {token}"}
+        if range_header:
+            headers["Range"] = range_header
 
-        url = f"https://graph.microsoft.com/v1.0/drive/root:/{clean_path}:/content"
+        # Conditioneel: verlopen cache → onze Graph-eTag, koude cache → die van de client
+        conditional = read_cache_meta(cache_file).get("etag") if cached else request.headers.get("if-none-match")
+        if conditional:
+            headers["If-None-Match"] = conditional
+
+        url = f"/drive/root:/{clean_path}:/content"
 
         print("🌐 [MEDIA PROXY] FETCH")
         print("   → clean_path:", clean_path)
         print("   → url:       ", url)
+        if range_header:
+            print("   → range:     ", range_header)
 
-        r = requests.get(url, headers=headers, stream=True, timeout=20)
+        r = graph_client.get(url, headers=headers, stream=True, timeout=20)
         print("   → status:    ", r.status_code)
 
-        if r.status_code != 200:
+        # 304 → ongewijzigd: cache verlengen of 304 doorgeven aan de client
+        if r.status_code == 304:
+            r.close()
+            if cached:
+                os.utime(cache_file, None)
+                print(f"♻️ [CACHE] Gerevalideerd → {cache_file.name}")
+                return _serve_cached(request, cache_file, clean_path)
+            return Response(status_code=304, headers=_cache_headers(graph_etag(r) or quote_etag(conditional)))
+
+        if r.status_code not in (200, 206):
+            r.read()
+            r.close()
             print("   → Graph body:", r.text)
             raise HTTPException(r.status_code, f"Graph error: {r.text}")
 
-        content = r.content
+        # 6) Enkel een volledige download komt in de cache
+        etag = graph_etag(r)
+        last_modified = graph_last_modified(r)
+        stream = _GraphStream(
+            r,
+            cache_file if r.status_code == 200 else None,
+            {"etag": etag, "last_modified": last_modified},
+            flight if r.status_code == 200 else None,
+        )
+        if r.status_code == 200:
+            flight = None   # vanaf hier geeft de stream de flight vrij
 
-        # 5) Cache update
-        cache_file.write_bytes(content)
-        print(f"💾 [CACHE] Updated → {cache_file.name}")
+        # 7) juiste Content-Type bepalen
+        content_type = _content_type(clean_path, r.headers.get("Content-Type", "application/octet-stream"))
 
-        # 6) juiste Content-Type bepalen
-        content_type, _ = mimetypes.guess_type(clean_path)
-        if not content_type:
-            content_type = r.headers.get("Content-Type", "application/octet-stream")
+        out_headers = {k: r.headers[k] for k in PASSTHROUGH_HEADERS if k in r.headers}
+        if "Content-Encoding" in r.headers:
+            # iter_bytes decodeert → oorspronkelijke lengte klopt niet meer
+            out_headers.pop("Content-Length", None)
+        out_headers.setdefault("Accept-Ranges", "bytes")
+        out_headers.update(_cache_headers(etag, last_modified))
 
-        return Response(
-            content=content,
-            media_type=content_type
+        return _GraphStreamingResponse(
+            stream,
+            status_code=r.status_code,
+            media_type=content_type,
+            headers=out_headers,
         )
 
     except HTTPException:
@@ -87,4 +290,10 @@ def proxy_file(path: str):
 
     except Exception as e:
         print("❌ [MEDIA PROXY] Fout:", e)
+        if stream is not None:
+            stream.close()   # response nooit gemaakt → Graph-verbinding + flight vrijgeven
         raise HTTPException(500, "Proxyfout bij ophalen bestand")
+
+    finally:
+        if flight:
+            finish_flight(cache_file, flight)
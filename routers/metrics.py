@@ -11,8 +11,8 @@ from models.week6 import Week6
 from models.maand3 import Maand3
 from models.maand45 import Maand45
 from models.maand6 import Maand6
-from models.blessure import Blessure
-import statistics
+from phase_matrix import get_phase_matrix, get_blessure_zijden, column_means, round_or_none
+import numpy as np
 
 router = APIRouter(prefix="/metrics", tags=["Metrics"])
 
@@ -20,18 +20,25 @@ router = APIRouter(prefix="/metrics", tags=["Metrics"])
 # -----------------------------------------------------
 # Helpers
 # -----------------------------------------------------
-def avg_safe(values):
-    vals = [v for v in values if v not in (None, 0)]
-    return round(statistics.mean(vals), 1) if vals else None
+FASES = {
+    "Baseline": Baseline,
+    "Week 6": Week6,
+    "Maand 3": Maand3,
+    "Maand 4.5": Maand45,
+    "Maand 6": Maand6,
+}
 
+OMTREK_FIELDS = [
+    "omtrek_5cm_boven_patella",
+    "omtrek_10cm_boven_patella",
+    "omtrek_20cm_boven_patella",
+]
 
-def perc_diff(operated, healthy):
-    """Bereken % verschil tussen geopereerde en niet-geopereerde zijde per patiënt."""
-    diffs = []
-    for o, h in zip(operated, healthy):
-        if o and h and h != 0:
-            diffs.append((o - h) / h * 100)
-    return avg_safe(diffs)
+
+def _mean_1(mat: np.ndarray) -> list:
+    """Gemiddelde per kolom (1 decimaal); NaN-waarden tellen niet mee."""
+    means, _ = column_means(mat)
+    return [round_or_none(m, 1) for m in means]
 
 
 # -----------------------------------------------------
@@ -39,97 +46,47 @@ def perc_diff(operated, healthy):
 # -----------------------------------------------------
 @router.get("/summary")
 def get_metrics_summary(db: Session = Depends(get_db)):
-    fases = {
-        "Baseline": Baseline,
-        "Week 6": Week6,
-        "Maand 3": Maand3,
-        "Maand 4.5": Maand45,
-        "Maand 6": Maand6,
-    }
-
-    blessure_zijden = {b.blessure_id: b.zijde for b in db.query(Blessure).all()}
     result = {"antropometrie": [], "mobiliteit": []}
 
-    for label, model in fases.items():
-        rows = db.query(model).all()
+    for label, model in FASES.items():
+        cols = get_phase_matrix(db, model)
 
         # -------------------------------------------------
         # ANTROPOMETRIE — geopereerde zijde + % verschil
         # -------------------------------------------------
-        omtrek5_operated, omtrek10_operated, omtrek20_operated = [], [], []
-        diff5_vals, diff10_vals, diff20_vals = [], [], []
-
-        for r in rows:
-            side = blessure_zijden.get(r.blessure_id)
-            if not side:
-                continue
-
-            # 🔸 bepaal waarden geopereerde vs gezonde zijde
-            if side == "Links":
-                op5 = getattr(r, "omtrek_5cm_boven_patella_l", None)
-                op10 = getattr(r, "omtrek_10cm_boven_patella_l", None)
-                op20 = getattr(r, "omtrek_20cm_boven_patella_l", None)
-                he5 = getattr(r, "omtrek_5cm_boven_patella_r", None)
-                he10 = getattr(r, "omtrek_10cm_boven_patella_r", None)
-                he20 = getattr(r, "omtrek_20cm_boven_patella_r", None)
-            else:
-                op5 = getattr(r, "omtrek_5cm_boven_patella_r", None)
-                op10 = getattr(r, "omtrek_10cm_boven_patella_r", None)
-                op20 = getattr(r, "omtrek_20cm_boven_patella_r", None)
-                he5 = getattr(r, "omtrek_5cm_boven_patella_l", None)
-                he10 = getattr(r, "omtrek_10cm_boven_patella_l", None)
-                he20 = getattr(r, "omtrek_20cm_boven_patella_l", None)
-
-            omtrek5_operated.append(op5)
-            omtrek10_operated.append(op10)
-            omtrek20_operated.append(op20)
-
-            # bereken % verschillen per patiënt
-            if op5 and he5 and he5 != 0:
-                diff5_vals.append((op5 - he5) / he5 * 100)
-            if op10 and he10 and he10 != 0:
-                diff10_vals.append((op10 - he10) / he10 * 100)
-            if op20 and he20 and he20 != 0:
-                diff20_vals.append((op20 - he20) / he20 * 100)
+        oper, gezond = cols.sides(OMTREK_FIELDS)
+        diff = (oper - gezond) / gezond * 100
+        # identiek aan vroeger: een verschil van exact 0 telt niet mee
+        diff[diff == 0] = np.nan
+
+        cm5, cm10, cm20 = _mean_1(oper)
+        diff5, diff10, diff20 = _mean_1(diff)
 
         result["antropometrie"].append({
             "fase": label,
-            "cm5": avg_safe(omtrek5_operated),
-            "cm10": avg_safe(omtrek10_operated),
-            "cm20": avg_safe(omtrek20_operated),
-            "diff5": avg_safe(diff5_vals),
-            "diff10": avg_safe(diff10_vals),
-            "diff20": avg_safe(diff20_vals),
+            "cm5": cm5,
+            "cm10": cm10,
+            "cm20": cm20,
+            "diff5": diff5,
+            "diff10": diff10,
+            "diff20": diff20,
         })
 
         # -------------------------------------------------
         # MOBILITEIT — enkel geopereerde zijde
         # -------------------------------------------------
-        flexies, extensies = [], []
-
-        for r in rows:
-            side = blessure_zijden.get(r.blessure_id)
-            if not side:
-                continue
-
-            if label == "Baseline":
-                if side == "Links":
-                    flexie = getattr(r, "knie_flexie_l", None)
-                    extensie = getattr(r, "knie_extensie_l", None)
-                else:
-                    flexie = getattr(r, "knie_flexie_r", None)
-                    extensie = getattr(r, "knie_extensie_r", None)
-            else:
-                flexie = getattr(r, "knie_flexie", None)
-                extensie = getattr(r, "knie_extensie", None)
-
-            flexies.append(flexie)
-            extensies.append(extensie)
+        if label == "Baseline":
+            mob, _ = cols.sides(["knie_flexie", "knie_extensie"])
+        else:
+            mob = np.column_stack([cols.column("knie_flexie"), cols.column("knie_extensie")])
+            mob[~cols.sided] = np.nan
+
+        flexie, extensie = _mean_1(mob)
 
         result["mobiliteit"].append({
             "fase": label,
-            "flexie": avg_safe(flexies),
-            "extensie": avg_safe(extensies),
+            "flexie": flexie,
+            "extensie": extensie,
         })
 
     return result
@@ -143,23 +100,15 @@ def get_individueel_metrics(blessure_id: int, db: Session = Depends(get_db)):
     """
     Retourneert metrics (omtrek + mobiliteit) voor één blessure_id.
     """
-    fases = {
-        "Baseline": Baseline,
-        "Week 6": Week6,
-        "Maand 3": Maand3,
-        "Maand 4.5": Maand45,
-        "Maand 6": Maand6,
-    }
-
-    blessure = db.query(Blessure).filter(Blessure.blessure_id == blessure_id).first()
-    if not blessure:
+    zijden = get_blessure_zijden(db)
+    if blessure_id not in zijden:
         return {"error": "Blessure niet gevonden"}
 
-    zijde = blessure.zijde
+    zijde = zijden[blessure_id]
     result = {"antropometrie": [], "mobiliteit": []}
 
-    for label, model in fases.items():
-        row = db.query(model).filter(model.blessure_id == blessure_id).first()
+    for label, model in FASES.items():
+        row = get_phase_matrix(db, model).record(blessure_id)
         if not row:
             continue
 
@@ -3,23 +3,32 @@
 # Revo Sport — FINAL STABLE MAIL MODULE (PDF + OneDrive Safe)
 # =====================================================
 
-import requests
 import os
 
-from fastapi import APIRouter, Depends, HTTPException, Form
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Form, Response
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from db import SessionLocal
 from models.oefenschema import Oefenschema
-from routers.oefenschema.paths import schema_pdf_path
-
-from onedrive_auth import get_access_token
-from onedrive_service import upload_bytes
+from schemas.oefenschema import OefenschemaBulkMailRequest
 
-from routers.utils import send_mail_mediawax
-from routers.oefenschema.pdf import make_pdf
+from routers.mail_outbox import enqueue_mail, mail_to_dict
+from models.mail import MailOutbox
+from routers.oefenschema import pdf_jobs
+from routers.oefenschema.paths import schema_pdf_path
+from routers.oefenschema.pdf_cache import (
+    artifact_pdf,
+    cached_schema_pdf,
+    current_artifacts,
+    schema_pdf_hash,
+    template_versions_for,
+)
+from routers.oefenschema.mail_template import fill_template, logo_part
 from security import get_current_user
 
+# Maximaal aantal schema's per bulk-aanvraag
+MAIL_BULK_MAX = int(os.getenv("MAIL_BULK_MAX", "300"))
+
 
 # =====================================================
 # ROUTER
@@ -44,138 +53,149 @@ def get_db():
 
 
 # =====================================================
-# HTML MAIL TEMPLATE
+# HELPERS (enkel + bulk)
 # =====================================================
-def fill_template(patient_naam, therapeut_naam, datum, extra_bericht=None):
-    datum_str = datum.strftime("%d/%m/%Y")
-    subject = f"Revo Sport – Oefenschema {datum_str}"
-
-    extra_html = (
-        f"""
-        <p style='font-size:12px; line-height:1.6; margin:0 0 16px 0;'>
-            {extra_bericht}
-        </p>
-        """
-        if extra_bericht
-        else ""
+def _valid_pdf(pdf_bytes) -> bool:
+    return isinstance(pdf_bytes, (bytes, bytearray)) and len(pdf_bytes) >= 100
+
+
+def _queue_schema_mail(
+    db: Session,
+    schema: Oefenschema,
+    pdf_bytes: bytes | None,
+    pdf_path: str,
+    current_user,
+    extra=None,
+    pdf_job_id: str = None,
+):
+    """Mail in de outbox; zonder pdf_bytes wacht ze op pdf_job_id (bijlage volgt)."""
+    therapeut_naam = current_user.full_name or "Revo Sport"
+    therapeut_email = current_user.email
+
+    subject, html_body = fill_template(
+        patient_naam=schema.patient.naam,
+        therapeut_naam=therapeut_naam,
+        datum=schema.datum,
+        extra_bericht=extra,
     )
 
-    html_body = f"""
-<!-- ========================= -->
-<!--     BODY (12px)           -->
-<!-- ========================= -->
-
-<p style="font-size:12px; line-height:1.6; margin:0 0 16px 0;">
-  Beste {patient_naam},
-</p>
-
-<p style="font-size:12px; line-height:1.6; margin:0 0 16px 0;">
-  In bijlage vind je jouw gepersonaliseerd oefenschema met de oefeningen die we samen hebben doorgenomen.
-</p>
-
-{extra_html}
-
-<p style="font-size:12px; line-height:1.6; margin:0 0 16px 0;">
-  Veel succes met je training! 💪<br>
-  Aarzel zeker niet om contact op te nemen bij eventuele vragen of opmerkingen.
-</p>
-
-<p style="font-size:12px; line-height:1.6; margin:0 0 22px 0;">
-  Sportieve groet,<br>
-  <span style="color:#FF7900;">{therapeut_naam}</span>
-</p>
-
-
-<!-- ========================= -->
-<!--       FOOTER (10px)       -->
-<!-- ========================= -->
-
-<!-- Oranje lijn -->
-<div style="height:1px; width:120px; background-color:#FF7900; margin:0 0 8px 0;"></div>
-
-<!-- Web | Mail | Instagram -->
-<p style="font-size:10px; line-height:1.4; color:white; margin:0 0 6px 0;">
-  <a href="https://www.revosport.be" style="color:#FF7900; text-decoration:none;">www.revosport.be</a> |
-  <a href="mailto:info@revosport.be" style="color:#FF7900; text-decoration:none;">info@revosport.be</a> |
-  <a href="https://www.instagram.com/revosport.physio/" style="color:#FF7900; text-decoration:none;">Instagram</a>
-</p>
-
-
-<!-- Adressen + telefoons + logo in 1 tabel -->
-<table role="presentation" cellspacing="0" cellpadding="0" border="0"
-       style="font-size:10px; line-height:1.2; color:white; border-collapse:collapse; margin:0; padding:0;">
-
-  <!-- Rij 1 -->
-  <tr>
-    <td style="padding:0 16px 0 0; white-space:nowrap;">
-      Tramstraat 69 – 9070 Heusden
-    </td>
-    <td style="color:#FF7900; padding:0 8px; font-weight:bold;">|</td>
-    <td style="white-space:nowrap;">
-      +32 491 28 20 53
-    </td>
-  </tr>
-
-  <!-- Rij 2 -->
-  <tr>
-    <td style="padding:0 16px 2px 0; white-space:nowrap;">
-      Zwijnnaardsesteenweg 674 – 9000 Gent
-    </td>
-    <td style="color:#FF7900; padding:0 8px; font-weight:bold;">|</td>
-    <td style="white-space:nowrap; padding-bottom:2px;">
-      +32 472 26 51 29
-    </td>
-  </tr>
-
-  <!-- LOGO — perfect tegen de tekst -->
-  <tr>
-    <td colspan="3" style="padding:2px 0 0 0; margin:0; line-height:0;">
-      <table role="presentation" cellspacing="0" cellpadding="0" border="0"
-             style="margin:0; padding:0; line-height:0; border-collapse:collapse;">
-        <tr>
-          <td style="padding:8; margin:0; line-height:0;">
-            <img src="cid:revosport_logo" width="110"
-                 style="display:block; border:0; padding:0; margin:0; line-height:0;">
-          </td>
-        </tr>
-      </table>
-    </td>
-  </tr>
-
-</table>
-"""
-
-    return subject, html_body
+    # Logo: één keer geladen + gecodeerd (mail_template), hier enkel hergebruikt
+    logo = logo_part()
+
+    # ✔️ DIT IS DE JUISTE BESTANDSNAAM
+    attachment_name = pdf_path.split("/")[-1]
+
+    return enqueue_mail(
+        db,
+        to=schema.patient.email,
+        subject=subject,
+        body=html_body,
+        attachment_name=attachment_name,     # <— FIX
+        attachment_bytes=pdf_bytes,
+        cc=therapeut_email,
+        inline_parts=[logo] if logo else None,
+        context=f"schema:{schema.id}",
+        pdf_job_id=pdf_job_id,
+    )
 
 
 # =====================================================
-# SAFE PDF LOADER (OneDrive)
+# BULK: alle schema's van een dag / selectie mailen
 # =====================================================
-
-def load_pdf_bytes(graph_path: str) -> bytes | None:
-    """Haalt PDF op van OneDrive. Geeft None bij fout of HTML-response."""
-    if not graph_path:
-        return None
-
-    token = get_access_token()
-    url = f"https://graph.microsoft.com/v1.0/drive/root:/{graph_path}:/content"
-
-    try:
-        r = requests.get(url, headers={"Authorization": f"Bearer {token}"}, timeout=20)
-    except Exception as e:
-        print("❌ load_pdf_bytes request error:", e)
-        return None
-
-    if not r.ok:
-        print(f"❌ load_pdf_bytes status error: {r.status_code}")
-        return None
-
-    # Detect HTML errorpagina's (Graph API fout)
-    if r.content.startswith(b"<html") or r.content.startswith(b"<!DOCTYPE"):
-        print("❌ load_pdf_bytes returned HTML instead of PDF")
-        return None
-
-    return r.content
+# Vóór /{schema_id} registreren: anders matcht "bulk" daar (→ 422)
+@router.post("/bulk")
+def mail_schemas_bulk(
+    req: OefenschemaBulkMailRequest,
+    response: Response,
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Body: schema_ids en/of datum + created_by (+ extra bericht).
+    - Schema's + patiënten + oefeningen, templateversies en PDF-artefacten
+      elk in één query geladen
+    - PDF klaar → mail meteen in de outbox
+    - PDF nog te renderen → job in de queue + mail in de outbox met status
+      waiting (bijlage volgt zodra de job klaar is); antwoord 202
+    - Eén SMTP-sessie, tempo via MAIL_SEND_RATE
+    Antwoord: rapport per schema (mail_id, job_id voor wachtende mails).
+    """
+    if not req.schema_ids and req.datum is None:
+        raise HTTPException(400, "Geef schema_ids of een datum op")
+
+    q = db.query(Oefenschema).options(
+        joinedload(Oefenschema.patient),
+        selectinload(Oefenschema.oefeningen),
+    )
+    if req.schema_ids:
+        q = q.filter(Oefenschema.id.in_(req.schema_ids))
+    if req.datum is not None:
+        q = q.filter(Oefenschema.datum == req.datum)
+    if req.created_by:
+        q = q.filter(Oefenschema.created_by == req.created_by)
+    schemas = q.order_by(Oefenschema.id).all()
+
+    if len(schemas) > MAIL_BULK_MAX:
+        raise HTTPException(400, f"Te veel schema's ({len(schemas)} > {MAIL_BULK_MAX})")
+
+    report = {}
+
+    if req.schema_ids:
+        found = {s.id for s in schemas}
+        for sid in req.schema_ids:
+            if sid not in found:
+                report[sid] = {"schema_id": sid, "status": "error", "error": "Schema niet gevonden"}
+
+    # 1) Hashes + artefacten voor alles vóór de eerste commit; elke mail
+    #    commit apart → geladen schema's niet laten vervallen (geen herlaad-query's)
+    db.expire_on_commit = False
+    template_versions = template_versions_for(db, schemas)
+    artifacts = current_artifacts(db, [s.id for s in schemas])
+
+    todo = []
+    for schema in schemas:
+        if not schema.patient or not schema.patient.email:
+            report[schema.id] = {"schema_id": schema.id, "status": "error", "error": "Patiënt heeft geen geldig e-mailadres"}
+            continue
+        content_hash = schema_pdf_hash(db, schema, template_versions)
+        todo.append((schema, content_hash, artifact_pdf(content_hash, artifacts.get(schema.id))))
+
+    # 2) Mails in de outbox; ontbrekende PDF's in de jobqueue
+    for schema, content_hash, cached in todo:
+        job_id = None
+        try:
+            if cached and _valid_pdf(cached[0]):
+                mail = _queue_schema_mail(db, schema, cached[0], cached[1], current_user, req.extra)
+            else:
+                job = pdf_jobs.enqueue_schema_pdf(db, schema, content_hash)
+                job_id = job.id
+                mail = _queue_schema_mail(
+                    db, schema, None, schema_pdf_path(schema), current_user, req.extra, pdf_job_id=job.id
+                )
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Mail fout (schema {schema.id}):", e)
+            report[schema.id] = {"schema_id": schema.id, "status": "error", "error": "E-mail kon niet in de wachtrij worden gezet"}
+            continue
+
+        entry = {"schema_id": schema.id, "status": mail.status, "mail_id": mail.id, "to": schema.patient.email}
+        if job_id:
+            entry["job_id"] = job_id
+        report[schema.id] = entry
+
+    results = sorted(report.values(), key=lambda r: r["schema_id"])
+    queued = sum(1 for r in results if r["status"] == "queued")
+    waiting = sum(1 for r in results if r["status"] == "waiting")
+    if waiting:
+        response.status_code = 202   # PDF's nog bezig → mails volgen vanzelf
+    print(f"📧 [MAIL BULK] {queued} klaar + {waiting} wachtend op PDF / {len(results)} schema's")
+    return {
+        "status": "ok",
+        "queued": queued,
+        "waiting": waiting,
+        "failed": len(results) - queued - waiting,
+        "results": results,
+    }
 
 
 # =====================================================
@@ -184,6 +204,7 @@ def load_pdf_bytes(graph_path: str) -> bytes | None:
 @router.post("/{schema_id}")
 def mail_schema(
     schema_id: int,
+    response: Response,
     extra: str | None = Form(None),
     current_user=Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -210,77 +231,45 @@ def mail_schema(
     schema.oefeningen = sorted(schema.oefeningen, key=lambda x: x.volgorde or 0)
 
     # =====================================================
-    # 2) PDF ophalen of genereren
+    # 2) PDF klaar (artefactcache: lokaal → OneDrive) → mail meteen in de
+    #    outbox; anders job in de queue + wachtende mail (bijlage volgt)
     # =====================================================
 
-    pdf_bytes = None
-
-    if schema.pdf_path:
-        pdf_bytes = load_pdf_bytes(schema.pdf_path)
-
-    if not pdf_bytes:
-        try:
-            pdf_bytes = make_pdf(schema)
-        except Exception as e:
-            print("❌ PDF-fout:", e)
-            raise HTTPException(500, "PDF kon niet worden gegenereerd")
-
-        try:
-            pdf_path = schema_pdf_path(schema)       # <— OBJECT, niet ID
-            upload_bytes(pdf_bytes, pdf_path)
-            schema.pdf_path = pdf_path
-            db.commit()
-        except Exception as e:
-            print("❌ OneDrive upload fout:", e)
-            raise HTTPException(500, "PDF kon niet worden opgeslagen")
-
-    if not isinstance(pdf_bytes, (bytes, bytearray)) or len(pdf_bytes) < 100:
-        print("❌ Ongeldige PDF BYTES")
-        raise HTTPException(500, "PDF is ongeldig")
-
-    # =====================================================
-    # LOGO LADEN
-    # =====================================================
-    logo_path = os.path.join("static", "revo_logomail.png")
-    logo_bytes = None
-
-    try:
-        with open(logo_path, "rb") as f:
-            logo_bytes = f.read()
-    except Exception as e:
-        print("❌ Kon revo_logo.png niet laden:", e)
-
-    # =====================================================
-    # 3) MAIL VERSTUREN
-    # =====================================================
-
-    therapeut_naam = current_user.full_name or "Revo Sport"
-    therapeut_email = current_user.email
-
-    subject, html_body = fill_template(
-        patient_naam=schema.patient.naam,
-        therapeut_naam=therapeut_naam,
-        datum=schema.datum,
-        extra_bericht=extra,
-    )
-
-    # ✔️ DIT IS DE JUISTE BESTANDSNAAM
-    attachment_name = schema.pdf_path.split("/")[-1]
+    cached = cached_schema_pdf(db, schema)
+    job = None
 
     try:
-        send_mail_mediawax(
-            to=schema.patient.email,
-            subject=subject,
-            body=html_body,
-            attachment_name=attachment_name,     # <— FIX
-            attachment_bytes=pdf_bytes,
-            cc=therapeut_email,
-            inline_images={"revosport_logo": logo_bytes} if logo_bytes else None,
-        )
+        if cached and _valid_pdf(cached[0]):
+            mail = _queue_schema_mail(db, schema, cached[0], cached[1], current_user, extra)
+        else:
+            job = pdf_jobs.enqueue_schema_pdf(db, schema)
+            mail = _queue_schema_mail(
+                db, schema, None, schema_pdf_path(schema), current_user, extra, pdf_job_id=job.id
+            )
 
     except Exception as e:
+        db.rollback()
         print("❌ Mail fout:", e)
-        raise HTTPException(500, "E-mail kon niet worden verzonden")
+        raise HTTPException(500, "E-mail kon niet in de wachtrij worden gezet")
 
-    return {"status": "ok", "message": "Schema verzonden"}
+    if job is not None:
+        response.status_code = 202   # PDF nog bezig → mail volgt vanzelf
+        return {
+            "status": "ok",
+            "message": "Schema wordt verzonden zodra de PDF klaar is",
+            "mail_id": mail.id,
+            "job_id": job.id,
+        }
 
+    return {"status": "ok", "message": "Schema wordt verzonden", "mail_id": mail.id}
+
+
+# =====================================================
+# STATUS VAN EEN MAIL IN DE OUTBOX
+# =====================================================
+@router.get("/status/{mail_id}")
+def mail_status(mail_id: int, db: Session = Depends(get_db)):
+    row = db.get(MailOutbox, mail_id)
+    if not row:
+        raise HTTPException(404, "Mail niet gevonden")
+    return mail_to_dict(row)
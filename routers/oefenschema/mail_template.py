@@ -0,0 +1,165 @@
+# =====================================================
+# FILE: routers/oefenschema/mail_template.py
+# Voorgecompileerde mailtemplate voor oefenschema's (GEEN router → helpers)
+# =====================================================
+#
+# Statische delen worden één keer opgebouwd (bij startup of eerste mail):
+# - footer-HTML als vaste string, body als string.Template
+# - logo als kant-en-klaar MIME-deel (base64 al gecodeerd, Content-ID gezet)
+# Per mail worden enkel nog patiënt, therapeut, datum en extra bericht
+# ingevuld. Het logo-deel wordt gedeeld tussen berichten → nooit wijzigen.
+
+import os
+import threading
+from email.mime.image import MIMEImage
+from string import Template
+
+LOGO_PATH = os.path.join("static", "revo_logomail.png")
+LOGO_CID = "revosport_logo"
+
+_lock = threading.Lock()
+_logo_part: MIMEImage | None = None
+_logo_loaded = False
+
+
+# =====================================================
+# STATISCHE HTML
+# =====================================================
+FOOTER_HTML = """<!-- ========================= -->
+<!--       FOOTER (10px)       -->
+<!-- ========================= -->
+
+<!-- Oranje lijn -->
+<div style="height:1px; width:120px; background-color:#FF7900; margin:0 0 8px 0;"></div>
+
+<!-- Web | Mail | Instagram -->
+<p style="font-size:10px; line-height:1.4; color:white; margin:0 0 6px 0;">
+  <a href="https://www.revosport.be" style="color:#FF7900; text-decoration:none;">www.revosport.be</a> |
+  <a href="mailto:info@revosport.be" style="color:#FF7900; text-decoration:none;">info@revosport.be</a> |
+  <a href="https://www.instagram.com/revosport.physio/" style="color:#FF7900; text-decoration:none;">Instagram</a>
+</p>
+
+
+<!-- Adressen + telefoons + logo in 1 tabel -->
+<table role="presentation" cellspacing="0" cellpadding="0" border="0"
+       style="font-size:10px; line-height:1.2; color:white; border-collapse:collapse; margin:0; padding:0;">
+
+  <!-- Rij 1 -->
+  <tr>
+    <td style="padding:0 16px 0 0; white-space:nowrap;">
+      Tramstraat 69 – 9070 Heusden
+    </td>
+    <td style="color:#FF7900; padding:0 8px; font-weight:bold;">|</td>
+    <td style="white-space:nowrap;">
+      +32 491 28 20 53
+    </td>
+  </tr>
+
+  <!-- Rij 2 -->
+  <tr>
+    <td style="padding:0 16px 2px 0; white-space:nowrap;">
+      Zwijnnaardsesteenweg 674 – 9000 Gent
+    </td>
+    <td style="color:#FF7900; padding:0 8px; font-weight:bold;">|</td>
+    <td style="white-space:nowrap; padding-bottom:2px;">
+      +32 472 26 51 29
+    </td>
+  </tr>
+
+  <!-- LOGO — perfect tegen de tekst -->
+  <tr>
+    <td colspan="3" style="padding:2px 0 0 0; margin:0; line-height:0;">
+      <table role="presentation" cellspacing="0" cellpadding="0" border="0"
+             style="margin:0; padding:0; line-height:0; border-collapse:collapse;">
+        <tr>
+          <td style="padding:8; margin:0; line-height:0;">
+            <img src="cid:revosport_logo" width="110"
+                 style="display:block; border:0; padding:0; margin:0; line-height:0;">
+          </td>
+        </tr>
+      </table>
+    </td>
+  </tr>
+
+</table>
+"""
+
+_BODY = Template("""
+<!-- ========================= -->
+<!--     BODY (12px)           -->
+<!-- ========================= -->
+
+<p style="font-size:12px; line-height:1.6; margin:0 0 16px 0;">
+  Beste ${patient_naam},
+</p>
+
+<p style="font-size:12px; line-height:1.6; margin:0 0 16px 0;">
+  In bijlage vind je jouw gepersonaliseerd oefenschema met de oefeningen die we samen hebben doorgenomen.
+</p>
+
+${extra_html}
+
+<p style="font-size:12px; line-height:1.6; margin:0 0 16px 0;">
+  Veel succes met je training! 💪<br>
+  Aarzel zeker niet om contact op te nemen bij eventuele vragen of opmerkingen.
+</p>
+
+<p style="font-size:12px; line-height:1.6; margin:0 0 22px 0;">
+  Sportieve groet,<br>
+  <span style="color:#FF7900;">${therapeut_naam}</span>
+</p>
+
+
+""" + FOOTER_HTML)
+
+_EXTRA = Template("""
+        <p style='font-size:12px; line-height:1.6; margin:0 0 16px 0;'>
+            ${extra_bericht}
+        </p>
+        """)
+
+
+# =====================================================
+# LOGO (CID-deel)
+# =====================================================
+def logo_part() -> MIMEImage | None:
+    """Gedeeld MIME-deel met het logo; None als het bestand ontbreekt."""
+    global _logo_part, _logo_loaded
+    if _logo_loaded:
+        return _logo_part
+
+    with _lock:
+        if not _logo_loaded:
+            try:
+                with open(LOGO_PATH, "rb") as f:
+                    part = MIMEImage(f.read())
+                part.add_header("Content-ID", f"<{LOGO_CID}>")
+                part.add_header("Content-Disposition", "inline", filename=f"{LOGO_CID}.png")
+                _logo_part = part
+            except Exception as e:
+                print(f"❌ Kon {LOGO_PATH} niet laden:", e)
+            _logo_loaded = True
+    return _logo_part
+
+
+def load():
+    """Vanuit startup: logo inlezen + coderen vóór de eerste mail."""
+    logo_part()
+
+
+# =====================================================
+# INVULLEN (per mail)
+# =====================================================
+def fill_template(patient_naam, therapeut_naam, datum, extra_bericht=None):
+    datum_str = datum.strftime("%d/%m/%Y")
+    subject = f"Revo Sport – Oefenschema {datum_str}"
+
+    extra_html = _EXTRA.substitute(extra_bericht=extra_bericht) if extra_bericht else ""
+
+    html_body = _BODY.substitute(
+        patient_naam=patient_naam,
+        therapeut_naam=therapeut_naam,
+        extra_html=extra_html,
+    )
+
+    return subject, html_body
@@ -3,23 +3,26 @@
 # PDF-generatie voor Schema's — FINAL STABLE VERSION
 # =====================================================
 
-import io
 import os
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from io import BytesIO
+from types import SimpleNamespace
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
-
-from PIL import Image as PILImage, UnidentifiedImageError
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.orm import Session
 
 from db import SessionLocal
-from models.oefenschema import Oefenschema
-from routers.oefenschema.paths import schema_pdf_path
-from onedrive_service import upload_bytes
+from models.oefenschema import Oefenschema, PdfJob
+from schemas.oefenschema import OefenschemaPDFExportRequest
 
-from media_cache import cache_path_for
+from image_variants import ensure_variant, render_variant
+from media_access import read_media
+from media_cache import cache_path_for, store_bytes, touch
+from routers.oefenschema.path_normalizer import normalize_path
 
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import cm
@@ -69,54 +72,107 @@ def extract_raw_path(url: str | None) -> str | None:
 # =====================================================
 # UNIFIED SAFE IMAGE LOADER
 # =====================================================
+# OneDrive-paden rechtstreeks via media_access (cache → Graph), geen
+# HTTP-request meer naar de eigen /media/file-proxy.
+
+PDF_IMAGE_FETCH_WORKERS = int(os.getenv("PDF_IMAGE_FETCH_WORKERS", "8"))
 
-API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
 
 def load_image_bytes(raw_path: str) -> bytes | None:
 
     if not raw_path or not isinstance(raw_path, str):
         return None
 
-    cache_p = cache_path_for(raw_path)
-
-    # 1) Cache
-    if cache_p.exists():
-        try:
-            b = cache_p.read_bytes()
-            if b and b[:4] != b"<htm":  # voorkom HTML
-                return b
-        except:
-            pass
-
-    # 2) OneDrive-proxy
-    try:
-        url = f"{API_BASE_URL}/media/file?path={raw_path}"
-        r = requests.get(url, timeout=8)
-
-        if r.ok and r.content and not r.content.startswith(b"<html"):
-            cache_p.write_bytes(r.content)
-            return r.content
-    except:
-        pass
-
-    # 3) Direct HTTP fallback
+    # Externe URL → rechtstreeks (met lokale cache)
     if raw_path.startswith("http://") or raw_path.startswith("https://"):
+        cache_p = cache_path_for(raw_path)
+        if cache_p.exists():
+            try:
+                b = cache_p.read_bytes()
+                if b and b[:4] != b"<htm":  # voorkom HTML
+                    touch(cache_p)
+                    return b
+            except:
+                pass
         try:
             r = requests.get(raw_path, timeout=8)
             if r.ok and r.content and not r.content.startswith(b"<html"):
-                cache_p.write_bytes(r.content)
+                store_bytes(raw_path, r.content)
                 return r.content
         except:
             pass
+        return None
 
-    return None
+    # OneDrive → zelfde cachebestand als de proxy
+    return read_media(normalize_path(raw_path))
+
+
+# =====================================================
+# SNAPSHOT + FOTO'S VOORAF (voor rendering in een apart proces)
+# =====================================================
+
+def schema_snapshot(schema) -> SimpleNamespace:
+    """Picklebare kopie van alles wat make_pdf nodig heeft (geen ORM/sessie)."""
+    return SimpleNamespace(
+        id=schema.id,
+        datum=schema.datum,
+        patient=SimpleNamespace(naam=schema.patient.naam),
+        oefeningen=[
+            SimpleNamespace(
+                volgorde=o.volgorde,
+                sets=o.sets,
+                reps=o.reps,
+                tempo=o.tempo,
+                gewicht=o.gewicht,
+                opmerking=o.opmerking,
+                foto1=o.foto1,
+                foto2=o.foto2,
+            )
+            for o in schema.oefeningen
+        ],
+    )
+
+
+def load_pdf_image(raw_path: str) -> bytes | None:
+    """Foto op PDF-celformaat: de vooraf gerenderde "pdf"-afgeleide, anders nu maken."""
+    if raw_path.startswith("http://") or raw_path.startswith("https://"):
+        data = load_image_bytes(raw_path)
+        return render_variant(data, "pdf") if data else None
+    return ensure_variant(normalize_path(raw_path), "pdf")
+
+
+def collect_image_bytes(schema, executor=None) -> dict:
+    """
+    Alle foto's van het schema op PDF-maat, parallel → {raw_path: bytes|None}.
+    Zonder executor een eigen kortlevende pool (nooit die van de aanroeper:
+    wachten op je eigen pool kan vastlopen).
+    """
+    paths = list(dict.fromkeys(
+        p for o in schema.oefeningen
+        for p in (extract_raw_path(o.foto1), extract_raw_path(o.foto2))
+        if p
+    ))
+    if not paths:
+        return {}
+    if executor is not None:
+        return dict(zip(paths, executor.map(load_pdf_image, paths)))
+
+    with ThreadPoolExecutor(max_workers=min(PDF_IMAGE_FETCH_WORKERS, len(paths)), thread_name_prefix="pdf-img") as pool:
+        return dict(zip(paths, pool.map(load_pdf_image, paths)))
 
 
 # =====================================================
 # PDF BUILDER
 # =====================================================
 
-def make_pdf(schema):
+def make_pdf(schema, images: dict | None = None):
+    """
+    images: vooraf opgehaalde foto's op PDF-maat ({raw_path: bytes}, zie
+    collect_image_bytes); zonder → hier ophalen. Geen PIL meer per foto.
+    """
+    if images is None:
+        images = collect_image_bytes(schema)
+
     buffer = BytesIO()
 
     doc = SimpleDocTemplate(
@@ -192,34 +248,22 @@ def make_pdf(schema):
 
         # FOTO'S
         foto_cells = []
-        max_h = 4 * cm
 
         for f in [foto1, foto2]:
 
-            if not f:
-                foto_cells.append(Spacer(1, 0))
-                continue
-
-            img_bytes = load_image_bytes(f)
+            img_bytes = images.get(f) if f else None
 
             if not img_bytes:
                 foto_cells.append(Spacer(1, 0))
                 continue
 
-            # SAFE PIL OPEN
+            # Al op celmaat (4 cm hoog) → rechtstreeks insluiten
             try:
-                pil = PILImage.open(io.BytesIO(img_bytes))
-                pil = pil.convert("RGB")
+                img = Image(BytesIO(img_bytes))
             except Exception:
                 foto_cells.append(Spacer(1, 0))
                 continue
 
-            pil.thumbnail((1000, max_h))
-            out = io.BytesIO()
-            pil.save(out, format="JPEG", quality=90)
-            out.seek(0)
-
-            img = Image(out)
             foto_cells.append(img)
 
         fotos = Table([foto_cells], colWidths=[shared_width / 2, shared_width / 2])
@@ -274,38 +318,90 @@ def make_pdf(schema):
 
 
 # =====================================================
-# ROUTE
+# ROUTES — via de achtergrond-jobqueue
 # =====================================================
+# Hier pas importeren: pdf_jobs gebruikt make_pdf & co. van hierboven
+from routers.oefenschema import pdf_jobs
+
+# Compat-route wacht maximaal zo lang op de job, daarna 202 + job_id
+PDF_JOB_WAIT_SECONDS = float(os.getenv("PDF_JOB_WAIT_SECONDS", "60"))
 
-@router.get("/schema/{schema_id}")
-def generate_schema_pdf(schema_id: int, db: Session = Depends(get_db)):
-    schema = (
-        db.query(Oefenschema)
-        .options(
-            joinedload(Oefenschema.patient),
-            joinedload(Oefenschema.oefeningen)
-        )
-        .filter(Oefenschema.id == schema_id)
-        .first()
-    )
 
+def _load_schema(db: Session, schema_id: int) -> Oefenschema:
+    schema = db.query(Oefenschema).filter(Oefenschema.id == schema_id).first()
     if not schema:
         raise HTTPException(404, "Schema niet gevonden")
+    return schema
 
-    try:
-        pdf_bytes = make_pdf(schema)
-    except Exception as e:
-        print("❌ PDF GENERATIE ERROR:", e)
+
+@router.post("/schema/{schema_id}", status_code=202)
+def enqueue_schema_pdf(schema_id: int, db: Session = Depends(get_db)):
+    """Start (of hergebruikt) een PDF-job en antwoordt meteen met de job_id."""
+    job = pdf_jobs.enqueue_schema_pdf(db, _load_schema(db, schema_id))
+    return pdf_jobs.job_to_dict(job)
+
+
+@router.get("/jobs/{job_id}")
+def pdf_job_status(job_id: str, db: Session = Depends(get_db)):
+    job = db.get(PdfJob, job_id)
+    if not job:
+        raise HTTPException(404, "Job niet gevonden")
+    return pdf_jobs.job_to_dict(job)
+
+
+@router.get("/jobs/{job_id}/result")
+def pdf_job_result(job_id: str, db: Session = Depends(get_db)):
+    job = db.get(PdfJob, job_id)
+    if not job:
+        raise HTTPException(404, "Job niet gevonden")
+    if job.status == pdf_jobs.FAILED:
+        raise HTTPException(500, f"PDF kon niet worden gegenereerd: {job.error}")
+    if job.status != pdf_jobs.DONE:
+        raise HTTPException(409, f"PDF nog niet klaar ({job.status})")
+    return {"status": "ok", "path": job.pdf_path}
+
+
+@router.get("/schema/{schema_id}")
+def generate_schema_pdf(schema_id: int, db: Session = Depends(get_db)):
+    """
+    Bestaande frontend-route: zelfde job (dedupe), maar wacht tot die klaar
+    is → {"status": "ok", "path"}. Duurt het te lang → 202 + job_id.
+    """
+    job = pdf_jobs.enqueue_schema_pdf(db, _load_schema(db, schema_id))
+
+    if job.status != pdf_jobs.DONE:
+        job_id = job.id
+        db.close()   # geen connectie vasthouden tijdens het wachten
+        job = pdf_jobs.wait_for_job(job_id, PDF_JOB_WAIT_SECONDS)
+
+    if job is None or job.status == pdf_jobs.FAILED:
+        print("❌ PDF GENERATIE ERROR:", job.error if job else "job verdwenen")
         raise HTTPException(500, "PDF kon niet worden gegenereerd")
 
-    pdf_path = schema_pdf_path(schema)
+    if job.status != pdf_jobs.DONE:
+        return JSONResponse(jsonable_encoder(pdf_jobs.job_to_dict(job)), status_code=202)
 
-    # CORRECT ARG ORDER
-    upload_bytes(pdf_bytes, pdf_path)
+    return {"status": "ok", "path": job.pdf_path}
 
-    schema.pdf_path = pdf_path
-    schema.updated_at = datetime.now()
-    db.add(schema)
-    db.commit()
 
-    return {"status": "ok", "path": pdf_path}
+# =====================================================
+# BULK EXPORT — ZIP van veel schema's (gestreamd)
+# =====================================================
+from routers.oefenschema import pdf_export
+
+
+@router.post("/export")
+def export_schema_pdfs(req: OefenschemaPDFExportRequest, db: Session = Depends(get_db)):
+    """
+    Body: schema_ids en/of filter (patient_id, datum_van, datum_tot, created_by).
+    Antwoord: ZIP die per afgewerkte PDF doorgestuurd wordt.
+    """
+    schema_ids = pdf_export.select_schema_ids(db, req)
+    db.close()   # de stream opent per schema een eigen sessie
+
+    filename = f"oefenschemas_{datetime.now().strftime('%Y-%m-%d_%H%M')}.zip"
+    return StreamingResponse(
+        pdf_export.stream_schema_zip(schema_ids),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
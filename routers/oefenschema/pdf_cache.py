@@ -0,0 +1,189 @@
+# =====================================================
+# FILE: routers/oefenschema/pdf_cache.py
+# PDF-artefactcache voor schema's (GEEN router → helpers)
+# =====================================================
+#
+# Sleutel = hash van alles wat in de PDF terechtkomt (patiënt, datum,
+# oefeningen + fotopaden, templateversies, RENDER_VERSION).
+# - Lokaal: media-cache onder "_pdf/<hash>.pdf" (zelfde LRU-budget)
+# - Duurzaam: OneDrive op schema.pdf_path; de laatste geslaagde PdfJob
+#   onthoudt welke hash daar staat
+# Ongewijzigd schema → geen render, geen upload, geen download.
+
+import hashlib
+import json
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+import graph_client
+from media_cache import cache_path_for, delete_cache_for, store_bytes, touch
+from models.oefenschema import Oefenschema, PdfJob, TemplateOefen
+
+# Verhogen bij elke layoutwijziging in make_pdf → alle artefacten vervallen
+RENDER_VERSION = "1"
+
+
+# -----------------------------------------------------
+# Hash
+# -----------------------------------------------------
+
+def template_versions_for(db: Session, schemas) -> dict:
+    """template_id → updated_at (iso) voor alle oefeningen van deze schema's, één query."""
+    template_ids = {o.template_id for schema in schemas for o in schema.oefeningen if o.template_id}
+    if not template_ids:
+        return {}
+    return {
+        tid: updated_at.isoformat() if updated_at else None
+        for tid, updated_at in (
+            db.query(TemplateOefen.id, TemplateOefen.updated_at)
+            .filter(TemplateOefen.id.in_(template_ids))
+            .all()
+        )
+    }
+
+
+def schema_pdf_hash(db: Session, schema: Oefenschema, template_versions: dict | None = None) -> str:
+    """template_versions: vooraf opgehaald (bulk), anders hier opgevraagd."""
+    oefeningen = sorted(schema.oefeningen, key=lambda o: o.volgorde or 0)
+    if template_versions is None:
+        template_versions = template_versions_for(db, [schema])
+
+    content = {
+        "render": RENDER_VERSION,
+        "patient": schema.patient.naam if schema.patient else None,
+        "datum": schema.datum.isoformat() if schema.datum else None,
+        "oefeningen": [
+            [
+                o.volgorde, o.sets, o.reps, o.tempo, o.gewicht, o.opmerking,
+                o.foto1, o.foto2, o.template_id, template_versions.get(o.template_id),
+            ]
+            for o in oefeningen
+        ],
+    }
+    raw = json.dumps(content, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# -----------------------------------------------------
+# Lokale tier
+# -----------------------------------------------------
+
+def _local_key(content_hash: str) -> str:
+    return f"_pdf/{content_hash}.pdf"
+
+
+def load_local_pdf(content_hash: str) -> bytes | None:
+    p = cache_path_for(_local_key(content_hash))
+    try:
+        data = p.read_bytes()
+    except OSError:
+        return None
+    touch(p)
+    return data
+
+
+def store_local_pdf(content_hash: str, pdf_bytes: bytes, pdf_path: str | None = None):
+    """Artefact lokaal bewaren; ook onder pdf_path zodat /media/file meteen de nieuwe versie geeft."""
+    store_bytes(_local_key(content_hash), pdf_bytes)
+    if pdf_path:
+        store_bytes(pdf_path, pdf_bytes)
+
+
+# -----------------------------------------------------
+# Duurzame tier (OneDrive)
+# -----------------------------------------------------
+
+def current_artifact(db: Session, schema_id: int) -> PdfJob | None:
+    """Laatste geslaagde job → welke hash nu op OneDrive (pdf_path) staat."""
+    return (
+        db.query(PdfJob)
+        .filter(PdfJob.schema_id == schema_id, PdfJob.status == "done")
+        .order_by(PdfJob.finished_at.desc())
+        .first()
+    )
+
+
+def load_pdf_bytes(graph_path: str) -> bytes | None:
+    """Haalt PDF op van OneDrive. Geeft None bij fout of HTML-response."""
+    if not graph_path:
+        return None
+
+    try:
+        r = graph_client.get(f"/drive/root:/{graph_path}:/content", timeout=20)
+    except Exception as e:
+        print("❌ load_pdf_bytes request error:", e)
+        return None
+
+    if not r.is_success:
+        print(f"❌ load_pdf_bytes status error: {r.status_code}")
+        return None
+
+    # Detect HTML errorpagina's (Graph API fout)
+    if r.content.startswith(b"<html") or r.content.startswith(b"<!DOCTYPE"):
+        print("❌ load_pdf_bytes returned HTML instead of PDF")
+        return None
+
+    return r.content
+
+
+def current_artifacts(db: Session, schema_ids) -> dict[int, PdfJob]:
+    """current_artifact voor veel schema's in één query → {schema_id: job}."""
+    if not schema_ids:
+        return {}
+    latest = (
+        db.query(PdfJob.schema_id, func.max(PdfJob.finished_at).label("finished_at"))
+        .filter(PdfJob.schema_id.in_(schema_ids), PdfJob.status == "done")
+        .group_by(PdfJob.schema_id)
+        .subquery()
+    )
+    jobs = (
+        db.query(PdfJob)
+        .join(latest, and_(PdfJob.schema_id == latest.c.schema_id, PdfJob.finished_at == latest.c.finished_at))
+        .filter(PdfJob.status == "done")
+        .all()
+    )
+    return {job.schema_id: job for job in jobs}
+
+
+def cached_schema_pdf(db: Session, schema: Oefenschema, content_hash: str | None = None) -> tuple[bytes, str] | None:
+    """
+    (pdf_bytes, pdf_path) als de PDF van deze inhoud al bestaat:
+    eerst lokaal, anders van OneDrive (en dan lokaal bewaren). Anders None.
+    """
+    content_hash = content_hash or schema_pdf_hash(db, schema)
+    return artifact_pdf(content_hash, current_artifact(db, schema.id))
+
+
+def artifact_pdf(content_hash: str, artifact: PdfJob | None) -> tuple[bytes, str] | None:
+    """Zoals cached_schema_pdf, met een al opgehaald artefact (bulk)."""
+    if artifact is None or artifact.content_hash != content_hash or not artifact.pdf_path:
+        return None
+
+    pdf_bytes = load_local_pdf(content_hash)
+    if pdf_bytes is None:
+        pdf_bytes = load_pdf_bytes(artifact.pdf_path)
+        if pdf_bytes is None:
+            return None
+        store_local_pdf(content_hash, pdf_bytes)
+
+    return pdf_bytes, artifact.pdf_path
+
+
+# -----------------------------------------------------
+# Invalidatie (na schrijven van Oefening-rijen)
+# -----------------------------------------------------
+
+def invalidate_schema_pdf(db: Session, schema_id: int, schema: Oefenschema | None = None):
+    """
+    Oude artefacten zijn via de hash al onbereikbaar; dit ruimt het lokale
+    artefact en de proxy-cache van de huidige pdf_path op. Met `schema`
+    (na een update) enkel als de inhoud echt veranderd is.
+    """
+    artifact = current_artifact(db, schema_id)
+    if artifact is None:
+        return
+    if schema is not None and schema_pdf_hash(db, schema) == artifact.content_hash:
+        return
+    delete_cache_for(_local_key(artifact.content_hash))
+    delete_cache_for(artifact.pdf_path)
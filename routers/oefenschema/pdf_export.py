@@ -0,0 +1,184 @@
+# =====================================================
+# FILE: routers/oefenschema/pdf_export.py
+# Bulk-export van schema-PDF's als gestreamde ZIP (GEEN router → helpers)
+# =====================================================
+#
+# - Selectie: expliciete schema_ids en/of filter (patiënt, datumbereik,
+#   created_by)
+# - Per schema: bestaand artefact (pdf_cache) hergebruiken, anders foto's
+#   ("pdf"-afgeleiden) ophalen en renderen in de render pool van pdf_jobs
+# - ZIP wordt per afgewerkte PDF doorgestuurd; nooit het hele archief in
+#   het geheugen (max. PDF_EXPORT_WORKERS * 2 PDF's tegelijk onderweg)
+# - Mislukte schema's breken de export niet af → _fouten.txt in de ZIP
+
+import os
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import PurePosixPath
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session, joinedload
+
+from db import SessionLocal
+from models.oefenschema import Oefenschema
+from routers.oefenschema.paths import schema_pdf_path
+from routers.oefenschema.pdf import collect_image_bytes, schema_snapshot
+from routers.oefenschema.pdf_cache import (
+    cached_schema_pdf,
+    load_local_pdf,
+    schema_pdf_hash,
+    store_local_pdf,
+)
+from routers.oefenschema import pdf_jobs
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+PDF_EXPORT_WORKERS = int(os.getenv("PDF_EXPORT_WORKERS", "4"))
+PDF_EXPORT_MAX = int(os.getenv("PDF_EXPORT_MAX", "1000"))
+
+
+# -----------------------------------------------------
+# Selectie
+# -----------------------------------------------------
+
+def select_schema_ids(db: Session, req) -> list[int]:
+    """Ids volgens de aanvraag (ids + filter gecombineerd), oudste eerst."""
+    filters = [req.patient_id, req.datum_van, req.datum_tot, req.created_by]
+    if not req.schema_ids and all(f is None for f in filters):
+        raise HTTPException(400, "Geef schema_ids of een filter op")
+
+    q = db.query(Oefenschema.id)
+    if req.schema_ids:
+        q = q.filter(Oefenschema.id.in_(req.schema_ids))
+    if req.patient_id is not None:
+        q = q.filter(Oefenschema.patient_id == req.patient_id)
+    if req.datum_van is not None:
+        q = q.filter(Oefenschema.datum >= req.datum_van)
+    if req.datum_tot is not None:
+        q = q.filter(Oefenschema.datum <= req.datum_tot)
+    if req.created_by:
+        q = q.filter(Oefenschema.created_by == req.created_by)
+
+    ids = [sid for (sid,) in q.order_by(Oefenschema.datum, Oefenschema.id).all()]
+    if not ids:
+        raise HTTPException(404, "Geen schema's gevonden")
+    if len(ids) > PDF_EXPORT_MAX:
+        raise HTTPException(400, f"Te veel schema's ({len(ids)} > {PDF_EXPORT_MAX})")
+    return ids
+
+
+# -----------------------------------------------------
+# Eén schema → (bestandsnaam, pdf_bytes)
+# -----------------------------------------------------
+
+def _export_one(schema_id: int) -> tuple[str, bytes]:
+    db = SessionLocal()
+    try:
+        schema = (
+            db.query(Oefenschema)
+            .options(joinedload(Oefenschema.patient), joinedload(Oefenschema.oefeningen))
+            .filter(Oefenschema.id == schema_id)
+            .first()
+        )
+        if not schema:
+            raise ValueError("Schema niet gevonden")
+
+        name = f"{schema.id}_{PurePosixPath(schema_pdf_path(schema)).name}"
+        content_hash = schema_pdf_hash(db, schema)
+
+        pdf_bytes = load_local_pdf(content_hash)
+        if pdf_bytes is None:
+            cached = cached_schema_pdf(db, schema, content_hash)
+            pdf_bytes = cached[0] if cached else None
+        if pdf_bytes is not None:
+            return name, pdf_bytes
+
+        snapshot = schema_snapshot(schema)
+    finally:
+        db.close()   # geen connectie vasthouden tijdens ophalen/renderen
+
+    pdf_bytes = pdf_jobs.render_pdf(snapshot, collect_image_bytes(snapshot))
+    # Enkel de lokale tier: de export schrijft niets naar OneDrive
+    store_local_pdf(content_hash, pdf_bytes)
+    return name, pdf_bytes
+
+
+def iter_schema_pdfs(schema_ids: list[int]):
+    """Yield (schema_id, naam, bytes | None, fout | None) in volgorde van afwerking."""
+    ids = iter(schema_ids)
+    pool = ThreadPoolExecutor(max_workers=PDF_EXPORT_WORKERS, thread_name_prefix="pdf-export")
+    pending = {}
+
+    def fill():
+        while len(pending) < PDF_EXPORT_WORKERS * 2:
+            sid = next(ids, None)
+            if sid is None:
+                return
+            pending[pool.submit(_export_one, sid)] = sid
+
+    try:
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                sid = pending.pop(future)
+                try:
+                    name, pdf_bytes = future.result()
+                    yield sid, name, pdf_bytes, None
+                except Exception as e:
+                    print(f"❌ [PDF EXPORT] Schema {sid}: {e}")
+                    yield sid, None, None, str(e)
+            fill()
+    finally:
+        # Client afgehaakt → wachtende schema's niet meer renderen
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# -----------------------------------------------------
+# ZIP-stream
+# -----------------------------------------------------
+
+class _ZipSink:
+    """Niet-seekbare schrijfbuffer: zipfile schrijft erin, wij legen hem na elke entry."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_schema_zip(schema_ids: list[int]):
+    """Generator voor StreamingResponse: ZIP-bytes per afgewerkte PDF."""
+    sink = _ZipSink()
+    errors = []
+    started = datetime.now()
+
+    # PDF's zijn al gecomprimeerd → STORED
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as zf:
+        for sid, name, pdf_bytes, error in iter_schema_pdfs(schema_ids):
+            if error:
+                errors.append(f"Schema {sid}: {error}")
+                continue
+            zf.writestr(name, pdf_bytes)
+            yield sink.drain()
+
+        if errors:
+            zf.writestr("_fouten.txt", "\n".join(errors) + "\n")
+
+    yield sink.drain()
+    print(
+        f"📦 [PDF EXPORT] {len(schema_ids) - len(errors)}/{len(schema_ids)} schema's "
+        f"in {(datetime.now() - started).total_seconds():.1f}s"
+    )
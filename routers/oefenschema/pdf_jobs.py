@@ -0,0 +1,331 @@
+# =====================================================
+# FILE: routers/oefenschema/pdf_jobs.py
+# Achtergrond-jobqueue voor schema-PDF's (GEEN router → helpers)
+# =====================================================
+#
+# - Status staat in de tabel pdf_jobs (overleeft een herstart)
+# - Dedupe: zelfde schema_id + inhoudshash → dezelfde job; staat die
+#   inhoud al op OneDrive → geen nieuwe job (zie pdf_cache.py)
+# - Per job: foto's parallel ophalen (threads), renderen in een process
+#   pool (meerdere CPU-kernen), uploaden, pdf_path bijwerken
+# - Claimen via conditionele UPDATE → meerdere workers nemen een job
+#   nooit dubbel op
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+import blocking_io
+from db import SessionLocal, engine
+from models.oefenschema import Oefenschema, PdfJob
+from onedrive_service import upload_bytes
+from routers.oefenschema.paths import schema_pdf_path
+from routers.oefenschema.pdf_cache import (
+    current_artifact,
+    load_local_pdf,
+    schema_pdf_hash,
+    store_local_pdf,
+)
+from routers.oefenschema.pdf import collect_image_bytes, make_pdf, schema_snapshot
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+PDF_JOB_WORKERS = int(os.getenv("PDF_JOB_WORKERS", "4"))
+PDF_RENDER_PROCESSES = int(os.getenv("PDF_RENDER_PROCESSES", str(os.cpu_count() or 1)))
+
+# running-jobs ouder dan dit (na crash/herstart) opnieuw in de wachtrij
+PDF_JOB_STALE_SECONDS = int(os.getenv("PDF_JOB_STALE_SECONDS", "600"))
+PDF_JOB_RETENTION_DAYS = int(os.getenv("PDF_JOB_RETENTION_DAYS", "7"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+_lock = threading.Lock()
+_job_pool: ThreadPoolExecutor | None = None
+_render_pool: ProcessPoolExecutor | None = None
+_events: dict[str, threading.Event] = {}   # lokale jobs → klaar-signaal
+
+
+def _get_job_pool() -> ThreadPoolExecutor:
+    global _job_pool
+    with _lock:
+        if _job_pool is None:
+            _job_pool = ThreadPoolExecutor(max_workers=PDF_JOB_WORKERS, thread_name_prefix="pdf-job")
+        return _job_pool
+
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    global _render_pool
+    with _lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(max_workers=PDF_RENDER_PROCESSES)
+        return _render_pool
+
+
+def render_pdf(snapshot, images) -> bytes:
+    """make_pdf in de render pool (ook gebruikt door de bulk-export)."""
+    global _render_pool
+    try:
+        return _get_render_pool().submit(make_pdf, snapshot, images).result()
+    except BrokenProcessPool:
+        print("⚠️ [PDF] Render pool kapot → opnieuw opbouwen, render in deze thread")
+        with _lock:
+            _render_pool = None
+        return make_pdf(snapshot, images)
+
+
+def job_to_dict(job: PdfJob) -> dict:
+    return {
+        "job_id": job.id,
+        "schema_id": job.schema_id,
+        "status": job.status,
+        "path": job.pdf_path,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+# -----------------------------------------------------
+# Enqueue (met dedupe)
+# -----------------------------------------------------
+
+def enqueue_schema_pdf(db, schema: Oefenschema, content_hash: str | None = None) -> PdfJob:
+    """
+    Geeft de job voor deze inhoud van het schema. Wachtend, bezig of de
+    PDF die nu op OneDrive staat → dezelfde job. Mislukt of intussen
+    overschreven door een andere versie → opnieuw in de wachtrij.
+    """
+    content_hash = content_hash or schema_pdf_hash(db, schema)
+
+    def existing():
+        return (
+            db.query(PdfJob)
+            .filter(PdfJob.schema_id == schema.id, PdfJob.content_hash == content_hash)
+            .first()
+        )
+
+    job = existing()
+    if job is None:
+        job = PdfJob(
+            id=uuid.uuid4().hex,
+            schema_id=schema.id,
+            source_version=schema.updated_at or schema.created_at,
+            content_hash=content_hash,
+            status=QUEUED,
+            created_at=datetime.utcnow(),
+        )
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Gelijktijdige enqueue (andere worker) won → die job gebruiken
+            db.rollback()
+            return existing()
+    elif job.status == FAILED or (job.status == DONE and current_artifact(db, schema.id) is not job):
+        job.status, job.error, job.started_at, job.finished_at = QUEUED, None, None, None
+        db.commit()
+    else:
+        return job
+
+    _submit(job.id)
+    return job
+
+
+def _submit(job_id: str):
+    with _lock:
+        _events.setdefault(job_id, threading.Event())
+    _get_job_pool().submit(_run_job, job_id)
+
+
+# -----------------------------------------------------
+# Worker
+# -----------------------------------------------------
+
+def _claim(db, job_id: str) -> bool:
+    claimed = (
+        db.query(PdfJob)
+        .filter(PdfJob.id == job_id, PdfJob.status == QUEUED)
+        .update({"status": RUNNING, "started_at": datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    return claimed == 1
+
+
+def _finish(db, job_id: str, **values):
+    values["finished_at"] = datetime.utcnow()
+    db.query(PdfJob).filter(PdfJob.id == job_id).update(values, synchronize_session=False)
+    db.commit()
+
+
+def _run_job(job_id: str):
+    db = SessionLocal()
+    started = time.monotonic()
+    try:
+        if not _claim(db, job_id):
+            return
+
+        job = db.get(PdfJob, job_id)
+        schema = (
+            db.query(Oefenschema)
+            .options(joinedload(Oefenschema.patient), joinedload(Oefenschema.oefeningen))
+            .filter(Oefenschema.id == job.schema_id)
+            .first()
+        )
+        if not schema:
+            _finish(db, job_id, status=FAILED, error="Schema niet gevonden")
+            return
+
+        if schema_pdf_hash(db, schema) != job.content_hash:
+            # Intussen gewijzigd → nieuwe enqueue maakt een job voor de nieuwe inhoud
+            _finish(db, job_id, status=FAILED, error="Schema gewijzigd tijdens de job")
+            return
+
+        # Lokaal artefact van deze inhoud? → enkel nog uploaden
+        pdf_bytes = load_local_pdf(job.content_hash)
+        if pdf_bytes is None:
+            # Foto's: I/O → threads; rendering: CPU → apart proces
+            snapshot = schema_snapshot(schema)
+            images = collect_image_bytes(snapshot, blocking_io.blocking_pool())
+            pdf_bytes = render_pdf(snapshot, images)
+
+        pdf_path = schema_pdf_path(schema)
+        upload_bytes(pdf_bytes, pdf_path)
+        store_local_pdf(job.content_hash, pdf_bytes, pdf_path)
+
+        # updated_at expliciet behouden (onupdate) → de PDF hoort bij deze versie
+        db.query(Oefenschema).filter(Oefenschema.id == schema.id).update(
+            {"pdf_path": pdf_path, "updated_at": Oefenschema.updated_at},
+            synchronize_session=False,
+        )
+        _finish(db, job_id, status=DONE, pdf_path=pdf_path, error=None)
+        print(f"📄 [PDF] Job {job_id} klaar → {pdf_path} ({time.monotonic() - started:.1f}s)")
+
+    except Exception as e:
+        db.rollback()
+        print(f"❌ [PDF] Job {job_id} mislukt: {e}")
+        try:
+            _finish(db, job_id, status=FAILED, error=str(e)[:2000])
+        except Exception:
+            db.rollback()
+
+    finally:
+        db.close()
+        with _lock:
+            event = _events.pop(job_id, None)
+        if event:
+            event.set()
+
+
+# -----------------------------------------------------
+# Wachten (compat-route)
+# -----------------------------------------------------
+
+def wait_for_job(job_id: str, timeout: float) -> PdfJob | None:
+    """Wacht tot de job klaar of mislukt is (of timeout). Geeft de actuele rij."""
+    with _lock:
+        event = _events.get(job_id)
+    deadline = time.monotonic() + timeout
+
+    while True:
+        if event is not None:
+            event.wait(max(deadline - time.monotonic(), 0))
+
+        db = SessionLocal()
+        try:
+            job = db.get(PdfJob, job_id)
+            if job is not None:
+                db.expunge(job)
+        finally:
+            db.close()
+
+        if job is None or job.status in (DONE, FAILED) or time.monotonic() >= deadline:
+            return job
+        # Job van een andere worker → pollen
+        time.sleep(0.5)
+
+
+# -----------------------------------------------------
+# Startup / shutdown
+# -----------------------------------------------------
+
+def _prune_old_jobs(db, now: datetime) -> int:
+    """
+    Afgewerkte jobs ouder dan PDF_JOB_RETENTION_DAYS verwijderen, behalve de
+    laatste geslaagde job per schema: dat is de verwijzing naar de PDF op
+    OneDrive (pdf_cache.current_artifact).
+    """
+    latest = (
+        db.query(PdfJob.schema_id, func.max(PdfJob.finished_at).label("finished_at"))
+        .filter(PdfJob.status == DONE)
+        .group_by(PdfJob.schema_id)
+        .subquery()
+    )
+    keep = {
+        job_id for (job_id,) in (
+            db.query(PdfJob.id)
+            .join(latest, and_(PdfJob.schema_id == latest.c.schema_id, PdfJob.finished_at == latest.c.finished_at))
+            .filter(PdfJob.status == DONE)
+            .all()
+        )
+    }
+    old = [
+        job_id for (job_id,) in (
+            db.query(PdfJob.id)
+            .filter(
+                PdfJob.status.in_((DONE, FAILED)),
+                PdfJob.finished_at < now - timedelta(days=PDF_JOB_RETENTION_DAYS),
+            )
+            .all()
+        )
+        if job_id not in keep
+    ]
+    # In stukken: MySQL kan niet uit pdf_jobs deleten met een subquery op pdf_jobs
+    for i in range(0, len(old), 500):
+        db.query(PdfJob).filter(PdfJob.id.in_(old[i:i + 500])).delete(synchronize_session=False)
+    return len(old)
+
+
+def start():
+    """Tabel aanmaken indien nodig, oude jobs opruimen, onafgewerkte hervatten."""
+    PdfJob.__table__.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        _prune_old_jobs(db, now)
+
+        db.query(PdfJob).filter(
+            PdfJob.status == RUNNING,
+            PdfJob.started_at < now - timedelta(seconds=PDF_JOB_STALE_SECONDS),
+        ).update({"status": QUEUED, "started_at": None}, synchronize_session=False)
+        db.commit()
+
+        pending = [job_id for (job_id,) in db.query(PdfJob.id).filter(PdfJob.status == QUEUED).all()]
+    finally:
+        db.close()
+
+    for job_id in pending:
+        _submit(job_id)
+    if pending:
+        print(f"📄 [PDF] {len(pending)} onafgewerkte job(s) hervat")
+
+
+def shutdown():
+    global _job_pool, _render_pool
+    with _lock:
+        job_pool, render_pool = _job_pool, _render_pool
+        _job_pool = _render_pool = None
+    if job_pool:
+        job_pool.shutdown(wait=False, cancel_futures=True)
+    if render_pool:
+        render_pool.shutdown(wait=False, cancel_futures=True)
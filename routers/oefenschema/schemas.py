@@ -6,17 +6,24 @@
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
 from sqlalchemy.orm import Session, joinedload
 from datetime import datetime, date
+import asyncio
+import hashlib
 import json
 
+from blocking_io import run_blocking
+
 from db import SessionLocal
 from models.oefenschema import Oefenschema, Oefening
 
 # Upload voor nieuwe schema-foto’s
-from routers.oefenschema.uploads import upload_schema_image
+from routers.oefenschema.uploads import upload_schema_image, gather_uploads, _delete_old_image
 from routers.oefenschema.path_normalizer import normalize_path
+from routers.oefenschema.paths import schema_folder_path
 
 # interne OneDrive copy (A-FLOW)
-from onedrive_service import copy_file
+from onedrive_service import copy_files
+from media_cache import delete_cache_for
+from routers.oefenschema.pdf_cache import invalidate_schema_pdf
 
 router = APIRouter(prefix="/schemas", tags=["Oefenschema"])
 
@@ -33,23 +40,37 @@ def get_db():
 
 
 # =====================================================
-# TEMPLATEFOTO → SCHEMA MAP (A-FLOW: OneDrive internal copy)
+# TEMPLATEFOTO → SCHEMA MAP (A-FLOW: OneDrive server-side copy)
 # =====================================================
-def copy_existing_to_schema(raw_path: str, schema_id: int, oef_idx: int, slot: int) -> str:
+def schema_photo_path(schema_id: int, oef_idx: int, slot: int, raw_path: str) -> str:
+    # Bronpad in de naam → andere templatefoto = ander pad (PDF-cache hasht paden)
+    digest = hashlib.sha1(normalize_path(raw_path).encode("utf-8")).hexdigest()[:8]
+    return f"RevoSport/Oefenschema/Schemas/{schema_id}/oef_{oef_idx}_foto{slot}_{digest}.jpg"
+
+
+async def copy_existing_to_schema(jobs: dict, schema_id: int) -> dict:
     """
-    Kopieert een templatefoto rechtstreeks binnen OneDrive
-    naar de map: RevoSport/Oefenschema/Schemas/<schema_id>
+    Kopieert templatefoto's binnen OneDrive naar de map
+    RevoSport/Oefenschema/Schemas/<schema_id>, allemaal tegelijk
+    (Graph /copy, geen bytes via de API; ongewijzigde foto's overgeslagen).
+
+    jobs: {(oef_idx, slot): raw_path} → {(oef_idx, slot): doelpad}
     """
-    if not raw_path:
-        return None
+    targets = {key: schema_photo_path(schema_id, *key, jobs[key]) for key in jobs}
+    if not targets:
+        return {}
+
+    ok = await run_blocking(copy_files, [(jobs[key], targets[key]) for key in targets])
 
-    parent = f"RevoSport/Oefenschema/Schemas/{schema_id}"
-    target = f"{parent}/oef_{oef_idx}_foto{slot}.jpg"
+    failed = [targets[key] for key in targets if not ok.get(targets[key])]
+    if failed:
+        raise HTTPException(502, f"OneDrive copy mislukt: {', '.join(failed)}")
 
-    # Interne OneDrive copy — supersnel (A-FLOW)
-    copy_file(raw_path, target)
+    # Doel overschreven → lokale media-cache is verouderd
+    for target in targets.values():
+        delete_cache_for(target)
 
-    return target
+    return targets
 
 
 # =====================================================
@@ -150,9 +171,9 @@ async def create_schema(
     schema_id = schema.id
     oefeningen = json.loads(oefeningen_json)
 
-    foto_map = {}
+    uploads = {}
 
-    # Nieuwe foto-upload via upload_schema_image
+    # Nieuwe foto-upload via upload_schema_image (parallel)
     for file in files or []:
         fname = file.filename
 
@@ -165,28 +186,35 @@ async def create_schema(
         else:
             continue
 
-        graph_path = await upload_schema_image(
+        uploads[(idx, slot)] = upload_schema_image(
             schema_id=schema_id,
             oef_index=idx,
             slot=slot,
             file=file
         )
-        foto_map[(idx, slot)] = normalize_path(graph_path)
+
+    # Templatefoto's kopiëren (A-flow) — alle slots in één keer
+    copy_jobs = {
+        (idx, slot): oef[f"foto{slot}"]
+        for idx, oef in enumerate(oefeningen)
+        for slot in (1, 2)
+        if (idx, slot) not in uploads and oef.get(f"foto{slot}")
+    }
+
+    # Uploads en templatecopies lopen tegelijk; rijen pas als alles klaar is
+    uploaded, copied = await asyncio.gather(
+        gather_uploads(uploads),
+        copy_existing_to_schema(copy_jobs, schema_id),
+    )
+    foto_map = {key: normalize_path(p) for key, p in uploaded.items()}
+    foto_map.update(copied)
 
     # Oefeningen opslaan
     for idx, oef in enumerate(oefeningen):
 
-        # Nieuwe uploads?
         f1 = foto_map.get((idx, 1))
         f2 = foto_map.get((idx, 2))
 
-        # Templatefoto kopiëren (A-flow)
-        if not f1 and oef.get("foto1"):
-            f1 = copy_existing_to_schema(oef["foto1"], schema_id, idx, 1)
-
-        if not f2 and oef.get("foto2"):
-            f2 = copy_existing_to_schema(oef["foto2"], schema_id, idx, 2)
-
         obj = Oefening(
             schema_id=schema_id,
             template_id=oef.get("template_id") or None,
@@ -230,9 +258,9 @@ async def update_schema(
         .all()
     }
 
-    foto_map = {}
+    uploads = {}
 
-    # Nieuwe uploads
+    # Nieuwe uploads (parallel)
     for file in files or []:
         fname = file.filename
 
@@ -245,18 +273,35 @@ async def update_schema(
         else:
             continue
 
-        graph_path = await upload_schema_image(
+        uploads[(idx, slot)] = upload_schema_image(
             schema_id=schema_id,
             oef_index=idx,
             slot=slot,
             file=file
         )
-        foto_map[(idx, slot)] = normalize_path(graph_path)
+
+    # Templatefoto → interne copy (alle slots in één keer)
+    copy_jobs = {
+        (idx, slot): oef[f"foto{slot}"]
+        for idx, oef in enumerate(oefeningen_new)
+        for slot in (1, 2)
+        if (idx, slot) not in uploads
+        and oef.get(f"foto{slot}") and "Templates/" in str(oef[f"foto{slot}"])
+    }
+
+    # Uploads en templatecopies lopen tegelijk; rijen pas als alles klaar is
+    uploaded, copied = await asyncio.gather(
+        gather_uploads(uploads),
+        copy_existing_to_schema(copy_jobs, schema_id),
+    )
+    foto_map = {key: normalize_path(p) for key, p in uploaded.items()}
+    foto_map.update(copied)
 
     # Oude oefeningen wissen
     db.query(Oefening).filter(Oefening.schema_id == schema_id).delete()
 
     # Nieuwe opslaan
+    new_paths = set()
     for idx, oef in enumerate(oefeningen_new):
         volgorde = idx + 1
         oud_obj = oud.get(volgorde)
@@ -264,21 +309,15 @@ async def update_schema(
         f1 = foto_map.get((idx, 1))
         f2 = foto_map.get((idx, 2))
 
-        # Templatefoto → interne copy
         if not f1:
-            if oef.get("foto1") and "Templates/" in str(oef["foto1"]):
-                f1 = copy_existing_to_schema(oef["foto1"], schema_id, idx, 1)
-            else:
-                f1 = oef.get("foto1") or (oud_obj.foto1 if oud_obj else None)
+            f1 = oef.get("foto1") or (oud_obj.foto1 if oud_obj else None)
 
         if not f2:
-            if oef.get("foto2") and "Templates/" in str(oef["foto2"]):
-                f2 = copy_existing_to_schema(oef["foto2"], schema_id, idx, 2)
-            else:
-                f2 = oef.get("foto2") or (oud_obj.foto2 if oud_obj else None)
+            f2 = oef.get("foto2") or (oud_obj.foto2 if oud_obj else None)
 
         f1 = normalize_path(f1)
         f2 = normalize_path(f2)
+        new_paths.update((f1, f2))
 
         obj = Oefening(
             schema_id=schema_id,
@@ -302,6 +341,18 @@ async def update_schema(
 
     db.commit()
 
+    # Vervangen foto's in de eigen schemamap (oude templatecopy met andere
+    # digest, oude upload) + afgeleiden weg; templatebestanden nooit
+    schema_dir = schema_folder_path(schema_id) + "/"
+    orphaned = {
+        p for o in oud.values() for p in (normalize_path(o.foto1), normalize_path(o.foto2))
+        if p and p.startswith(schema_dir) and p not in new_paths
+    }
+    await asyncio.gather(*(_delete_old_image(p) for p in orphaned))
+
+    # Andere inhoud → PDF-artefact (lokaal + proxy) vervalt
+    invalidate_schema_pdf(db, schema_id, schema)
+
     return {"status": "ok", "id": schema_id}
 
 # =====================================================
@@ -324,7 +375,8 @@ def delete_schema(schema_id: int, db: Session = Depends(get_db)):
     except Exception as e:
         print("❌ OneDrive delete error:", e)
 
-    # 2) Oefeningen verwijderen
+    # 2) Oefeningen verwijderen (+ PDF-artefact)
+    invalidate_schema_pdf(db, schema_id)
     db.query(Oefening).filter(Oefening.schema_id == schema_id).delete()
 
     # 3) Schema verwijderen
@@ -7,13 +7,14 @@ from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
 from sqlalchemy.orm import Session, joinedload
 from datetime import datetime
 from sqlalchemy import func
+import asyncio
 import json
 
 from db import SessionLocal
 from models.oefenschema import TemplateOefen, TemplateOefening
 
 from onedrive_service import delete_folder_recursive
-from routers.oefenschema.uploads import upload_template_image
+from routers.oefenschema.uploads import upload_template_image, gather_uploads, _delete_old_image
 from routers.oefenschema.path_normalizer import normalize_path
 from routers.oefenschema.paths import template_folder_path
 from media_cache import delete_cache_for
@@ -159,9 +160,9 @@ async def create_template(
     template_id = template.id
     oefeningen = json.loads(oefeningen_json)
 
-    foto_map = {}
+    uploads = {}
 
-    # FOTOVERWERKING
+    # FOTOVERWERKING (parallel: compressie in process pool, begrensde uploads)
     for file in files or []:
         fname = file.filename
 
@@ -174,16 +175,15 @@ async def create_template(
         else:
             continue
 
-        graph_path = await upload_template_image(
+        uploads[(idx, slot)] = upload_template_image(
             template_id=template_id,
             oef_index=idx,   # correcte index die jij uit filename haalt
             slot=slot,
             file=file,
-            old_path=None
         )
 
-
-        foto_map[(idx, slot)] = normalize_path(graph_path)
+    # Pas na ALLE uploads de oefeningen wegschrijven
+    foto_map = {key: normalize_path(p) for key, p in (await gather_uploads(uploads)).items()}
 
     # OEFENINGEN OPSLAAN
     for idx, oef in enumerate(oefeningen):
@@ -233,9 +233,9 @@ async def update_template(
     existing_paths = {(idx, 1): oud[idx].foto1 for idx in oud}
     existing_paths.update({(idx, 2): oud[idx].foto2 for idx in oud})
 
-    foto_map = {}
+    uploads = {}
 
-    # Nieuwe uploads
+    # Nieuwe uploads (parallel)
     for file in files or []:
         fname = file.filename
 
@@ -248,17 +248,14 @@ async def update_template(
         else:
             continue
 
-        old_path = existing_paths.get((idx, slot))
-
-        graph_path = await upload_template_image(
+        uploads[(idx, slot)] = upload_template_image(
             template_id=template_id,
             oef_index=idx,
             slot=slot,
             file=file,
-            old_path=old_path,
         )
 
-        foto_map[(idx, slot)] = normalize_path(graph_path)
+    foto_map = {key: normalize_path(p) for key, p in (await gather_uploads(uploads)).items()}
 
     # Oude records verwijderen
     db.query(TemplateOefening).filter(
@@ -266,6 +263,7 @@ async def update_template(
     ).delete()
 
     # Nieuwe records maken
+    new_paths = set()
     for idx, oef in enumerate(oefeningen_new):
         obj = TemplateOefening(
             template_id=template_id,
@@ -278,6 +276,7 @@ async def update_template(
             foto1=foto_map.get((idx, 1)) or oef.get("foto1"),
             foto2=foto_map.get((idx, 2)) or oef.get("foto2"),
         )
+        new_paths.update((normalize_path(obj.foto1), normalize_path(obj.foto2)))
         db.add(obj)
 
     template.naam = naam
@@ -285,6 +284,16 @@ async def update_template(
     template.updated_at = datetime.now()
 
     db.commit()
+
+    # Vervangen foto's pas na de commit weg (faalt een upload of de commit,
+    # dan blijven de oude foto's waar de DB nog naar verwijst gewoon staan)
+    replaced = {
+        normalize_path(existing_paths[key])
+        for key in foto_map
+        if existing_paths.get(key)
+    } - new_paths
+    await asyncio.gather(*(_delete_old_image(p) for p in replaced))
+
     return {"status": "ok", "id": template_id}
 
 
@@ -314,13 +323,13 @@ async def upload_template_photo(
     if oef:
         old_path = oef.foto1 if slot == 1 else oef.foto2
 
-    # upload nieuwe foto + verwijder oude
+    # upload nieuwe foto; oude pas weg als de nieuwe er staat
     graph_path = await upload_template_image(
         template_id=template_id,
         oef_index=oef_index - 1,
         slot=slot,
         file=file,
-        old_path=old_path
     )
+    await _delete_old_image(old_path)
 
     return {"status": "ok", "path": normalize_path(graph_path)}
@@ -3,14 +3,26 @@
 # FINAL STABLE VERSION — Revo Sport
 # =====================================================
 
+import asyncio
 import io
 import os
+from concurrent.futures.process import BrokenProcessPool
 from fastapi import UploadFile
 from PIL import Image, UnidentifiedImageError
 
+from blocking_io import run_blocking
+from image_variants import (
+    VARIANTS,
+    image_pool,
+    render_variants,
+    reset_image_pool,
+    variant_path,
+)
+from media_cache import delete_cache_for, store_bytes
+
 from onedrive_service import (
-    upload_bytes,
-    delete_file_if_exists,
+    upload_bytes_async,
+    delete_files,
 )
 from routers.oefenschema.paths import (
     template_image_path,
@@ -69,6 +81,100 @@ def compress_image_bytes(data: bytes, max_px=1600, quality=82) -> bytes:
     return out.getvalue()
 
 
+def prepare_image(data: bytes) -> tuple[bytes | None, dict]:
+    """Compressie + afgeleiden (thumb / pdf) in één keer → (full, {variant: bytes})."""
+    comp = compress_image_bytes(data)
+    if comp is None:
+        return None, {}
+    return comp, render_variants(comp)
+
+
+# =====================================================
+# INGESTIE: compressie in process pool + begrensde uploads
+# =====================================================
+# PIL (resize + progressive JPEG) is CPU-werk → in aparte processen, zodat
+# de event loop andere requests blijft bedienen. Uploads lopen parallel,
+# maximaal ONEDRIVE_UPLOAD_CONCURRENCY tegelijk per proces.
+# De pool zelf staat in image_variants (ook gebruikt voor late afgeleiden).
+UPLOAD_CONCURRENCY = int(os.getenv("ONEDRIVE_UPLOAD_CONCURRENCY", "6"))
+
+_upload_slots: asyncio.Semaphore | None = None
+
+
+async def _in_image_pool(fn, data: bytes):
+    """fn(data) in de process pool (fallback: thread)."""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(image_pool(), fn, data)
+    except BrokenProcessPool:
+        # Worker gecrasht → pool opnieuw opbouwen bij de volgende foto
+        print("⚠️ IMAGE POOL kapot → compressie in thread")
+        reset_image_pool()
+        return await run_blocking(fn, data)
+
+
+async def prepare_image_async(data: bytes) -> tuple[bytes | None, dict]:
+    """prepare_image in de process pool (fallback: thread)."""
+    return await _in_image_pool(prepare_image, data)
+
+
+async def _upload_limited(content: bytes, path: str):
+    global _upload_slots
+    if _upload_slots is None:
+        _upload_slots = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+    async with _upload_slots:
+        await upload_bytes_async(content, path)
+
+
+async def _upload_with_variants(comp: bytes, variants: dict, path: str):
+    """
+    Origineel + afgeleiden (foto.thumb.jpg, foto.pdf.jpg) parallel uploaden
+    en lokaal cachen. Enkel een mislukt origineel is fataal; een ontbrekende
+    afgeleide wordt later uit het origineel gemaakt (image_variants).
+    """
+    targets = {path: comp}
+    targets.update({variant_path(path, name): b for name, b in variants.items()})
+
+    results = await asyncio.gather(
+        *(_upload_limited(b, p) for p, b in targets.items()),
+        return_exceptions=True,
+    )
+    for (p, b), result in zip(targets.items(), results):
+        if isinstance(result, BaseException):
+            if p == path:
+                raise result
+            print(f"⚠️ Afgeleide {p} niet geüpload:", result)
+            continue
+        await run_blocking(store_bytes, p, b)
+
+
+async def _delete_old_image(old_path: str | None):
+    """Oude foto + zijn afgeleiden weg (één $batch), ook uit de lokale cache."""
+    old_clean = clean_old_path(old_path)
+    if not old_clean:
+        return
+    paths = [old_clean] + [variant_path(old_clean, name) for name in VARIANTS]
+    try:
+        await run_blocking(delete_files, paths)
+    except Exception as e:
+        print("⚠️ Oude foto niet verwijderd:", e)
+    for p in paths:
+        delete_cache_for(p)
+
+
+async def gather_uploads(uploads: dict) -> dict:
+    """
+    {sleutel: coroutine} → {sleutel: resultaat}, alles tegelijk.
+    Er wordt altijd gewacht tot elke upload klaar is; daarna wordt de
+    eerste fout opnieuw opgegooid (zodat er geen DB-rijen geschreven worden).
+    """
+    results = await asyncio.gather(*uploads.values(), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return dict(zip(uploads, results))
+
+
 # =====================================================
 # HELPERS
 # =====================================================
@@ -99,11 +205,14 @@ async def upload_template_image(
     oef_index: int,
     slot: int,
     file: UploadFile,
-    old_path: str | None = None,
 ) -> str:
+    """
+    Nieuwe templatefoto uploaden. De vervangen foto blijft staan: de caller
+    verwijdert die pas (via _delete_old_image) als de nieuwe referentie bewaard is.
+    """
 
     raw = await file.read()
-    comp = compress_image_bytes(raw)
+    comp, variants = await prepare_image_async(raw)
 
     if comp is None:
         raise ValueError("Ongeldig of corrupt beeldbestand.")
@@ -112,13 +221,8 @@ async def upload_template_image(
     filename = timestamped_filename(base)
     new_path = template_image_path(template_id, filename)
 
-    # Oude foto verwijderen
-    old_clean = clean_old_path(old_path)
-    if old_clean:
-        delete_file_if_exists(old_clean)
-
-    # Upload correct (content, path)
-    upload_bytes(comp, new_path)
+    # Upload origineel + thumb/pdf-afgeleiden
+    await _upload_with_variants(comp, variants, new_path)
 
     return new_path
 
@@ -136,7 +240,7 @@ async def upload_schema_image(
 ) -> str:
 
     raw = await file.read()
-    comp = compress_image_bytes(raw)
+    comp, variants = await prepare_image_async(raw)
 
     if comp is None:
         raise ValueError("Ongeldig of corrupt beeldbestand.")
@@ -145,11 +249,9 @@ async def upload_schema_image(
     filename = timestamped_filename(base)
     new_path = schema_image_path(schema_id, filename)
 
-    old_clean = clean_old_path(old_path)
-    if old_clean:
-        delete_file_if_exists(old_clean)
+    await _delete_old_image(old_path)
 
-    # upload_bytes(content, path)
-    upload_bytes(comp, new_path)
+    # Upload origineel + thumb/pdf-afgeleiden
+    await _upload_with_variants(comp, variants, new_path)
 
     return new_path
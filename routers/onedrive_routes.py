@@ -4,7 +4,7 @@
 # =====================================================
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from onedrive_service import upload_bytes, upload_oefening_foto
+from onedrive_service import upload_bytes, upload_file_async, upload_oefening_foto_async
 import os
 
 router = APIRouter(prefix="/onedrive", tags=["OneDrive"])
@@ -34,8 +34,8 @@ def upload_test_file():
         remote_path = "RevoSport/Oefenschema/TestUploads/RevoSport_TestUpload.pdf"
 
         graph_path = upload_bytes(
-            remote_path,
             file_bytes,
+            remote_path,
             content_type="application/pdf"
         )
 
@@ -61,14 +61,11 @@ async def upload_pdf(file: UploadFile = File(...)):
     Upload een PDF naar OneDrive (debug/test).
     """
     try:
-        content = await file.read()
         remote_path = f"RevoSport/Oefenschema/Debug/{file.filename}"
 
-        graph_path = upload_bytes(
-            remote_path,
-            content,
-            content_type="application/pdf"
-        )
+        # Streaming upload (grote PDF's via upload session, geen volledige read)
+        await upload_file_async(file, remote_path, content_type="application/pdf")
+        graph_path = remote_path
 
         return {
             "status": "ok",
@@ -92,14 +89,10 @@ async def upload_foto(file: UploadFile = File(...)):
     Upload een willekeurige foto (JPEG/PNG) naar de debug-map.
     """
     try:
-        content = await file.read()
         remote_path = f"RevoSport/Oefenschema/Debug/{file.filename}"
 
-        graph_path = upload_bytes(
-            remote_path,
-            content,
-            content_type=file.content_type
-        )
+        await upload_file_async(file, remote_path, content_type=file.content_type)
+        graph_path = remote_path
 
         return {
             "status": "ok",
@@ -134,14 +127,12 @@ async def upload_oefening_foto_route(
       - graph_path (intern OneDrive-path)
     """
     try:
-        file_bytes = await file.read()
-
-        web_url, graph_path = upload_oefening_foto(
+        web_url, graph_path = await upload_oefening_foto_async(
             patient=patient,
             datum_iso=datum,
             volgorde=volgorde,
             slot=slot,
-            file_bytes=file_bytes
+            file=file
         )
 
         return {
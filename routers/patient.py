@@ -11,6 +11,8 @@ from db import SessionLocal
 from models.patient import Patient
 from schemas.patient import PatientSchema
 from routers.utils import ok, warn
+from phase_matrix import invalidate_phase_matrix
+import populatie_stats
 
 router = APIRouter(prefix="/patients", tags=["Patiënten"])
 
@@ -133,6 +135,7 @@ def create_patient(payload: dict, db: Session = Depends(get_db)):
         db.add(obj)
         db.commit()
         db.refresh(obj)
+        populatie_stats.refresh_patient(db, obj.patient_id)
 
         ok(f"[PATIENT] Nieuwe patiënt toegevoegd (id={obj.patient_id}, naam={obj.naam})")
         return {"message": "✅ Patiënt opgeslagen", "id": obj.patient_id}
@@ -165,6 +168,7 @@ def update_patient(patient_id: int, data: PatientSchema, db: Session = Depends(g
 
     db.commit()
     db.refresh(obj)
+    populatie_stats.refresh_patient(db, patient_id)
     ok(f"[PATIENT] Record geüpdatet (patient_id={patient_id})")
     return obj
 
@@ -184,6 +188,8 @@ def delete_patient(patient_id: int, db: Session = Depends(get_db)):
 
     db.delete(obj)
     db.commit()
+    invalidate_phase_matrix()
+    populatie_stats.refresh_patient(db, patient_id)
 
     ok(f"[PATIENT] Record verwijderd (patient_id={patient_id})")
     return {"status": "✅ Patiënt verwijderd"}
@@ -3,7 +3,9 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from db import SessionLocal
-from routers.utils import ok
+from routers.utils import ok, warn
+from security import require_role
+import populatie_stats
 
 router = APIRouter(prefix="/populatie", tags=["Populatie"])
 
@@ -23,103 +25,32 @@ def get_populatie_summary(db: Session = Depends(get_db)):
     - Aantal patiënten
     - Gemiddelde dagen tussen belangrijke gebeurtenissen
     - Tellingen per categorie (geslacht, sport, arts, …)
-    """
-
-    # ----------------------------
-    # 1️⃣ Gemiddelden (dagen)
-    # ----------------------------
-    sql = text("""
-        WITH eerste_momenten AS (
-            SELECT 
-                b.blessure_id,
-                b.datum_ongeval,
-                b.datum_operatie,
-                b.datum_intake,
-                m45.lopen_opstartdatum AS lopen_datum,
-                w6.autorijden_datum AS autorijden_datum_norm
-            FROM blessures b
-            LEFT JOIN maand45 m45 ON m45.blessure_id = b.blessure_id
-            LEFT JOIN week6  w6  ON w6.blessure_id  = b.blessure_id
-            LEFT JOIN maand3 m3  ON m3.blessure_id  = b.blessure_id
-        )
-        SELECT
-            (SELECT COUNT(DISTINCT p.patient_id) FROM patienten p) AS total_patients,
-            AVG(CASE WHEN datum_ongeval IS NOT NULL AND datum_operatie IS NOT NULL 
-                      AND DATEDIFF(datum_operatie, datum_ongeval) > 0
-                     THEN DATEDIFF(datum_operatie, datum_ongeval) END) AS avg_days_accident_to_surgery,
-            AVG(CASE WHEN datum_operatie IS NOT NULL AND datum_intake IS NOT NULL
-                      AND DATEDIFF(datum_intake, datum_operatie) > 0
-                     THEN DATEDIFF(datum_intake, datum_operatie) END) AS avg_days_surgery_to_intake,
-            AVG(CASE WHEN datum_operatie IS NOT NULL AND lopen_datum IS NOT NULL
-                      AND DATEDIFF(lopen_datum, datum_operatie) > 0
-                     THEN DATEDIFF(lopen_datum, datum_operatie) END) AS avg_days_surgery_to_walk,
-            AVG(CASE WHEN datum_operatie IS NOT NULL 
-                      AND autorijden_datum_norm IS NOT NULL
-                      AND autorijden_datum_norm <> '9999-12-31'
-                      AND DATEDIFF(autorijden_datum_norm, datum_operatie) > 0
-                     THEN DATEDIFF(autorijden_datum_norm, datum_operatie) END) AS avg_days_surgery_to_drive
-        FROM eerste_momenten;
-    """)
-    kpi = dict(db.execute(sql).mappings().first())
-
-    # ----------------------------
-    # 2️⃣ Tellingen per categorie
-    # ----------------------------
-    def count_query(table, field):
-        """
-        Telt waarden in een kolom en berekent het percentage binnen de geldige rijen.
-        NULL- en lege waarden worden uitgesloten.
-        """
-        q = text(f"""
-            SELECT 
-                {field} AS name,
-                COUNT(*) AS value,
-                ROUND(
-                    COUNT(*) * 100.0 /
-                    (SELECT COUNT(*) FROM {table} WHERE {field} IS NOT NULL AND {field} <> ''),
-                    1
-                ) AS percent
-            FROM {table}
-            WHERE {field} IS NOT NULL AND {field} <> ''
-            GROUP BY {field}
-            ORDER BY percent DESC;  -- 🔹 aangepaste sortering
-        """)
-        return [dict(r) for r in db.execute(q).mappings().all()]
-
-    # 🔸 Categorieën ophalen
-    geslacht    = count_query("patienten", "geslacht")
-    sport       = count_query("blessures", "sport")
-    sportniveau = count_query("blessures", "sportniveau")
-    etiologie   = count_query("blessures", "etiologie")
-    operatie    = count_query("blessures", "operatie")
-    arts        = count_query("blessures", "arts")
-    letsel      = count_query("blessures", "bijkomende_letsels")
-    monoloop    = count_query("blessures", "monoloop")
 
+    Wordt incrementeel in het geheugen bijgehouden (zie populatie_stats.py).
+    """
+    summary = populatie_stats.get_summary(db)
     ok("[POPULATIE] Summary samengesteld")
+    return summary
 
-    # ----------------------------
-    # 3️⃣ Response
-    # ----------------------------
-    return {
-        "totalPatients": kpi.get("total_patients"),
-        "avg": {
-            "accident_to_surgery": kpi.get("avg_days_accident_to_surgery"),
-            "surgery_to_intake":   kpi.get("avg_days_surgery_to_intake"),
-            "surgery_to_walk":     kpi.get("avg_days_surgery_to_walk"),
-            "surgery_to_drive":    kpi.get("avg_days_surgery_to_drive"),
-        },
-        "counts": {
-            "geslacht":    geslacht,
-            "sport":       sport,
-            "sportniveau": sportniveau,
-            "etiologie":   etiologie,
-            "operatie":    operatie,
-            "arts":        arts,
-            "letsel":      letsel,
-            "monoloop":    monoloop,
-        }
-    }
+
+# -----------------------------------------------------
+# CONTROLE + VOLLEDIGE REBUILD
+# -----------------------------------------------------
+@router.post("/rebuild")
+def rebuild_populatie_summary(
+    db: Session = Depends(get_db),
+    _=Depends(require_role("owner")),
+):
+    """
+    Vergelijkt de incrementele state met de volledige SQL-berekening
+    en bouwt ze daarna opnieuw op.
+    """
+    report = populatie_stats.verify_and_rebuild(db)
+    if report["in_sync"]:
+        ok("[POPULATIE] Incrementele state komt overeen met SQL")
+    else:
+        warn(f"[POPULATIE] {len(report['diffs'])} verschil(len) met SQL → opnieuw opgebouwd")
+    return report
 
 # -----------------------------------------------------
 # INDIVIDUEEL PER ATLEET
@@ -38,77 +38,115 @@ SMTP_PASS = os.getenv("SMTP_PASS", "")
 SMTP_FROM_NAME = os.getenv("SMTP_FROM_NAME", "Revo Sport")
 
 # =====================================================
-#  MAIL VIA MEDIAWAX SMTP
+#  MIME-BERICHT OPBOUWEN (ook gebruikt door de outbox)
 # =====================================================
-def send_mail_mediawax(
+def build_mail_message(
     to: str,
     subject: str,
     body: str,
     attachment_name: str = None,
     attachment_bytes: bytes = None,
     cc: str = None,
-    inline_images: dict = None,   # ✅ NIEUW
-):
+    inline_images: dict = None,
+    inline_parts: list = None,
+) -> tuple[MIMEMultipart, list[str]]:
     """
-    Verstuur e-mail via Mediawax SMTP:
+    Bouwt het volledige bericht → (msg_root, recipients):
     - HTML body
     - Optioneel CC
     - Optionele PDF-bijlage
-    - Optionele inline CID-images (PNG/JPG)
+    - Optionele inline CID-images (PNG/JPG), als bytes of als
+      kant-en-klaar MIME-deel (inline_parts, bv. het gedeelde logo)
     """
 
+    # ---------------------------------------------
+    # 📦 Hoofdcontainer met 'related' → nodig voor inline images
+    # ---------------------------------------------
+    msg_root = MIMEMultipart("related")
+    msg_root["From"] = f"{SMTP_FROM_NAME} <{SMTP_USER}>"
+    msg_root["To"] = to
+    if cc:
+        msg_root["Cc"] = cc
+    msg_root["Subject"] = subject
+
+    # ---------------------------------------------
+    # 📄 Alternatieven (HTML)
+    # ---------------------------------------------
+    msg_alt = MIMEMultipart("alternative")
+    msg_root.attach(msg_alt)
+
+    msg_alt.attach(MIMEText(body, "html", "utf-8"))
+
+    # ---------------------------------------------
+    # 🖼️ INLINE IMAGES (CID)
+    # ---------------------------------------------
+    if inline_images:
+        from email.mime.image import MIMEImage
+
+        for cid, img_bytes in inline_images.items():
+            if not img_bytes:
+                continue
+
+            img = MIMEImage(img_bytes)
+            img.add_header("Content-ID", f"<{cid}>")  # <cid>
+            img.add_header("Content-Disposition", "inline", filename=f"{cid}.png")
+            msg_root.attach(img)
+
+    for part in inline_parts or []:
+        msg_root.attach(part)
+
+    # ---------------------------------------------
+    # 📎 PDF ATTACHMENT
+    # ---------------------------------------------
+    if attachment_bytes:
+        part = MIMEApplication(attachment_bytes, Name=attachment_name)
+        part["Content-Disposition"] = f'attachment; filename="{attachment_name}"'
+        msg_root.attach(part)
+
+    recipients = [to]
+    if cc:
+        recipients.append(cc)
+
+    return msg_root, recipients
+
+
+def smtp_connect(timeout: float = 30) -> smtplib.SMTP:
+    """Geauthenticeerde SMTP-verbinding (STARTTLS + login)."""
+    server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=timeout)
     try:
-        # ---------------------------------------------
-        # 📦 Hoofdcontainer met 'related' → nodig voor inline images
-        # ---------------------------------------------
-        msg_root = MIMEMultipart("related")
-        msg_root["From"] = f"{SMTP_FROM_NAME} <{SMTP_USER}>"
-        msg_root["To"] = to
-        if cc:
-            msg_root["Cc"] = cc
-        msg_root["Subject"] = subject
-
-        # ---------------------------------------------
-        # 📄 Alternatieven (HTML)
-        # ---------------------------------------------
-        msg_alt = MIMEMultipart("alternative")
-        msg_root.attach(msg_alt)
-
-        msg_alt.attach(MIMEText(body, "html", "utf-8"))
-
-        # ---------------------------------------------
-        # 🖼️ INLINE IMAGES (CID)
-        # ---------------------------------------------
-        if inline_images:
-            from email.mime.image import MIMEImage
+        server.starttls()
+        server.login(SMTP_USER, SMTP_PASS)
+    except Exception:
+        server.close()
+        raise
+    return server
 
-            for cid, img_bytes in inline_images.items():
-                if not img_bytes:
-                    continue
 
-                img = MIMEImage(img_bytes)
-                img.add_header("Content-ID", f"<{cid}>")  # <cid>
-                img.add_header("Content-Disposition", "inline", filename=f"{cid}.png")
-                msg_root.attach(img)
+# =====================================================
+#  MAIL VIA MEDIAWAX SMTP (direct, één verbinding per mail)
+# =====================================================
+#  Voor requests liever routers/mail_outbox.enqueue_mail → achtergrond-
+#  worker met een blijvende verbinding + retries.
+def send_mail_mediawax(
+    to: str,
+    subject: str,
+    body: str,
+    attachment_name: str = None,
+    attachment_bytes: bytes = None,
+    cc: str = None,
+    inline_images: dict = None,   # ✅ NIEUW
+):
+    """Verstuur e-mail via Mediawax SMTP (zie build_mail_message)."""
 
-        # ---------------------------------------------
-        # 📎 PDF ATTACHMENT
-        # ---------------------------------------------
-        if attachment_bytes:
-            part = MIMEApplication(attachment_bytes, Name=attachment_name)
-            part["Content-Disposition"] = f'attachment; filename="{attachment_name}"'
-            msg_root.attach(part)
+    try:
+        msg_root, recipients = build_mail_message(
+            to, subject, body, attachment_name, attachment_bytes, cc, inline_images
+        )
 
         # ---------------------------------------------
         # 📡 SMTP VERBINDING
         # ---------------------------------------------
-        recipients = [to]
-        if cc:
-            recipients.append(cc)
-
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USER, SMTP_PASS)
+        with smtp_connect() as server:
             server.sendmail(SMTP_USER, recipients, msg_root.as_string())
 
         ok(f"E-mail verzonden naar {to}" + (f" (CC: {cc})" if cc else ""))
@@ -11,6 +11,8 @@ from models.week6 import Week6
 from models.blessure import Blessure
 from schemas.week6 import Week6Schema
 from routers.utils import ok, warn
+from phase_matrix import invalidate_phase_matrix
+import populatie_stats
 
 router = APIRouter(prefix="/week6", tags=["Week 6"])
 
@@ -73,7 +75,9 @@ def upsert_week6(data: Week6Schema, db: Session = Depends(get_db)):
             for k, v in data.dict(exclude_unset=True).items():
                 setattr(obj, k, v)
             db.commit()
+            invalidate_phase_matrix()
             db.refresh(obj)
+            populatie_stats.refresh_blessure(db, obj.blessure_id)
             ok(f"[WEEK6] Record geüpdatet (blessure_id={obj.blessure_id})")
             return obj
         else:
@@ -81,7 +85,9 @@ def upsert_week6(data: Week6Schema, db: Session = Depends(get_db)):
             obj = Week6(**data.dict(exclude_unset=True))
             db.add(obj)
             db.commit()
+            invalidate_phase_matrix()
             db.refresh(obj)
+            populatie_stats.refresh_blessure(db, obj.blessure_id)
             ok(f"[WEEK6] Nieuw record aangemaakt (blessure_id={obj.blessure_id})")
             return obj
 
@@ -102,5 +108,7 @@ def delete_week6(blessure_id: int, db: Session = Depends(get_db)):
         raise HTTPException(404, "Week6 niet gevonden")
     db.delete(obj)
     db.commit()
+    invalidate_phase_matrix()
+    populatie_stats.refresh_blessure(db, blessure_id)
     ok(f"[WEEK6] Record verwijderd (blessure_id={blessure_id})")
     return {"status": "✅ Week6 verwijderd"}
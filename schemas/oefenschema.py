@@ -135,3 +135,25 @@ class PatientSchema(PatientBase):
 class OefenschemaPDFRequest(BaseModel):
     schema_id: int
     extra_bericht: Optional[str] = None
+
+
+# -----------------------------------------------------
+# 🔹 Bulk PDF-export (ZIP)
+# -----------------------------------------------------
+class OefenschemaPDFExportRequest(BaseModel):
+    # Ofwel expliciete ids, ofwel een filter (combineerbaar)
+    schema_ids: Optional[List[int]] = None
+    patient_id: Optional[int] = None
+    datum_van: Optional[date] = None
+    datum_tot: Optional[date] = None
+    created_by: Optional[str] = None
+
+
+# -----------------------------------------------------
+# 🔹 Bulk mail (alle schema's van een dag / selectie)
+# -----------------------------------------------------
+class OefenschemaBulkMailRequest(BaseModel):
+    schema_ids: Optional[List[int]] = None
+    datum: Optional[date] = None
+    created_by: Optional[str] = None
+    extra: Optional[str] = None
@@ -4,6 +4,9 @@
 # =====================================================
 
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -12,10 +15,12 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from passlib.hash import bcrypt
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
 
-from db import get_db
+from db import SessionLocal
 from models import User
+from password_pool import BCRYPT_ROUNDS
 
 # -----------------------------------------------------
 # .ENV LADEN
@@ -26,6 +31,11 @@ SECRET_KEY = os.getenv("SECRET_KEY", "change-me")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "480"))
 
+# Auth-cache: (sub, iat) → gebruiker, zonder DB-query per request.
+# Per proces; wijzigingen in een ander proces zijn na hoogstens TTL zichtbaar.
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_MAX = int(os.getenv("AUTH_CACHE_MAX", "1000"))
+
 # -----------------------------------------------------
 # TOKEN SCHEMA
 # -----------------------------------------------------
@@ -42,13 +52,14 @@ def hash_password(plain: str) -> str:
     if not isinstance(plain, str):
         raise ValueError("Wachtwoord moet een string zijn.")
     plain = plain[:72]
-    return bcrypt.using(rounds=12).hash(plain)
+    return bcrypt.using(rounds=BCRYPT_ROUNDS).hash(plain)
 
 
 def verify_password(plain: str, hashed: str) -> bool:
     """
     Controleer of het ingevoerde wachtwoord overeenkomt met de opgeslagen hash.
     Truncate naar 72 bytes zoals bcrypt vereist.
+    Blokkeert ±250 ms CPU; de login gebruikt password_pool.verify_password_pooled.
     """
     plain = plain[:72]
     try:
@@ -70,14 +81,101 @@ def decode_token(token: str) -> dict:
     """Decodeer en valideer een JWT token."""
     return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
 
+
+# -----------------------------------------------------
+# AUTH-CACHE (ingelogde gebruikers)
+# -----------------------------------------------------
+class AuthUser:
+    """Losgekoppelde kopie van een User (geen ORM-sessie nodig, read-only)."""
+
+    __slots__ = ("id", "email", "full_name", "role", "is_active", "created_at")
+
+    def __init__(self, user: User):
+        for name in self.__slots__:
+            object.__setattr__(self, name, getattr(user, name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("AuthUser is read-only")
+
+
+_auth_lock = threading.Lock()
+_auth_cache: "OrderedDict[tuple, tuple[float, AuthUser]]" = OrderedDict()   # LRU, oudste eerst
+
+
+def _cached_user(key: tuple) -> Optional[AuthUser]:
+    with _auth_lock:
+        hit = _auth_cache.get(key)
+        if hit is None:
+            return None
+        expires, user = hit
+        if expires < time.monotonic():
+            del _auth_cache[key]
+            return None
+        _auth_cache.move_to_end(key)
+        return user
+
+
+def _remember_user(key: tuple, user: AuthUser):
+    with _auth_lock:
+        _auth_cache[key] = (time.monotonic() + AUTH_CACHE_TTL, user)
+        _auth_cache.move_to_end(key)
+        while len(_auth_cache) > AUTH_CACHE_MAX:
+            _auth_cache.popitem(last=False)
+
+
+def invalidate_user(email: Optional[str] = None):
+    """Cache van één gebruiker (alle tokens) of alles leegmaken."""
+    with _auth_lock:
+        if email is None:
+            _auth_cache.clear()
+            return
+        for key in [k for k in _auth_cache if k[0] == email]:
+            del _auth_cache[key]
+
+
+# Elke ORM-wijziging aan een User (rol, actief, naam, verwijderen) → uit de cache.
+# Bij de flush én na de commit: tussen die twee kan een andere request de
+# oude (nog gecommitte) rij opnieuw in de cache zetten.
+# Bulk-updates (query.update / raw SQL) slaan dit over → invalidate_user() zelf aanroepen.
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_change(mapper, connection, target):
+    emails = {target.email, *(inspect(target).attrs.email.history.deleted or ())}   # ook oud adres
+    for email in emails:
+        invalidate_user(email)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("auth_invalidate", set()).update(emails)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    for email in session.info.pop("auth_invalidate", ()):
+        invalidate_user(email)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_after_rollback(session, previous_transaction):
+    session.info.pop("auth_invalidate", None)
+
+
+def _load_user(email: str) -> Optional[AuthUser]:
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == email).first()
+        return AuthUser(user) if user else None
+    finally:
+        db.close()
+
+
 # -----------------------------------------------------
 # DEPENDENCIES VOOR ROUTE-BESCHERMING
 # -----------------------------------------------------
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> User:
-    """Controleer het Bearer-token en geef de ingelogde gebruiker terug."""
+def get_current_user(token: str = Depends(oauth2_scheme)) -> AuthUser:
+    """
+    Controleer het Bearer-token en geef de ingelogde gebruiker terug.
+    Snelle weg: (sub, iat) in de auth-cache → geen DB-query.
+    """
     auth_error = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Niet ingelogd of token ongeldig.",
@@ -92,8 +190,15 @@ def get_current_user(
     except JWTError:
         raise auth_error
 
-    user: Optional[User] = db.query(User).filter(User.email == email).first()
-    if not user or not user.is_active:
+    key = (email, payload.get("iat"))
+    user = _cached_user(key)
+    if user is None:
+        user = _load_user(email)
+        if user is None:
+            raise auth_error
+        _remember_user(key, user)
+
+    if not user.is_active:
         raise auth_error
 
     return user
@@ -101,7 +206,7 @@ def get_current_user(
 
 def require_role(*allowed_roles: str):
     """Gebruik: Depends(require_role('owner')) of meerdere rollen."""
-    def _role_dep(current_user: User = Depends(get_current_user)) -> User:
+    def _role_dep(current_user: AuthUser = Depends(get_current_user)) -> AuthUser:
         if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,